@@ -0,0 +1,403 @@
+# benchmarks/run_benchmarks.py
+#
+# Offline benchmark suite for the retrieval and RAG pipeline. Every stage runs
+# against a synthetic corpus, the local vector store (VECTOR_BACKEND=local in a
+# temporary directory) and the local completions stub (rag/llm_stub.py), and
+# the results are written as JSON so they can be compared between releases:
+#
+#     python -m benchmarks.run_benchmarks --output benchmarks/results.json
+#     python -m benchmarks.run_benchmarks --stages search --sizes 10000 100000 --encoder fake
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import numpy as np
+
+STAGES = ("ingest", "encode", "search", "prefetch", "prompt", "llm")
+ENCODERS = ("auto", "fake", "torch", "int8", "onnx")
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def latency_summary(seconds):
+    """p50/p95/p99/mean latency in milliseconds of a list of timings in seconds."""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    return {
+        "count": int(len(ms)),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+    }
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def install_encoder(kind):
+    """
+    Install the encoder used by every stage. "auto" loads the local MiniLM
+    model if it can and falls back to the hashed stand-in.
+    """
+    from vectordb.resources import set_resource, MODEL_DIR
+    from benchmarks.synthetic import FakeEncoder
+
+    if kind in ("auto", "torch", "int8", "onnx"):
+        try:
+            from vectordb.fast_encoder import load_encoder
+            model = load_encoder("torch" if kind == "auto" else kind, model_dir=MODEL_DIR)
+            set_resource("model", model)
+            return "torch" if kind == "auto" else kind
+        except Exception as e:
+            if kind != "auto":
+                raise
+            log(f"⚠️ Warning: could not load the MiniLM model ({e}); using the hashed stand-in encoder.")
+
+    set_resource("model", FakeEncoder())
+    return "fake"
+
+
+# === Stages ===
+def bench_ingest(args, workdir):
+    """Full-text ingestion (parse -> chunk -> embed -> upsert) of synthetic PDFs."""
+    from benchmarks.synthetic import write_pdf_corpus
+    import vectordb.full2vector as full2vector
+    from vectordb.resources import get_index
+
+    paper_dir = os.path.join(workdir, "papers")
+    log(f"Writing {args.papers} synthetic PDFs...")
+    write_pdf_corpus(paper_dir, args.papers, seed=args.seed)
+
+    before = len(get_index(full2vector.INDEX_NAME, create=True))
+    _, seconds = timed(full2vector.build_vector_db, paper_dir, years=["2024"], workers=args.workers)
+    chunks = len(get_index(full2vector.INDEX_NAME)) - before
+
+    # A second run finds nothing to do; it measures the incremental check
+    _, rerun_seconds = timed(full2vector.build_vector_db, paper_dir, years=["2024"], workers=args.workers)
+    return {
+        "papers": args.papers,
+        "chunks": chunks,
+        "seconds": seconds,
+        "papers_per_second": args.papers / seconds,
+        "chunks_per_second": chunks / seconds,
+        "unchanged_rerun_seconds": rerun_seconds,
+    }
+
+
+def bench_encode(args, workdir):
+    """Encoder throughput per batch size, and query latency through the embedding cache."""
+    from benchmarks.synthetic import TextGenerator
+    from vectordb.resources import get_model, get_embedding_cache
+
+    text = TextGenerator(args.seed + 1)
+    sentences = [text.sentence() for _ in range(args.queries)]
+    model = get_model()
+    model.encode(sentences[:8])  # warm-up
+
+    throughput = {}
+    for batch_size in (1, 32, 128):
+        _, seconds = timed(model.encode, sentences, batch_size=batch_size)
+        throughput[str(batch_size)] = len(sentences) / seconds
+
+    cache = get_embedding_cache()
+    cold = [timed(cache.encode_query, model, sentence)[1] for sentence in sentences]
+    warm = [timed(cache.encode_query, model, sentence)[1] for sentence in sentences]
+    return {
+        "sentences": len(sentences),
+        "sentences_per_second_by_batch_size": throughput,
+        "query_cold": latency_summary(cold),
+        "query_cached": latency_summary(warm),
+    }
+
+
+def bench_search(args, workdir):
+    """Top-k latency and recall@k of each search mode at increasing corpus sizes."""
+    from benchmarks.synthetic import TextGenerator, clustered_vectors, paper_metadata
+    from vectordb.local_store import LocalVectorStore
+
+    text = TextGenerator(args.seed)
+    results = {}
+    for size in args.sizes:
+        log(f"Building a {size}-vector store...")
+        store = LocalVectorStore(os.path.join(workdir, f"search-{size}"))
+        row = 0
+        for block in clustered_vectors(size, seed=args.seed):
+            store.upsert([
+                {"id": f"p{row + i}", "values": vector, "metadata": paper_metadata(row + i, text)}
+                for i, vector in enumerate(block)
+            ])
+            row += len(block)
+
+        rng = np.random.default_rng(args.seed)
+        query_rows = rng.choice(size, size=min(args.queries, size), replace=False)
+        queries = np.asarray(store.matrix[np.sort(query_rows)], dtype=np.float32)
+        queries += rng.standard_normal(queries.shape).astype(np.float32) * 0.02
+
+        def run(**kwargs):
+            timings, ids = [], []
+            for query in queries:
+                response, seconds = timed(store.query, vector=query, top_k=args.top_k, **kwargs)
+                timings.append(seconds)
+                ids.append({match.id for match in response.matches})
+            return timings, ids
+
+        def recall(approx, exact):
+            return sum(len(a & e) for a, e in zip(approx, exact)) / max(sum(len(e) for e in exact), 1)
+
+        modes = {}
+        exact_timings, exact_ids = run(exact=True)
+        modes["exact"] = latency_summary(exact_timings)
+
+        for name, query_filter in (
+            ("filter_year", {"year": 2020}),
+            ("filter_year_range_venue", {"year": {"$gte": 2019, "$lte": 2021}, "conference": "cvpr"}),
+            ("filter_author", {"authors": {"$contains": text.words[7]}}),
+        ):
+            timings, _ = run(exact=True, filter=query_filter)
+            modes[name] = latency_summary(timings)
+
+        store.build_ann_index()
+        timings, ids = run()
+        modes["ivf"] = dict(latency_summary(timings), recall=recall(ids, exact_ids))
+
+        store.build_compressed_codes("int8")
+        timings, ids = run()
+        modes["ivf_int8"] = dict(latency_summary(timings), recall=recall(ids, exact_ids))
+
+        ann_index, store.ann_index = store.ann_index, None
+        timings, ids = run()
+        modes["int8"] = dict(latency_summary(timings), recall=recall(ids, exact_ids))
+        store.ann_index = ann_index
+
+        results[str(size)] = modes
+        shutil.rmtree(store.path, ignore_errors=True)
+    return results
+
+
+def _populate_chunk_index(args, text):
+    """Add synthetic papers of ``args.chunks_per_paper`` chunks to the paper-contents index."""
+    import vectordb.full2vector as full2vector
+    from vectordb.manifest import chunk_vector_id
+    from vectordb.resources import get_index, get_model
+
+    index = get_index(full2vector.INDEX_NAME, create=True)
+    postings = full2vector.get_postings()
+    model = get_model()
+
+    titles = []
+    for paper in range(args.papers):
+        key, title = f"synthetic_{paper}", text.title()
+        contents = [text.paragraph(8) for _ in range(args.chunks_per_paper)]
+        vectors = model.encode(contents, batch_size=64)
+        ids = [chunk_vector_id(key, i, content) for i, content in enumerate(contents)]
+        index.upsert(vectors=[
+            {"id": vector_id, "values": vector.tolist(), "metadata": {
+                "paper_id": key, "title": title, "year": "2024", "chunk_index": i,
+                "token_count": len(content.split()), "content": content}}
+            for i, (vector_id, vector, content) in enumerate(zip(ids, vectors, contents))
+        ])
+        postings.add_paper(key, title, ids)
+        titles.append(title)
+    postings.save()
+    return titles
+
+
+def require_chunks(context, expected=None):
+    """
+    Fail the stage when a ChunkContext came back empty (or short), instead of
+    timing a prompt without any paper content.
+    """
+    if context is None or len(context) == 0:
+        raise RuntimeError("chunk context is empty; chunks were not fetched from the index")
+    if expected is not None and len(context) != expected:
+        raise RuntimeError(f"chunk context has {len(context)} chunks, expected {expected}")
+    return context
+
+
+def bench_prefetch(args, workdir, state):
+    """Fetching every chunk (with vectors) of 5 recommended papers, cold and from the chunk cache."""
+    from benchmarks.synthetic import TextGenerator
+    from rag.followup_module import load_chunk_context
+
+    titles = _populate_chunk_index(args, TextGenerator(args.seed + 2))
+    groups = [titles[i:i + 5] for i in range(0, len(titles) - 4, 5)]
+
+    if not groups:
+        raise RuntimeError("the prefetch stage needs at least 5 papers (--papers)")
+    expected = 5 * args.chunks_per_paper
+    cold, warm = [], []
+    for timings in (cold, warm):
+        for group in groups:
+            context, seconds = timed(load_chunk_context, group)
+            require_chunks(context, expected)
+            timings.append(seconds)
+    state["chunk_context"] = context
+    return {
+        "papers_per_request": 5,
+        "chunks_per_paper": args.chunks_per_paper,
+        "chunks_per_request": len(context),
+        "cold": latency_summary(cold),
+        "cached": latency_summary(warm),
+    }
+
+
+def bench_prompt(args, workdir, state):
+    """Follow-up chunk selection and prompt assembly over a cached ChunkContext."""
+    from benchmarks.synthetic import TextGenerator
+    from rag.followup_module import build_followup_prompt, count_tokens
+
+    context = state.get("chunk_context")
+    if context is None:
+        bench_prefetch(args, workdir, state)
+        context = state["chunk_context"]
+    require_chunks(context)
+
+    text = TextGenerator(args.seed + 3)
+    questions = [text.sentence() for _ in range(args.queries)]
+    timings, tokens = [], []
+    for diversify in (False, True):
+        for question in questions:
+            prompt, seconds = timed(build_followup_prompt, question, context, top_k=5, diversify=diversify,
+                                    chat_history=[])
+            timings.append(seconds)
+            tokens.append(count_tokens(prompt))
+
+    # A long session: 20 earlier turns with multi-thousand-token answers, none summarized yet
+    history = [{"user_query": text.sentence(), "assistant_answer": " ".join(text.paragraph(30) for _ in range(8))}
+               for _ in range(20)]
+    long_timings, long_tokens = [], []
+    for question in questions:
+        prompt, seconds = timed(build_followup_prompt, question, context, top_k=5, chat_history=history)
+        long_timings.append(seconds)
+        long_tokens.append(count_tokens(prompt))
+    return {
+        "chunks_in_context": len(context),
+        "assembly": latency_summary(timings),
+        "mean_prompt_tokens": float(np.mean(tokens)),
+        "long_history_assembly": latency_summary(long_timings),
+        "long_history_max_prompt_tokens": int(max(long_tokens)),
+    }
+
+
+def bench_llm(args, workdir, state):
+    """Time to first token and total time of streamed answers from the local completions stub."""
+    from benchmarks.synthetic import TextGenerator
+    from rag.rag_module import stream_answer_from_papers
+    from rag.followup_module import stream_followup_answer
+
+    text = TextGenerator(args.seed + 4)
+    papers = [{"id": f"p{i}", "title": text.title(), "authors": text.authors(),
+               "abstract_url": f"https://example.org/abs/{i}"} for i in range(5)]
+
+    def measure(stream):
+        start, first = time.perf_counter(), None
+        for _ in stream:
+            if first is None:
+                first = time.perf_counter() - start
+        return first or 0.0, time.perf_counter() - start
+
+    runs = max(1, args.queries // 10)
+    recommend = [measure(stream_answer_from_papers(text.sentence(), papers)) for _ in range(runs)]
+    result = {
+        "first_token_delay_s": args.stub_first_token_delay,
+        "token_delay_s": args.stub_token_delay,
+        "recommend_first_token": latency_summary([first for first, _ in recommend]),
+        "recommend_total": latency_summary([total for _, total in recommend]),
+    }
+
+    context = state.get("chunk_context")
+    if context is not None:
+        require_chunks(context)
+        followup = [measure(stream_followup_answer(text.sentence(), context)) for _ in range(runs)]
+        result["followup_first_token"] = latency_summary([first for first, _ in followup])
+        result["followup_total"] = latency_summary([total for _, total in followup])
+    return result
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    # Every index, sidecar and cache goes to the scratch directory; the
+    # environment is set before any module reads it.
+    os.environ["VECTOR_BACKEND"] = "local"
+    os.environ["LOCAL_STORE_DIR"] = os.path.join(workdir, "vector_store")
+    os.environ["ANSWER_CACHE"] = "0"
+
+    from rag.llm_stub import start_stub_server
+    server, base_url = start_stub_server(
+        first_token_delay=args.stub_first_token_delay, token_delay=args.stub_token_delay
+    )
+    os.environ["GPT_BASE_URL"] = base_url
+    os.environ["GPT_API_KEY"] = "stub"
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "encoder": install_encoder(args.encoder),
+            "args": {key: value for key, value in vars(args).items() if key != "output"},
+        },
+        "stages": {},
+    }
+
+    state = {}
+    stage_functions = {
+        "ingest": lambda: bench_ingest(args, workdir),
+        "encode": lambda: bench_encode(args, workdir),
+        "search": lambda: bench_search(args, workdir),
+        "prefetch": lambda: bench_prefetch(args, workdir, state),
+        "prompt": lambda: bench_prompt(args, workdir, state),
+        "llm": lambda: bench_llm(args, workdir, state),
+    }
+    try:
+        for stage in STAGES:
+            if stage not in args.stages:
+                continue
+            log(f"=== {stage} ===")
+            try:
+                report["stages"][stage], seconds = timed(stage_functions[stage])
+                log(f"✅ {stage} done in {seconds:.1f}s")
+            except Exception as e:
+                log(f"⚠️ Warning: stage {stage} failed: {e}")
+                report["stages"][stage] = {"error": str(e)}
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark retrieval and RAG stages offline and print JSON results.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000], help="Corpus sizes for the search stage.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--papers", type=int, default=50, help="Papers for the ingest and prefetch stages.")
+    parser.add_argument("--chunks-per-paper", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=None, help="PDF parsing processes in the ingest stage.")
+    parser.add_argument("--encoder", choices=ENCODERS, default="auto")
+    parser.add_argument("--stub-first-token-delay", type=float, default=0.2)
+    parser.add_argument("--stub-token-delay", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        log(f"Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,143 @@
+# benchmarks/synthetic.py
+#
+# Synthetic corpora and a stand-in encoder for the benchmark suite, so every
+# stage can run offline without the real papers, Pinecone or the MiniLM model.
+
+import os
+import hashlib
+import numpy as np
+
+DIMENSION = 384
+VENUES = ("cvpr", "iccv", "eccv")
+YEARS = tuple(range(2015, 2025))
+SYLLABLES = ("ra", "ne", "to", "vi", "lo", "sen", "mar", "dex", "qui", "po", "tra", "gen",
+             "ex", "lu", "mo", "ker", "fa", "zi", "on", "al", "ic", "um", "ter", "sca")
+
+
+def vocabulary(size=3000, seed=0):
+    """Pseudo-words of 2-4 syllables, identical for a given seed."""
+    rng = np.random.default_rng(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES, size=rng.integers(2, 5))))
+    return sorted(words)
+
+
+class TextGenerator:
+    """Random sentences, paragraphs and paper titles over a fixed vocabulary."""
+
+    def __init__(self, seed=0, vocabulary_size=3000):
+        self.rng = np.random.default_rng(seed)
+        self.words = np.array(vocabulary(vocabulary_size, seed))
+        # Zipf-like word frequencies, like natural text
+        weights = 1.0 / np.arange(1, len(self.words) + 1)
+        self.weights = weights / weights.sum()
+
+    def sentence(self, min_words=8, max_words=24):
+        words = self.rng.choice(self.words, size=self.rng.integers(min_words, max_words + 1), p=self.weights)
+        return " ".join(words).capitalize() + "."
+
+    def paragraph(self, sentences=5):
+        return " ".join(self.sentence() for _ in range(sentences))
+
+    def title(self):
+        return " ".join(word.capitalize() for word in self.rng.choice(self.words, size=self.rng.integers(4, 9)))
+
+    def authors(self, count=3):
+        return ", ".join(
+            f"{self.rng.choice(self.words).capitalize()} {self.rng.choice(self.words).capitalize()}"
+            for _ in range(count)
+        )
+
+
+class FakeEncoder:
+    """
+    Stand-in for SentenceTransformer: a deterministic hashed bag-of-words
+    embedding with the same ``encode`` signature and output shape. Texts that
+    share words get similar vectors, so retrieval results are meaningful.
+    """
+
+    def __init__(self, dimension=DIMENSION):
+        self.dimension = dimension
+        self._projection = {}
+
+    def _word_vector(self, word):
+        vector = self._projection.get(word)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+            self._projection[word] = vector
+        return vector
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                embeddings[i] += self._word_vector(word)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeddings /= norms
+        return embeddings[0] if single else embeddings
+
+
+def clustered_vectors(num_vectors, dimension=DIMENSION, clusters=256, spread=0.35, seed=0, block=50000):
+    """
+    Yield blocks of unit vectors drawn around random cluster centres, which
+    behaves much more like sentence embeddings than uniform noise does.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    for start in range(0, num_vectors, block):
+        size = min(block, num_vectors - start)
+        vectors = centres[rng.integers(0, clusters, size)] + \
+            spread * rng.standard_normal((size, dimension)).astype(np.float32) / np.sqrt(dimension) * 4
+        yield vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def paper_metadata(row, text_generator):
+    """Abstract-index style metadata for synthetic paper ``row``."""
+    return {
+        "title": f"Paper {row}",
+        "authors": text_generator.authors(),
+        "abstract_url": f"https://example.org/abs/{row}",
+        "pdf_url": f"https://example.org/pdf/{row}.pdf",
+        "year": YEARS[row % len(YEARS)],
+        "conference": VENUES[row % len(VENUES)],
+    }
+
+
+def write_pdf_corpus(base_dir, num_papers, year="2024", pages=3, seed=0):
+    """
+    Write ``num_papers`` synthetic PDFs in the layout full2vector.py reads:
+    <base_dir>/cvpr/<year>/papers/<i>.pdf plus authors.csv with their titles.
+
+    Returns:
+        list of str: The paper titles, indexed by paper id.
+    """
+    import fitz  # PyMuPDF
+    import pandas as pd
+
+    text = TextGenerator(seed)
+    paper_dir = os.path.join(base_dir, "cvpr", year, "papers")
+    os.makedirs(paper_dir, exist_ok=True)
+
+    titles = []
+    for paper_id in range(num_papers):
+        title = text.title()
+        titles.append(title)
+        doc = fitz.open()
+        for page_number in range(pages):
+            page = doc.new_page()
+            heading = f"{page_number + 1} {text.title()}"
+            body = "\n\n".join(text.paragraph() for _ in range(4))
+            page.insert_textbox(fitz.Rect(50, 50, 545, 800), f"{heading}\n\n{body}", fontsize=9)
+        doc.save(os.path.join(paper_dir, f"{paper_id}.pdf"))
+        doc.close()
+
+    pd.DataFrame({"title": titles, "authors": [text.authors() for _ in titles]}).to_csv(
+        os.path.join(base_dir, "cvpr", year, "authors.csv"), sep="~", index=False
+    )
+    return titles
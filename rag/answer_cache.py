@@ -0,0 +1,131 @@
+# rag/answer_cache.py
+
+import os
+import time
+import sqlite3
+import threading
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, ".cache", "answers.sqlite3")
+
+SIMILARITY_THRESHOLD = 0.92
+TTL_SECONDS = 7 * 24 * 3600
+MAX_ENTRIES = 5000
+
+
+def paper_set_key(papers):
+    """Order-independent key of a set of retrieved papers."""
+    return "|".join(sorted(str(paper["id"]) for paper in papers))
+
+
+class SemanticAnswerCache:
+    """
+    Persistent cache of generated answers, shared by every session of the app.
+
+    An entry matches a new request when it was generated with the same prompt
+    version from the same set of retrieved papers, is younger than the TTL, and
+    its query embedding has cosine similarity >= ``threshold`` with the new
+    query. Entries live in SQLite (surviving restarts); their embeddings are
+    also kept in memory, grouped by paper set, so a lookup is one small
+    matrix-vector product. Beyond ``max_entries`` the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, threshold=SIMILARITY_THRESHOLD,
+                 ttl_seconds=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                query TEXT NOT NULL,
+                paper_key TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_lookup ON answers (paper_key, prompt_version)")
+        self._db.commit()
+
+        # (paper_key, prompt_version) -> list of (id, created_at, embedding)
+        self._entries = {}
+        for row_id, paper_key, version, embedding, created_at in self._db.execute(
+            "SELECT id, paper_key, prompt_version, embedding, created_at FROM answers"
+        ):
+            self._entries.setdefault((paper_key, version), []).append(
+                (row_id, created_at, np.frombuffer(embedding, dtype=np.float32))
+            )
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, query_vector, papers, prompt_version):
+        """Return a cached answer for a near-identical request, or None."""
+        query = self._normalize(query_vector)
+        now = time.time()
+
+        with self._lock:
+            entries = [
+                entry for entry in self._entries.get((paper_set_key(papers), prompt_version), [])
+                if now - entry[1] <= self.ttl_seconds
+            ]
+            if entries:
+                similarities = np.stack([entry[2] for entry in entries]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    row_id = entries[best][0]
+                    row = self._db.execute("SELECT answer FROM answers WHERE id = ?", (row_id,)).fetchone()
+                    if row is not None:
+                        self._db.execute("UPDATE answers SET last_access = ? WHERE id = ?", (now, row_id))
+                        self._db.commit()
+                        self.hits += 1
+                        return row[0]
+
+            self.misses += 1
+            return None
+
+    def store(self, query, query_vector, papers, prompt_version, answer):
+        """Add an answer, then drop expired and least recently used entries."""
+        embedding = self._normalize(query_vector)
+        now = time.time()
+        key = (paper_set_key(papers), prompt_version)
+
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO answers (query, paper_key, prompt_version, embedding, answer, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (query, key[0], key[1], embedding.tobytes(), answer, now, now)
+            )
+            self._entries.setdefault(key, []).append((cursor.lastrowid, now, embedding))
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM answers WHERE id IN ("
+            "  SELECT id FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?"
+            ")",
+            (self.max_entries,)
+        )
+
+        live_ids = {row[0] for row in self._db.execute("SELECT id FROM answers")}
+        for key in list(self._entries):
+            entries = [entry for entry in self._entries[key] if entry[0] in live_ids]
+            if entries:
+                self._entries[key] = entries
+            else:
+                del self._entries[key]
@@ -0,0 +1,89 @@
+# rag/chunk_ranking.py
+
+import numpy as np
+from vectordb.lexical_index import RRF_K
+
+
+def score_chunks(query_vector, chunk_vectors):
+    """Cosine similarity of the query against every chunk, in one matrix-vector product."""
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1.0)
+    chunks = np.asarray(chunk_vectors, dtype=np.float32)
+    norms = np.linalg.norm(chunks, axis=1)
+    norms[norms == 0] = 1.0
+    return (chunks @ query) / norms
+
+
+def fuse_scores(dense_scores, lexical_scores, k=RRF_K):
+    """
+    Reciprocal rank fusion of dense and BM25 scores over the same chunks
+    (chunks without a lexical match get no lexical term), scaled so the best
+    chunk scores 1 and the result can stand in for cosine relevance in MMR.
+    """
+    dense_scores = np.asarray(dense_scores, dtype=np.float32)
+    lexical_scores = np.asarray(lexical_scores, dtype=np.float32)
+
+    def ranks(scores):
+        result = np.empty(len(scores), dtype=np.float32)
+        result[np.argsort(-scores, kind="stable")] = np.arange(1, len(scores) + 1)
+        return result
+
+    fused = 1.0 / (k + ranks(dense_scores))
+    matched = lexical_scores > 0
+    fused[matched] += 1.0 / (k + ranks(lexical_scores[matched]))
+    return fused / fused.max() if len(fused) else fused
+
+
+def _mmr_order(scores, chunk_vectors, mmr_lambda):
+    """
+    Lazily yield chunk indices in Maximal Marginal Relevance order: each pick
+    trades relevance against similarity to the chunks already picked, which
+    spreads the selection over different papers and sections instead of
+    near-duplicate chunks.
+    """
+    chunks = np.asarray(chunk_vectors, dtype=np.float32)
+    chunks = chunks / np.maximum(np.linalg.norm(chunks, axis=1, keepdims=True), 1e-12)
+
+    remaining = np.ones(len(scores), dtype=bool)
+    max_similarity = np.full(len(scores), -np.inf, dtype=np.float32)
+    while remaining.any():
+        redundancy = np.where(np.isfinite(max_similarity), max_similarity, 0.0)
+        mmr = mmr_lambda * scores - (1 - mmr_lambda) * redundancy
+        mmr[~remaining] = -np.inf
+        best = int(np.argmax(mmr))
+        yield best
+        remaining[best] = False
+        max_similarity = np.maximum(max_similarity, chunks @ chunks[best])
+
+
+def select_chunks(scores, token_counts, token_budget, top_k, chunk_vectors=None, mmr_lambda=None):
+    """
+    Pick up to ``top_k`` chunk indices, best first, whose token counts sum to at
+    most ``token_budget``. Chunks that do not fit are skipped in favour of
+    smaller, lower-ranked ones.
+
+    Args:
+        scores (array): Relevance score per chunk.
+        token_counts (list of int): Tokens each chunk takes in the prompt.
+        token_budget (int): Maximum total tokens of the selected chunks.
+        top_k (int): Maximum number of chunks.
+        chunk_vectors (array): Chunk embeddings, required for MMR.
+        mmr_lambda (float): Enable MMR diversification (1.0 = pure relevance).
+
+    Returns:
+        list of int: Selected chunk indices in ranked order.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    if mmr_lambda is not None and chunk_vectors is not None:
+        order = _mmr_order(scores, chunk_vectors, mmr_lambda)
+    else:
+        order = np.argsort(-scores, kind="stable")
+
+    selected, used = [], 0
+    for i in order:
+        if len(selected) >= top_k:
+            break
+        if used + token_counts[i] <= token_budget:
+            selected.append(int(i))
+            used += token_counts[i]
+    return selected
@@ -1,43 +1,138 @@
 import os
-from openai import OpenAI
-from tiktoken import get_encoding
+from functools import lru_cache
+import numpy as np
 import streamlit as st
+from rag.rag_module import stream_completion, get_client
+from vectordb.resources import get_model, get_embedding_cache
+from vectordb.pdf_extraction import get_tokenizer, TOKENIZER
+from vectordb.retrieve_chunks import retrieve_related_chunks_by_titles, get_lexical_index
+from vectordb.tracing import span, traced, record_error, record_usage
+from rag.chunk_ranking import score_chunks, select_chunks, fuse_scores
+from rag.history_summary import (
+    HistorySummary, RECENT_TURNS, SUMMARY_MAX_TOKENS, completed_turns, pending_turns, extractive_summary,
+    truncate_to_tokens, keep_last_tokens
+)
 
-GPT_KEY = os.getenv("GPT_API_KEY")
-client = OpenAI(api_key=GPT_KEY)
+PROMPT_TOKEN_BUDGET = 6000   # whole follow-up prompt: instructions, history, question, titles and chunks
+MAX_CONTEXT_TOKENS = 3000    # chunks, when the rest of the prompt leaves room
+HISTORY_TOKEN_BUDGET = 1500  # running summary + latest turns
+TURN_ANSWER_TOKENS = 300     # each quoted answer is cut to this many tokens
+TITLES_TOKEN_BUDGET = 400
+MMR_LAMBDA = 0.7  # relevance vs. diversity when diversify=True
 
-def count_tokens(text, model="cl100k_base"):
-    enc = get_encoding(model)
-    return len(enc.encode(text))
+def count_tokens(text, model=TOKENIZER):
+    return len(get_tokenizer(model).encode(text))
 
-def generate_followup_answer(user_query, cached_chunks, top_k=5):
+def format_chunk(chunk):
+    """How a chunk appears in the follow-up prompt."""
+    return f"[{chunk['title']}]\n{chunk['content']}\n\n"
+
+@lru_cache(maxsize=4096)
+def title_header_tokens(title):
+    """Prompt tokens format_chunk adds around a chunk's content."""
+    return count_tokens(f"[{title}]\n") + 1  # + the trailing blank line
+
+def chunk_prompt_tokens(chunk):
     """
-    Generate an answer based on chat history + cached chunks.
+    Prompt tokens of a formatted chunk, from the token count stored at
+    ingestion when present (only chunks indexed before it are tokenized).
     """
+    token_count = chunk.get('token_count')
+    if token_count is None:
+        token_count = count_tokens(chunk['content'])
+    return title_header_tokens(chunk['title']) + token_count
 
-    if not cached_chunks:
-        return "No cached chunks available to answer your question."
+class ChunkContext:
+    """
+    Chunks of the recommended papers with everything follow-up ranking needs,
+    computed once per recommendation: a contiguous float32 embedding matrix,
+    the prompt token count of each chunk and the chunk ids (for BM25 scoring).
+    """
 
-    # Get recent chat history (last 5 turns)
-    history_text = ""
-    if "chat_history" in st.session_state:
-        for turn in st.session_state.chat_history[-5:]:
-            history_text += f"User: {turn['user_query']}\nAssistant: {turn['assistant_answer']}\n\n"
+    def __init__(self, chunks, embeddings, token_counts):
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.token_counts = token_counts
+        self.ids = [chunk.get('id') for chunk in chunks]
 
-    # Combine context from cached chunks
-    context = "\n\n".join(chunk['content'] for chunk in cached_chunks)
+    def __len__(self):
+        return len(self.chunks)
 
-    # Limit tokens
-    total_tokens = count_tokens(context)
-    MAX_CONTEXT_TOKENS = 3000
-    if total_tokens > MAX_CONTEXT_TOKENS:
-        context = context[:MAX_CONTEXT_TOKENS * 4]
+def build_chunk_context(chunks):
+    """
+    Build a ChunkContext, using the stored vectors in each chunk's 'values'
+    when present and embedding the remaining chunks once.
+    """
+    chunks = [dict(chunk) for chunk in chunks]
+    vectors = [chunk.pop('values', None) for chunk in chunks]
+    embedding_cache = get_embedding_cache()
 
-    # Build paper titles
-    titles_context = "\n".join([f"- {chunk['title']}" for chunk in cached_chunks])
+    embeddings = np.empty((len(chunks), embedding_cache.dimension), dtype=np.float32)
+    missing = [i for i, vector in enumerate(vectors) if vector is None or len(vector) == 0]
+    for i, vector in enumerate(vectors):
+        if vector is not None and len(vector):
+            embeddings[i] = vector
+    if missing:
+        embeddings[missing] = embedding_cache.encode(get_model(), [chunks[i]['content'] for i in missing], persist=False)
+
+    token_counts = np.array([chunk_prompt_tokens(chunk) for chunk in chunks], dtype=np.int32)
+    return ChunkContext(chunks, embeddings, token_counts)
+
+@traced("load_chunk_context")
+def load_chunk_context(titles):
+    """Fetch every chunk of the given papers with their stored vectors and build a ChunkContext."""
+    return build_chunk_context(retrieve_related_chunks_by_titles(titles, include_values=True))
+
+def lexical_chunk_scores(user_query, chunk_context, hybrid=None):
+    """
+    BM25 scores of the context's chunks for the question, or None when hybrid
+    search is off (HYBRID_SEARCH=0), the chunk BM25 index is missing or no
+    chunk matches a query term.
+    """
+    if hybrid is None:
+        hybrid = os.getenv("HYBRID_SEARCH", "1") != "0"
+    lexical = get_lexical_index()
+    if not hybrid or not len(lexical):
+        return None
+    scores = lexical.score(user_query, chunk_context.ids)
+    return scores if scores.any() else None
+
+def select_relevant_chunks(user_query, chunk_context, top_k=5, token_budget=MAX_CONTEXT_TOKENS, diversify=False,
+                           hybrid=None):
+    """
+    Rank cached chunks by similarity to the follow-up question and return the
+    best ``top_k`` that fit in ``token_budget`` prompt tokens. With hybrid
+    search the similarity ranking is fused with the chunks' BM25 ranking.
+
+    Args:
+        user_query (str): The follow-up question.
+        chunk_context (ChunkContext): Chunks with precomputed embeddings and token counts.
+        top_k (int): Maximum number of chunks.
+        token_budget (int): Maximum prompt tokens spent on chunks.
+        diversify (bool): Use MMR to spread the selection across papers.
+        hybrid (bool): Fuse in BM25 scores (default: on unless HYBRID_SEARCH=0).
+
+    Returns:
+        list of dict: Selected chunks, most relevant first.
+    """
+    query_vector = get_embedding_cache().encode_query(get_model(), user_query)
+    scores = score_chunks(query_vector, chunk_context.embeddings)
+
+    lexical_scores = lexical_chunk_scores(user_query, chunk_context, hybrid)
+    if lexical_scores is not None:
+        scores = fuse_scores(scores, lexical_scores)
 
-    # Build the full prompt
-    prompt = f"""
+    selected = select_chunks(
+        scores,
+        chunk_context.token_counts,
+        token_budget,
+        top_k,
+        chunk_vectors=chunk_context.embeddings,
+        mmr_lambda=MMR_LAMBDA if diversify else None
+    )
+    return [chunk_context.chunks[i] for i in selected]
+
+FOLLOWUP_PROMPT = """
 You are a research assistant helping the user with information about research papers.
 
 Here is the recent conversation history:
@@ -61,19 +156,149 @@ If the user mentions "this paper" or similar phrases, assume they are referring
 Generate an answer based on the most relevant paper content.
     """
 
+def build_history_text(chat_history, history_summary=None, token_budget=HISTORY_TOKEN_BUDGET,
+                       recent_turns=RECENT_TURNS):
+    """
+    The conversation part of the follow-up prompt, within ``token_budget``
+    tokens: the running summary of older turns, extractive lines for turns
+    it does not cover yet, then the latest ``recent_turns`` turns with their
+    answers shortened to TURN_ANSWER_TOKENS. Turns are dropped oldest first
+    when they do not fit.
+    """
+    if history_summary is None:
+        history_summary = HistorySummary()
+    turns = completed_turns(chat_history)
+    recent = turns[max(history_summary.turns, len(turns) - recent_turns):]
+
+    # Older turns: the running summary plus lines for turns rolled up since it was computed
+    earlier = "\n".join(filter(None, [
+        history_summary.text,
+        extractive_summary(pending_turns(turns, history_summary, recent_turns))
+    ]))
+    summary_text = ""
+    header = "Summary of the earlier conversation:\n"
+    summary_budget = min(SUMMARY_MAX_TOKENS, token_budget - count_tokens(header) - 1)
+    if earlier and summary_budget > 0:
+        summary_text = header + keep_last_tokens(earlier, summary_budget) + "\n\n"
+
+    remaining = token_budget - count_tokens(summary_text)
+    parts = []
+    for turn in reversed(recent):
+        text = f"User: {turn['user_query']}\nAssistant: {truncate_to_tokens(turn['assistant_answer'], TURN_ANSWER_TOKENS)}\n\n"
+        tokens = count_tokens(text)
+        if tokens > remaining:
+            break
+        parts.append(text)
+        remaining -= tokens
+    return summary_text + "".join(reversed(parts))
+
+def build_followup_prompt(user_query, chunk_context, top_k=5, diversify=False, chat_history=None,
+                          history_summary=None):
+    """
+    Build the follow-up prompt from the conversation and the cached chunks
+    most relevant to the question, within PROMPT_TOKEN_BUDGET tokens. The
+    instructions and the question are counted first; of what they leave,
+    the history takes up to HISTORY_TOKEN_BUDGET, the titles up to
+    TITLES_TOKEN_BUDGET, and the chunks the rest (at most MAX_CONTEXT_TOKENS).
+
+    Args:
+        user_query (str): The follow-up question.
+        chunk_context (ChunkContext): Chunks of the recommended papers.
+        top_k (int): Maximum number of chunks.
+        diversify (bool): Use MMR to spread the selection across papers.
+        chat_history (list of dict): Turns with 'user_query' and 'assistant_answer'
+            (default: st.session_state.chat_history).
+        history_summary (HistorySummary): Running summary of the older turns.
+
+    Returns:
+        str: The prompt.
+    """
+    if chat_history is None:
+        chat_history = st.session_state.get("chat_history", [])
+
+    # The instructions and the question come first; a question longer than
+    # the whole budget is cut, leaving nothing for history or chunks
+    remaining = PROMPT_TOKEN_BUDGET - count_tokens(
+        FOLLOWUP_PROMPT.format(history_text="", user_query="", titles_context="", context="")
+    )
+    question = truncate_to_tokens(user_query, max(0, remaining))
+    remaining -= count_tokens(question)
+
+    history_text = build_history_text(chat_history, history_summary, token_budget=min(HISTORY_TOKEN_BUDGET, remaining))
+    remaining -= count_tokens(history_text)
+
+    # Build paper titles
+    titles = dict.fromkeys(chunk['title'] for chunk in chunk_context.chunks)
+    titles_budget = min(TITLES_TOKEN_BUDGET, remaining)
+    titles_context = truncate_to_tokens("\n".join([f"- {title}" for title in titles]), titles_budget) \
+        if titles_budget > 0 else ""
+
+    # Chunks get the budget the rest of the prompt leaves
+    fixed_tokens = count_tokens(FOLLOWUP_PROMPT.format(
+        history_text=history_text, user_query=question, titles_context=titles_context, context=""
+    ))
+    chunk_budget = max(0, min(MAX_CONTEXT_TOKENS, PROMPT_TOKEN_BUDGET - fixed_tokens))
+
+    # Combine context from the chunks most relevant to the question
+    relevant_chunks = select_relevant_chunks(
+        question, chunk_context, top_k=top_k, token_budget=chunk_budget, diversify=diversify
+    ) if chunk_budget > 0 else []
+    context = "".join(format_chunk(chunk) for chunk in relevant_chunks)
+
+    return FOLLOWUP_PROMPT.format(
+        history_text=history_text, user_query=question, titles_context=titles_context, context=context
+    )
+
+@traced("generate_followup_answer")
+def generate_followup_answer(user_query, cached_chunks, top_k=5, diversify=False, history_summary=None):
+    """
+    Generate an answer based on chat history (the latest turns and the
+    running ``history_summary`` of older ones) + the cached chunks most
+    relevant to the question.
+
+    ``cached_chunks`` is a ChunkContext, or a plain list of chunk dicts that is
+    turned into one (embedding the chunks) on every call.
+    """
+
+    if not cached_chunks:
+        return "No cached chunks available to answer your question."
+    if not isinstance(cached_chunks, ChunkContext):
+        cached_chunks = build_chunk_context(cached_chunks)
+
+    with span("build_followup_prompt"):
+        prompt = build_followup_prompt(user_query, cached_chunks, top_k=top_k, diversify=diversify,
+                                       history_summary=history_summary)
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful research assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=10000,
-            temperature=0.1
-        )
+        with span("llm_completion", stage="followup"):
+            response = get_client().chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": "You are a helpful research assistant."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=10000,
+                temperature=0.1
+            )
+        record_usage("followup", response.usage)
 
         answer = response.choices[0].message.content.strip()
         return answer
     except Exception as e:
-        print(f"Error querying GPT-4o: {e}")
+        record_error("followup", f"Error querying GPT-4o: {e}")
         return "Error generating the follow-up answer."
+
+def stream_followup_answer(user_query, cached_chunks, top_k=5, diversify=False, history_summary=None):
+    """
+    Streaming variant of generate_followup_answer: yields the answer in text deltas.
+    """
+    if not cached_chunks:
+        yield "No cached chunks available to answer your question."
+        return
+    if not isinstance(cached_chunks, ChunkContext):
+        cached_chunks = build_chunk_context(cached_chunks)
+
+    with span("build_followup_prompt"):
+        prompt = build_followup_prompt(user_query, cached_chunks, top_k=top_k, diversify=diversify,
+                                       history_summary=history_summary)
+    yield from stream_completion(prompt, "Error generating the follow-up answer.", stage="followup")
@@ -0,0 +1,117 @@
+# rag/history_summary.py
+
+import re
+from functools import lru_cache
+from rag.rag_module import get_client
+from vectordb.pdf_extraction import get_tokenizer
+from vectordb.tracing import span, traced, record_error, record_usage
+
+RECENT_TURNS = 3           # latest turns quoted in the follow-up prompt, older ones are summarized
+SUMMARY_MAX_TOKENS = 400   # size of the running summary
+SUMMARY_INPUT_TOKENS = 1500  # per-answer cap on what the summarizer reads of each rolled-up turn
+FALLBACK_ANSWER_TOKENS = 40  # per-turn answer excerpt when a turn is not summarized by the LLM
+
+class HistorySummary:
+    """
+    Running summary of a follow-up session: ``text`` covers the first
+    ``turns`` entries of the chat history. It is updated incrementally, one
+    LLM call folding the newly rolled-up turns into the previous summary.
+    """
+
+    def __init__(self, text="", turns=0):
+        self.text = text
+        self.turns = turns
+
+@lru_cache(maxsize=256)
+def truncate_to_tokens(text, max_tokens):
+    """``text`` cut to at most ``max_tokens`` tokens (an ellipsis marks the cut)."""
+    tokenizer = get_tokenizer()
+    tokens = tokenizer.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return tokenizer.decode(tokens[:max(0, max_tokens - 1)]).rstrip() + " …"
+
+def keep_last_tokens(text, max_tokens):
+    """The end of ``text`` in at most ``max_tokens`` tokens, so the newest lines survive."""
+    tokenizer = get_tokenizer()
+    tokens = tokenizer.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return "… " + tokenizer.decode(tokens[-max(0, max_tokens - 1):]).lstrip()
+
+def completed_turns(chat_history):
+    """Chat history without the current turn, which has no answer while it is being generated."""
+    if chat_history and not chat_history[-1].get("assistant_answer"):
+        return chat_history[:-1]
+    return chat_history
+
+def pending_turns(chat_history, summary, recent_turns=RECENT_TURNS):
+    """Completed turns that have left the quoted window but are not in the summary yet."""
+    turns = completed_turns(chat_history)
+    return turns[summary.turns:max(summary.turns, len(turns) - recent_turns)]
+
+def extractive_summary(turns, answer_tokens=FALLBACK_ANSWER_TOKENS):
+    """One line per turn (the question and the start of the answer); no LLM call."""
+    lines = []
+    for turn in turns:
+        answer = re.split(r"(?<=[.!?])\s", turn["assistant_answer"].strip(), maxsplit=1)[0]
+        lines.append(f"- User asked: {turn['user_query']} / Assistant: {truncate_to_tokens(answer, answer_tokens)}")
+    return "\n".join(lines)
+
+def build_summary_prompt(summary_text, turns, max_tokens=SUMMARY_MAX_TOKENS):
+    transcript = "\n\n".join(
+        f"User: {turn['user_query']}\nAssistant: {truncate_to_tokens(turn['assistant_answer'], SUMMARY_INPUT_TOKENS)}"
+        for turn in turns
+    )
+    return f"""
+You maintain a running summary of a conversation between a user and a research assistant about research papers.
+
+Current summary:
+
+{summary_text or "(empty)"}
+
+New conversation turns:
+
+{transcript}
+
+Rewrite the summary so it also covers the new turns. Keep the paper titles discussed, the user's questions and goals, and the key conclusions; drop details that are no longer useful. Use at most {max_tokens * 3 // 4} words.
+    """
+
+@traced("summarize_history")
+def summarize_turns(summary, turns, max_tokens=SUMMARY_MAX_TOKENS):
+    """
+    Fold ``turns`` (the history entries right after the ones ``summary``
+    covers) into the running summary with one GPT-4o call. If the call fails
+    the turns are appended as extractive lines instead, keeping the newest
+    ones within ``max_tokens``.
+
+    Returns:
+        HistorySummary: The updated summary.
+    """
+    if not turns:
+        return summary
+
+    try:
+        with span("llm_completion", stage="summary"):
+            response = get_client().chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": "You are a helpful research assistant."},
+                    {"role": "user", "content": build_summary_prompt(summary.text, turns, max_tokens)}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.1
+            )
+        record_usage("summary", response.usage)
+        text = truncate_to_tokens(response.choices[0].message.content.strip(), max_tokens)
+    except Exception as e:
+        record_error("summary", f"Error querying GPT-4o: {e}")
+        text = keep_last_tokens("\n".join(filter(None, [summary.text, extractive_summary(turns)])), max_tokens)
+
+    return HistorySummary(text, summary.turns + len(turns))
+
+def update_summary(chat_history, summary=None, recent_turns=RECENT_TURNS):
+    """Summary covering every completed turn outside the quoted window (unchanged when none is pending)."""
+    if summary is None:
+        summary = HistorySummary()
+    return summarize_turns(summary, pending_turns(chat_history, summary, recent_turns))
@@ -0,0 +1,121 @@
+# rag/llm_stub.py
+#
+# Minimal local stand-in for the OpenAI chat completions endpoint, for running
+# the app and its streaming path offline:
+#
+#     python -m rag.llm_stub --port 8001
+#     GPT_BASE_URL=http://localhost:8001/v1 GPT_API_KEY=stub streamlit run streamlit_app.py
+
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubCompletionsHandler(BaseHTTPRequestHandler):
+    """
+    Answers POST /v1/chat/completions with a deterministic reply that echoes
+    the start of the last user message, either as one JSON response or as a
+    server-sent event stream when the request has "stream": true.
+    """
+
+    first_token_delay = 0.0   # seconds before the first token
+    token_delay = 0.0         # seconds between tokens
+    reply_words = 50
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply_text(self, request):
+        prompt = request["messages"][-1]["content"] if request.get("messages") else ""
+        words = (" ".join(prompt.split()[:20]) or "empty prompt").split()
+        filler = ["lorem", "ipsum", "dolor", "sit", "amet"]
+        while len(words) < self.reply_words:
+            words.append(filler[len(words) % len(filler)])
+        return "Stub answer: " + " ".join(words[:self.reply_words])
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        text = self._reply_text(request)
+        prompt_tokens = sum(len(m.get("content", "").split()) for m in request.get("messages", []))
+        completion_tokens = len(text.split())
+        base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": request.get("model", "gpt-4o")}
+
+        time.sleep(self.first_token_delay)
+
+        if not request.get("stream"):
+            body = json.dumps(dict(base,
+                object="chat.completion",
+                choices=[{"index": 0, "finish_reason": "stop",
+                          "message": {"role": "assistant", "content": text}}],
+                usage={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                       "total_tokens": prompt_tokens + completion_tokens}
+            )).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def send(payload):
+            self.wfile.write(f"data: {payload}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        tokens = text.split(" ")
+        for i, token in enumerate(tokens):
+            delta = {"content": token if i == 0 else " " + token}
+            if i == 0:
+                delta["role"] = "assistant"
+            send(json.dumps(dict(base, object="chat.completion.chunk",
+                                 choices=[{"index": 0, "delta": delta, "finish_reason": None}])))
+            time.sleep(self.token_delay)
+        send(json.dumps(dict(base, object="chat.completion.chunk",
+                             choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send(json.dumps(dict(base, object="chat.completion.chunk", choices=[],
+                                 usage={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                                        "total_tokens": prompt_tokens + completion_tokens})))
+        send("[DONE]")
+
+
+def start_stub_server(port=0, first_token_delay=0.0, token_delay=0.0):
+    """
+    Start the stub on a background thread.
+
+    Returns:
+        (server, base_url): call server.shutdown() to stop it; pass base_url
+        as GPT_BASE_URL (or OpenAI(base_url=...)).
+    """
+    handler = type("ConfiguredStubHandler", (StubCompletionsHandler,), {
+        "first_token_delay": first_token_delay,
+        "token_delay": token_delay,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the OpenAI chat completions endpoint.")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--first-token-delay", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.first_token_delay, args.token_delay)
+    print(f"Stub completions endpoint at {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
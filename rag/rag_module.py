@@ -1,25 +1,50 @@
 from openai import OpenAI
 import os
+import time
 from vectordb.retrieve_vector import retrieve_similar_papers
+from vectordb.resources import get_model, get_embedding_cache, lazy_resource
+from vectordb.tracing import span, traced, record_span, record_error, record_usage, register_collector, hit_rate_stats
+from rag.answer_cache import SemanticAnswerCache, SIMILARITY_THRESHOLD
 
-# Set up OpenAI API key
+# Set up OpenAI API key (GPT_BASE_URL can point at a local stub, see rag/llm_stub.py)
 GPT_KEY = os.getenv("GPT_API_KEY")
-client = OpenAI(api_key=GPT_KEY)
+# The client is created on first use, so importing this module stays cheap
+get_client = lazy_resource("openai_client", lambda: OpenAI(api_key=GPT_KEY, base_url=os.getenv("GPT_BASE_URL")))
 
+# Bump whenever build_recommendation_prompt changes, so cached answers are not reused
+PROMPT_VERSION = "recommend-v1"
+
+# Answers shared across sessions for near-identical queries over the same papers
+def _load_answer_cache():
+    cache = SemanticAnswerCache(threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", SIMILARITY_THRESHOLD)))
+    register_collector("answer_cache", lambda: hit_rate_stats(cache))
+    return cache
+
+_get_answer_cache = lazy_resource("answer_cache", _load_answer_cache)
+
+def get_answer_cache():
+    """The shared semantic answer cache, or None when ANSWER_CACHE=0."""
+    if os.getenv("ANSWER_CACHE", "1") == "0":
+        return None
+    return _get_answer_cache()
+
+@traced("generate_answer_with_rag")
 def generate_answer_with_rag(query: str, top_k=5) -> str:
     """
     Use Retrieval-Augmented Generation (RAG) to generate an answer based on top-k retrieval results.
     """
     top_k_papers = retrieve_similar_papers(query, top_k)
+    return generate_answer_from_papers(query, top_k_papers)
 
-    if not top_k_papers:
-        return "No relevant papers found."
-
+def build_recommendation_prompt(query: str, top_k_papers: list) -> str:
+    """
+    Build the GPT-4o prompt asking to summarize the retrieved papers.
+    """
     context = "\n\n".join([
         f"Title: {paper['title']}\nAuthors: {paper['authors']}\nAbstract URL: {paper['abstract_url']}" for paper in top_k_papers
     ])
 
-    prompt = f"""
+    return f"""
     User asked for this question about finding suitable papers:
 
     {query}
@@ -33,20 +58,118 @@ def generate_answer_with_rag(query: str, top_k=5) -> str:
     The answer is:
     """
 
+def generate_answer_from_papers(query: str, top_k_papers: list) -> str:
+    """
+    Generate an answer from papers the caller already retrieved, so a
+    recommendation needs only one embedding, one vector query and one LLM call.
+    """
+    if not top_k_papers:
+        return "No relevant papers found."
+
+    cached_answer, query_vector = lookup_cached_answer(query, top_k_papers)
+    if cached_answer is not None:
+        return cached_answer
+
+    prompt = build_recommendation_prompt(query, top_k_papers)
+
+    try:
+        with span("llm_completion", stage="recommend"):
+            response = get_client().chat.completions.create(model="gpt-4o",
+            messages=[
+                {"role": "system", "content": "You are a helpful research assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=10000,
+            temperature=0.1)
+        record_usage("recommend", response.usage)
+
+        answer = response.choices[0].message.content.strip()
+        store_cached_answer(query, query_vector, top_k_papers, answer)
+        return answer
+    except Exception as e:
+        record_error("recommend", f"Error querying GPT-4o: {e}")
+        return "Error generating the answer."
+
+def lookup_cached_answer(query: str, top_k_papers: list):
+    """
+    Look the request up in the semantic answer cache.
+
+    Returns:
+        (answer or None, query embedding): the embedding comes from the query
+        embedding cache, so it costs no extra forward pass after retrieval.
+    """
+    answer_cache = get_answer_cache()
+    if answer_cache is None:
+        return None, None
+    query_vector = get_embedding_cache().encode_query(get_model(), query)
+    return answer_cache.lookup(query_vector, top_k_papers, PROMPT_VERSION), query_vector
+
+def store_cached_answer(query: str, query_vector, top_k_papers: list, answer: str):
+    answer_cache = get_answer_cache()
+    if answer_cache is not None and query_vector is not None:
+        answer_cache.store(query, query_vector, top_k_papers, PROMPT_VERSION, answer)
+
+def stream_completion(prompt: str, error_message: str, on_complete=None, stage="recommend"):
+    """
+    Stream a GPT-4o completion, yielding text deltas as they arrive.
+    On failure the error message is yielded instead; on success
+    ``on_complete`` is called with the full answer.
+
+    The completion is recorded as an 'llm_stream' span with its time to first
+    token, and its token usage is counted under ``stage``.
+    """
+    start = time.perf_counter()
+    first_token_ms = None
     try:
-        response = client.chat.completions.create(model="gpt-4o",
+        response = get_client().chat.completions.create(model="gpt-4o",
         messages=[
             {"role": "system", "content": "You are a helpful research assistant."},
             {"role": "user", "content": prompt}
         ],
         max_tokens=10000,
-        temperature=0.1)
+        temperature=0.1,
+        stream=True,
+        stream_options={"include_usage": True})
 
-        answer = response.choices[0].message.content.strip()
-        return answer
+        parts = []
+        for event in response:
+            if getattr(event, "usage", None) is not None:
+                record_usage(stage, event.usage)
+            if event.choices and event.choices[0].delta.content:
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                parts.append(event.choices[0].delta.content)
+                yield parts[-1]
     except Exception as e:
-        print(f"Error querying GPT-4o: {e}")
-        return "Error generating the answer."
+        record_span("llm_stream", time.perf_counter() - start, error=e, stage=stage)
+        record_error(stage, f"Error querying GPT-4o: {e}")
+        yield error_message
+        return
+
+    record_span("llm_stream", time.perf_counter() - start, stage=stage, first_token_ms=first_token_ms)
+
+    if on_complete is not None:
+        on_complete("".join(parts).strip())
+
+def stream_answer_from_papers(query: str, top_k_papers: list):
+    """
+    Streaming variant of generate_answer_from_papers: yields the answer in
+    text deltas, so the UI can render it as soon as the first token arrives.
+    """
+    if not top_k_papers:
+        yield "No relevant papers found."
+        return
+
+    cached_answer, query_vector = lookup_cached_answer(query, top_k_papers)
+    if cached_answer is not None:
+        yield cached_answer
+        return
+
+    yield from stream_completion(
+        build_recommendation_prompt(query, top_k_papers),
+        "Error generating the answer.",
+        on_complete=lambda answer: store_cached_answer(query, query_vector, top_k_papers, answer)
+    )
 
 # === Example Usage (For testing purposes) ===
 if __name__ == "__main__":
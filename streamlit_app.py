@@ -1,16 +1,79 @@
+import os
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-from rag.rag_module import generate_answer_with_rag
-from rag.followup_module import generate_followup_answer
+
+_import_start = time.perf_counter()
+from rag.rag_module import stream_answer_from_papers
+from rag.followup_module import stream_followup_answer, load_chunk_context
+from rag.history_summary import HistorySummary, update_summary, pending_turns
 from vectordb.retrieve_vector import retrieve_similar_papers
-from vectordb.retrieve_chunks import retrieve_related_chunks_by_titles
+from vectordb.resources import record_timing, startup_report, warm_up
+from vectordb.tracing import span, snapshot, recent_traces, record_error
+record_timing("import:app_modules", time.perf_counter() - _import_start)
 
 st.set_page_config(page_title="Research Assistant", page_icon="📚")
 
 @st.cache_resource
-def store_chunks_in_cache(chunks_data):
-    return chunks_data
+def start_warm_up():
+    """
+    Load the embedding model and open the indexes in the background once per
+    process, so the page renders immediately and the first query is not cold.
+    """
+    return warm_up()
+
+@st.cache_resource
+def get_prefetch_executor():
+    """
+    Thread pool shared by all sessions for fetching paper chunks while the
+    LLM is generating the recommendation summary.
+    """
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="chunk-prefetch")
+
+def refresh_history_summary():
+    """
+    Pick up the running chat summary once its background update has finished,
+    then start the next update if turns have left the quoted window. Turns
+    not summarized yet appear as extractive lines in the follow-up prompt, so
+    a request never waits for the summarizer. A failed update keeps the
+    previous summary and is retried on the next turn.
+    """
+    future = st.session_state.summary_future
+    if future is not None:
+        if not future.done():
+            return
+        st.session_state.summary_future = None
+        try:
+            st.session_state.history_summary = future.result()
+        except Exception as e:
+            record_error("history_summary", f"Error updating the chat summary: {e}")
+    if pending_turns(st.session_state.chat_history, st.session_state.history_summary):
+        st.session_state.summary_future = get_prefetch_executor().submit(
+            update_summary, list(st.session_state.chat_history), st.session_state.history_summary
+        )
+
+def show_debug_panel():
+    """Latency of the last requests, per-stage aggregates, token counts and cache hit rates."""
+    with st.sidebar.expander("🩺 Debug panel", expanded=True):
+        traces = recent_traces(limit=1)
+        if traces:
+            trace = traces[0]
+            st.caption(f"Last request: {trace['duration_ms']:.0f} ms")
+            st.dataframe([
+                {"span": record["name"], "ms": round(record["duration_ms"], 1), "error": record["error"] or ""}
+                for record in sorted(trace["children"], key=lambda record: record["start"])
+            ], hide_index=True)
+        data = snapshot()
+        st.json({
+            "spans": {name: {key: round(value, 1) for key, value in stats.items()}
+                      for name, stats in data["spans"].items()},
+            "counters": data["counters"],
+            "caches": data["collectors"],
+        }, expanded=False)
 
 def main():
+    start_warm_up()
     st.title("📚 Research Paper Chatbot with RAG")
     
     if "messages" not in st.session_state:
@@ -19,8 +82,14 @@ def main():
         st.session_state.mode = "Recommend Papers"
     if "cached_chunks" not in st.session_state:
         st.session_state.cached_chunks = None
+    if "chunk_context" not in st.session_state:
+        st.session_state.chunk_context = None
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = [] 
+    if "history_summary" not in st.session_state:
+        st.session_state.history_summary = HistorySummary()
+    if "summary_future" not in st.session_state:
+        st.session_state.summary_future = None
 
     st.sidebar.title("🔀 Mode Selection")
     st.session_state.mode = st.sidebar.radio(
@@ -28,12 +97,25 @@ def main():
         ("Recommend Papers", "Follow-up Questions")
     )
 
+    with st.sidebar.expander("🔎 Paper filters"):
+        first_year = st.number_input("From year", min_value=0, max_value=2100, value=0, help="0 = any")
+        last_year = st.number_input("To year", min_value=0, max_value=2100, value=0, help="0 = any")
+        venue = st.text_input("Venue", placeholder="e.g. cvpr")
+        author = st.text_input("Author contains")
+    year_range = (first_year or None, last_year or None)
+
     if st.sidebar.button("Show Cached Chunks (JSON)"):
         if st.session_state.cached_chunks:
             st.json(st.session_state.cached_chunks) 
         else:
             st.sidebar.write("No cached chunks available.")
 
+    with st.sidebar.expander("Startup timings (ms)"):
+        st.json({name: round(ms, 1) for name, ms in startup_report().items()})
+
+    if st.sidebar.checkbox("Show debug panel", value=os.getenv("DEBUG_PANEL", "0") == "1"):
+        show_debug_panel()
+
     # === Chat input ===
     user_input = st.chat_input("Ask your research question here...")
 
@@ -54,39 +136,72 @@ def main():
             "assistant_answer": answer  # Empty answer until it's generated
         })
 
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
+        with st.chat_message("assistant"), span("request", mode=st.session_state.mode):
+            try:
+                answer_stream = None
+                context_future = None
+
+                with st.spinner("Thinking..."):
                     if st.session_state.mode == "Recommend Papers":
                         # === Recommend Papers Mode ===
-                        top_k_papers = retrieve_similar_papers(user_input, top_k=5)
+                        top_k_papers = retrieve_similar_papers(
+                            user_input, top_k=5, year_range=year_range, venue=venue, author=author
+                        )
                         if not top_k_papers:
                             answer = "No relevant papers found."
                         else:
-                            answer = generate_answer_with_rag(user_input, top_k=5)
-
+                            # Start fetching full-text chunks (with their vectors and token
+                            # counts) as soon as the titles are known, so it overlaps with
+                            # the GPT-4o call. It runs in a copy of this context so its spans
+                            # join the request's trace
                             titles = [paper['title'] for paper in top_k_papers]
-                            related_chunks = retrieve_related_chunks_by_titles(titles)
-                            st.session_state.cached_chunks = store_chunks_in_cache(related_chunks)
+                            context_future = get_prefetch_executor().submit(
+                                contextvars.copy_context().run, load_chunk_context, titles
+                            )
+
+                            answer_stream = stream_answer_from_papers(user_input, top_k_papers)
 
                     elif st.session_state.mode == "Follow-up Questions":
                         # === Follow-up Questions Mode ===
-                        if st.session_state.cached_chunks is None:
+                        if st.session_state.chunk_context is None:
                             answer = "No recommended papers found yet. Please search for papers first."
                         else:
-                            answer = generate_followup_answer(user_input, st.session_state.cached_chunks)
+                            refresh_history_summary()
+                            answer_stream = stream_followup_answer(
+                                user_input, st.session_state.chunk_context,
+                                history_summary=st.session_state.history_summary
+                            )
 
+                # Render GPT-4o output token by token; write_stream returns the full text
+                if answer_stream is not None:
+                    answer = st.write_stream(answer_stream)
+                else:
                     st.markdown(answer)
-                    st.session_state.messages.append({"role": "assistant", "content": answer})
-                    # Update the chat history with the new answer
-                    st.session_state.chat_history[-1]["assistant_answer"] = answer  # Update the latest entry in chat history
 
-                except Exception as e:
-                    # If any error happens, show a user-friendly message
-                    answer = "Sorry, something went wrong. Please try again later."
-                    st.markdown(answer)
-                    st.session_state.messages.append({"role": "assistant", "content": answer})
-                    st.session_state.chat_history[-1]["assistant_answer"] = answer  # Update the latest entry in chat history
+                if context_future is not None:
+                    # The answer has already been shown, so a failed chunk fetch
+                    # only disables follow-ups instead of replacing it
+                    try:
+                        chunk_context = context_future.result()
+                        st.session_state.chunk_context = chunk_context
+                        st.session_state.cached_chunks = chunk_context.chunks
+                    except Exception as e:
+                        record_error("prefetch", f"Error loading paper chunks: {e}")
+                        st.session_state.chunk_context = None
+                        st.session_state.cached_chunks = None
+                        st.warning("The full text of these papers could not be loaded, so follow-up questions are unavailable. Please search again.")
+
+                st.session_state.messages.append({"role": "assistant", "content": answer})
+                # Update the chat history with the new answer
+                st.session_state.chat_history[-1]["assistant_answer"] = answer  # Update the latest entry in chat history
+                refresh_history_summary()
+
+            except Exception as e:
+                # If any error happens, show a user-friendly message
+                answer = "Sorry, something went wrong. Please try again later."
+                st.markdown(answer)
+                st.session_state.messages.append({"role": "assistant", "content": answer})
+                st.session_state.chat_history[-1]["assistant_answer"] = answer  # Update the latest entry in chat history
 
 # === Main ===
 if __name__ == "__main__":
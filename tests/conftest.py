@@ -0,0 +1,36 @@
+import os
+import sys
+import pytest
+
+# Tests import the repo's packages (vectordb, rag, benchmarks) from the checkout root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def local_backend(tmp_path, monkeypatch):
+    """
+    Local vector store and sidecar files under ``tmp_path``, with the shared
+    resources (indexes, posting files, embedding cache) rebuilt for the test.
+    """
+    from vectordb import resources
+
+    monkeypatch.setenv("VECTOR_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_STORE_DIR", str(tmp_path))
+    state = (resources._resources, resources._index_getters, resources._created_indexes)
+    saved = [dict(state[0]), dict(state[1]), set(state[2])]
+    for container in state:
+        container.clear()
+    yield tmp_path
+    for container, contents in zip(state, saved):
+        container.clear()
+        container.update(contents)
+
+
+@pytest.fixture
+def tokenizer():
+    """The cl100k tokenizer; tests that count prompt tokens are skipped when it cannot be loaded (offline)."""
+    from vectordb.pdf_extraction import get_tokenizer
+    try:
+        return get_tokenizer()
+    except Exception as e:
+        pytest.skip(f"cl100k_base tokenizer unavailable: {e}")
@@ -0,0 +1,36 @@
+import numpy as np
+from vectordb.ann_index import recall_report
+from vectordb.local_store import LocalVectorStore
+
+
+def clustered_vectors(rows, dimension, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    return centers[rng.integers(clusters, size=rows)] + 0.3 * rng.normal(size=(rows, dimension))
+
+
+def test_ivf_recall_against_exact_search(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "store"), dimension=16)
+    vectors = clustered_vectors(2000, 16, clusters=20)
+    store.upsert(vectors=[{"id": f"v{i}", "values": vector.tolist()} for i, vector in enumerate(vectors)])
+    ivf = store.build_ann_index(nlist=32, nprobe=8)
+    assert ivf is not None and ivf.num_rows == 2000
+
+    report = {entry["nprobe"]: entry["recall"] for entry in recall_report(store, (1, 8, 32), num_queries=100)}
+    assert report[8] >= 0.9
+    assert report[32] == 1.0  # probing every list is exact
+    assert report[1] <= report[8]
+
+
+def test_build_falls_back_to_exact_search_on_small_stores(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "store"), dimension=8)
+    assert store.build_ann_index() is None  # empty store
+
+    vectors = np.random.default_rng(0).normal(size=(10, 8))
+    store.upsert(vectors=[{"id": f"v{i}", "values": vector.tolist()} for i, vector in enumerate(vectors)])
+    assert store.build_ann_index(nlist=4) is not None
+    store.delete(ids=[f"v{i}" for i in range(8)])
+    assert store.build_ann_index(nlist=4) is None and store.ann_index is None
+
+    matches = store.query(vector=vectors[9].tolist(), top_k=5).matches
+    assert [match.id for match in matches] == ["v9", "v8"]
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from rag import answer_cache
+from rag.answer_cache import SemanticAnswerCache, SIMILARITY_THRESHOLD
+
+PAPERS = [{"id": "2023_a"}, {"id": "2023_b"}]
+
+
+def at_cosine(similarity):
+    """A 2-d vector with the given cosine similarity to [1, 0]."""
+    return np.array([similarity, np.sqrt(1 - similarity ** 2)], dtype=np.float32)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_threshold_separates_paraphrases_from_different_questions(tmp_path, clock):
+    cache = SemanticAnswerCache(str(tmp_path / "answers.sqlite3"))
+    cache.store("q", [1.0, 0.0], PAPERS, "v1", "cached answer")
+
+    assert cache.lookup(at_cosine(SIMILARITY_THRESHOLD + 0.01), PAPERS, "v1") == "cached answer"
+    assert cache.lookup(at_cosine(SIMILARITY_THRESHOLD - 0.01), PAPERS, "v1") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_prompt_version_and_paper_set_changes_invalidate(tmp_path, clock):
+    cache = SemanticAnswerCache(str(tmp_path / "answers.sqlite3"))
+    cache.store("q", [1.0, 0.0], PAPERS, "v1", "cached answer")
+
+    assert cache.lookup([1.0, 0.0], list(reversed(PAPERS)), "v1") == "cached answer"  # order does not matter
+    assert cache.lookup([1.0, 0.0], PAPERS, "v2") is None
+    assert cache.lookup([1.0, 0.0], PAPERS[:1], "v1") is None
+    assert cache.lookup([1.0, 0.0], PAPERS + [{"id": "2023_c"}], "v1") is None
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    path = str(tmp_path / "answers.sqlite3")
+    cache = SemanticAnswerCache(path, ttl_seconds=60)
+    cache.store("q", [1.0, 0.0], PAPERS, "v1", "cached answer")
+
+    clock[0] += 59
+    assert cache.lookup([1.0, 0.0], PAPERS, "v1") == "cached answer"
+    clock[0] += 2
+    assert cache.lookup([1.0, 0.0], PAPERS, "v1") is None
+
+    # The expired row is deleted by the next store and not reloaded after a restart
+    cache.store("other", [0.0, 1.0], PAPERS, "v1", "other answer")
+    reopened = SemanticAnswerCache(path, ttl_seconds=60)
+    assert reopened.lookup([1.0, 0.0], PAPERS, "v1") is None
+    assert reopened.lookup([0.0, 1.0], PAPERS, "v1") == "other answer"
+
+
+def test_least_recently_used_entries_are_evicted_beyond_max_entries(tmp_path, clock):
+    cache = SemanticAnswerCache(str(tmp_path / "answers.sqlite3"), max_entries=2)
+    for i, vector in enumerate(([1.0, 0.0], [0.0, 1.0])):
+        clock[0] += 1
+        cache.store(f"q{i}", vector, PAPERS, "v1", f"answer {i}")
+
+    clock[0] += 1
+    assert cache.lookup([1.0, 0.0], PAPERS, "v1") == "answer 0"  # now more recent than answer 1
+    clock[0] += 1
+    cache.store("q2", [1.0, 1.0], PAPERS, "v1", "answer 2")
+
+    assert cache.lookup([1.0, 0.0], PAPERS, "v1") == "answer 0"
+    assert cache.lookup([0.0, 1.0], PAPERS, "v1") is None
+    assert cache.lookup([1.0, 1.0], PAPERS, "v1") == "answer 2"
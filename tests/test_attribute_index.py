@@ -0,0 +1,51 @@
+import numpy as np
+from vectordb.attribute_index import AttributeIndex, MAX_INDEXED_STRING, MAX_WORD_INDEXED_STRING
+from vectordb.local_store import matches_filter
+
+
+def build(rows):
+    index = AttributeIndex()
+    for row, metadata in enumerate(rows):
+        index.add(row, metadata)
+    return index
+
+
+def scan(rows, query_filter):
+    return [row for row, metadata in enumerate(rows) if matches_filter(metadata, query_filter)]
+
+
+def test_long_author_list_keeps_author_filter_indexed():
+    rows = [{"authors": f"Author {i}, Jane Doe" if i % 2 else f"Author {i}", "year": 2020 + i % 3} for i in range(50)]
+    long_authors = ", ".join(f"Coauthor Number{i}" for i in range(25)) + ", Kaiming He"
+    assert MAX_INDEXED_STRING < len(long_authors) <= MAX_WORD_INDEXED_STRING
+    rows.append({"authors": long_authors, "year": 2021})
+    index = build(rows)
+
+    for query_filter in (
+        {"authors": {"$contains": "kaiming he"}},
+        {"authors": {"$contains": "Jane"}},
+        {"authors": {"$contains": "Author 1"}},
+        {"$and": [{"authors": {"$contains": "doe"}}, {"year": {"$gte": 2021}}]},
+    ):
+        rows_found = index.rows(query_filter, rows.__getitem__)
+        assert rows_found is not None, query_filter  # answered from postings, no linear scan
+        assert rows_found.tolist() == scan(rows, query_filter)
+
+    # $eq on the long value itself has no exact-value posting and falls back to the scan
+    assert index.rows({"authors": long_authors}, rows.__getitem__) is None
+
+
+def test_values_outside_the_word_index_are_confirmed_per_row():
+    rows = [
+        {"content": "short text about lidar"},
+        {"content": "lidar " * (MAX_WORD_INDEXED_STRING // 5)},
+        {"content": ["lidar", "camera"]},
+        {"content": None},
+        {"content": "camera only"},
+    ]
+    index = build(rows)
+
+    for query_filter in ({"content": {"$contains": "lidar"}}, {"content": {"$contains": "camera"}}):
+        rows_found = index.rows(query_filter, rows.__getitem__)
+        assert rows_found is not None
+        np.testing.assert_array_equal(rows_found, scan(rows, query_filter))
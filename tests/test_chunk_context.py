@@ -0,0 +1,35 @@
+import numpy as np
+from vectordb.local_store import Record
+from vectordb.retrieve_chunks import _chunk_from_record
+
+
+def chunk_records(dimension=384):
+    vectors = np.random.default_rng(1).normal(size=(2, dimension)).astype(np.float32)
+    metadata = [
+        {"paper_id": "2024_0", "title": "Paper A", "content": "First chunk.", "token_count": 3, "chunk_index": 0},
+        {"paper_id": "2024_0", "title": "Paper A", "content": "Second chunk.", "token_count": 3, "chunk_index": 1},
+    ]
+    as_dicts = [{"id": f"c{i}", "values": vectors[i].tolist(), "metadata": metadata[i]} for i in range(2)]
+    as_records = [Record(id=f"c{i}", values=vectors[i].tolist(), metadata=metadata[i]) for i in range(2)]
+    return vectors, as_dicts, as_records
+
+
+def test_chunk_from_record_reads_values_of_both_record_shapes():
+    vectors, as_dicts, as_records = chunk_records()
+    for records in (as_dicts, as_records):
+        chunks = [_chunk_from_record(record, include_values=True) for record in records]
+        assert [chunk["id"] for chunk in chunks] == ["c0", "c1"]
+        assert [chunk["token_count"] for chunk in chunks] == [3, 3]
+        np.testing.assert_allclose(np.stack([chunk["values"] for chunk in chunks]), vectors)
+
+
+def test_chunk_context_uses_stored_vectors_of_both_record_shapes(local_backend, tokenizer):
+    from rag.followup_module import build_chunk_context
+
+    vectors, as_dicts, as_records = chunk_records()
+    for records in (as_dicts, as_records):
+        context = build_chunk_context([_chunk_from_record(record, include_values=True) for record in records])
+        assert len(context) == 2
+        assert context.ids == ["c0", "c1"]
+        np.testing.assert_allclose(context.embeddings, vectors)
+        assert all(count > 3 for count in context.token_counts)  # stored count + title header
@@ -0,0 +1,33 @@
+import numpy as np
+from rag.chunk_ranking import _mmr_order, fuse_scores, select_chunks
+
+
+def test_select_chunks_skips_chunks_that_overflow_the_budget():
+    scores = [0.9, 0.8, 0.7, 0.6]
+    tokens = [300, 500, 150, 100]
+
+    # 300 fits, 500 would overflow 600 and is skipped for the smaller, lower-ranked chunks
+    assert select_chunks(scores, tokens, token_budget=600, top_k=5) == [0, 2, 3]
+    assert select_chunks(scores, tokens, token_budget=600, top_k=2) == [0, 2]
+    assert select_chunks(scores, tokens, token_budget=50, top_k=5) == []
+
+
+def test_mmr_order_demotes_near_duplicates():
+    vectors = np.array([[1.0, 0.0], [0.99, 0.05], [0.0, 1.0]])
+    scores = np.array([0.9, 0.89, 0.5])
+
+    assert list(_mmr_order(scores, vectors, mmr_lambda=1.0)) == [0, 1, 2]
+    assert list(_mmr_order(scores, vectors, mmr_lambda=0.5)) == [0, 2, 1]
+    # With MMR the selection spreads over both directions within the same budget
+    assert select_chunks(scores, [100] * 3, 200, 2, chunk_vectors=vectors, mmr_lambda=0.5) == [0, 2]
+
+
+def test_fuse_scores_rewards_lexical_matches():
+    dense = [0.9, 0.8, 0.7]
+    fused = fuse_scores(dense, [0.0, 0.0, 0.0])
+    assert np.argmax(fused) == 0 and fused.max() == 1.0
+
+    # A lexical match on the third chunk lifts it above the unmatched second one
+    fused = fuse_scores(dense, [0.0, 0.0, 5.0])
+    assert list(np.argsort(-fused)) == [2, 0, 1]
+    assert len(fuse_scores([], [])) == 0
@@ -0,0 +1,20 @@
+import numpy as np
+from vectordb.embedding_cache import EmbeddingCache
+
+
+def test_writers_sharing_a_directory_keep_each_others_rows(tmp_path):
+    # Two ingestion jobs (e.g. abstracts and full text) with the same model open the same cache
+    first = EmbeddingCache(str(tmp_path), dimension=4)
+    second = EmbeddingCache(str(tmp_path), dimension=4)
+    vectors = np.random.default_rng(0).normal(size=(3, 4)).astype(np.float32)
+
+    first.put_many(["abstract a"], vectors[:1])
+    second.put_many(["chunk b", "abstract a"], vectors[1:3])  # "abstract a" is already on disk
+    first.put_many(["chunk c"], vectors[2:3])
+
+    reopened = EmbeddingCache(str(tmp_path), dimension=4)
+    assert len(reopened) == 3
+    np.testing.assert_array_equal(reopened.get("abstract a"), vectors[0])
+    np.testing.assert_array_equal(reopened.get("chunk b"), vectors[1])
+    np.testing.assert_array_equal(reopened.get("chunk c"), vectors[2])
+    np.testing.assert_array_equal(first.get("chunk b"), vectors[1])
@@ -0,0 +1,41 @@
+import pytest
+from benchmarks.synthetic import FakeEncoder, TextGenerator
+from vectordb.resources import set_resource
+
+
+@pytest.fixture
+def chunk_context(local_backend, tokenizer):
+    from rag.followup_module import build_chunk_context
+
+    set_resource("model", FakeEncoder())
+    text = TextGenerator(5)
+    titles = [text.title() for _ in range(5)]
+    return build_chunk_context([
+        {"id": f"c{i}", "title": titles[i % 5], "content": text.paragraph(12)} for i in range(40)
+    ])
+
+
+def long_history(turns=12):
+    text = TextGenerator(6)
+    return [{"user_query": text.sentence(), "assistant_answer": " ".join(text.paragraph(40) for _ in range(6))}
+            for _ in range(turns)]
+
+
+def test_long_question_is_counted_against_the_prompt_budget(chunk_context):
+    from rag.followup_module import PROMPT_TOKEN_BUDGET, build_followup_prompt, count_tokens
+
+    text = TextGenerator(7)
+    history = long_history()
+    for words in (20, 2000, 5000, 20000):
+        question = " ".join(text.sentence() for _ in range(words // 16 + 1))
+        prompt = build_followup_prompt(question, chunk_context, chat_history=history)
+        assert count_tokens(prompt) <= PROMPT_TOKEN_BUDGET, words
+
+
+def test_short_question_keeps_history_and_chunks(chunk_context):
+    from rag.followup_module import build_followup_prompt, format_chunk
+
+    history = long_history()
+    prompt = build_followup_prompt("Which loss does the method use?", chunk_context, chat_history=history)
+    assert history[-1]["user_query"] in prompt
+    assert any(format_chunk(chunk) in prompt for chunk in chunk_context.chunks)
@@ -0,0 +1,19 @@
+import numpy as np
+from vectordb import full2vector
+from vectordb.resources import get_index
+
+
+def test_backfill_adds_unchanged_chunks_missing_from_the_bm25_index(local_backend):
+    manifest, lexical = full2vector.get_manifest(), full2vector.get_lexical_index()
+    chunks = {"2023_1#0-a": "NeRF from sparse views", "2023_1#1-b": "BEV fusion of LiDAR and camera"}
+    get_index(full2vector.INDEX_NAME, create=True).upsert(vectors=[
+        {"id": vector_id, "values": np.ones(384).tolist(), "metadata": {"paper_id": "2023_1", "content": content}}
+        for vector_id, content in chunks.items()
+    ])
+    manifest.record("2023_1", {"sha256": "x"}, list(chunks))
+    lexical.add("2023_1#0-a", chunks["2023_1#0-a"])
+
+    assert full2vector.backfill_lexical_index(["2023_1"], batch_size=1) == 1
+    assert "2023_1#1-b" in lexical
+    assert [doc_id for doc_id, _ in lexical.search("lidar", top_k=5)] == ["2023_1#1-b"]
+    assert full2vector.backfill_lexical_index(["2023_1"]) == 0
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+from rag.history_summary import HistorySummary, pending_turns, update_summary
+from vectordb.resources import set_resource
+
+
+def history(turns, answered=True):
+    entries = [{"user_query": f"Question {i}?", "assistant_answer": f"Answer {i}. More detail on {i}."}
+               for i in range(turns)]
+    if not answered:
+        entries[-1]["assistant_answer"] = ""  # the turn being generated
+    return entries
+
+
+def test_pending_turns_are_the_completed_turns_left_of_the_quoted_window():
+    chat = history(6)
+    assert pending_turns(chat, HistorySummary(), recent_turns=3) == chat[:3]
+    assert pending_turns(chat, HistorySummary("...", turns=2), recent_turns=3) == chat[2:3]
+    assert pending_turns(chat, HistorySummary("...", turns=3), recent_turns=3) == []
+    assert pending_turns(history(2), HistorySummary(), recent_turns=3) == []
+    # The unanswered current turn does not count towards the window
+    assert pending_turns(history(7, answered=False), HistorySummary(), recent_turns=3) == history(3)
+
+
+def test_update_summary_falls_back_to_extractive_lines_when_the_llm_fails(local_backend, tokenizer):
+    def fail(**kwargs):
+        raise RuntimeError("rate limited")
+
+    set_resource("openai_client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=fail))))
+    chat = history(6)
+
+    summary = update_summary(chat, recent_turns=3)
+    assert summary.turns == 3
+    assert summary.text.splitlines() == [
+        f"- User asked: Question {i}? / Assistant: Answer {i}." for i in range(3)
+    ]
+
+    # The next update appends to the previous summary; nothing pending leaves it unchanged
+    chat += history(7)[6:]
+    summary = update_summary(chat, summary, recent_turns=3)
+    assert summary.turns == 4 and summary.text.endswith("- User asked: Question 3? / Assistant: Answer 3.")
+    assert update_summary(chat, summary, recent_turns=3) is summary
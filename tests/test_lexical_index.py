@@ -0,0 +1,81 @@
+import math
+from collections import Counter
+import numpy as np
+import pytest
+from benchmarks.synthetic import TextGenerator
+from vectordb import lexical_index
+from vectordb.lexical_index import BM25Index, K1, B, reciprocal_rank_fusion, tokenize
+
+
+def reference_bm25(documents, query):
+    """Textbook BM25 over a dict of id -> text."""
+    tokens = {doc_id: Counter(tokenize(text)) for doc_id, text in documents.items()}
+    average_length = sum(sum(terms.values()) for terms in tokens.values()) / len(tokens)
+    df = {term: sum(term in terms for terms in tokens.values()) for term in set(tokenize(query))}
+    scores = {}
+    for doc_id, terms in tokens.items():
+        score = 0.0
+        for term in df:
+            tf = terms[term]
+            if tf:
+                idf = math.log1p((len(tokens) - df[term] + 0.5) / (df[term] + 0.5))
+                score += idf * (K1 + 1) * tf / (tf + K1 * (1 - B + B * sum(terms.values()) / average_length))
+        if score:
+            scores[doc_id] = score
+    return scores
+
+
+@pytest.fixture
+def documents():
+    text = TextGenerator(11)
+    docs = {f"d{i}": text.paragraph(3) for i in range(300)}
+    docs["nerf"] = "NeRF: neural radiance fields from sparse views"
+    docs["bev"] = "BEV fusion of LiDAR and camera features"
+    return docs
+
+
+@pytest.mark.parametrize("common_term_min_docs", [lexical_index.COMMON_TERM_MIN_DOCS, 1])
+def test_scores_match_reference_bm25(tmp_path, monkeypatch, documents, common_term_min_docs):
+    # With a minimum of 1 the common-term rescoring path is used on this small index too
+    monkeypatch.setattr(lexical_index, "COMMON_TERM_MIN_DOCS", common_term_min_docs)
+    index = BM25Index(str(tmp_path / "bm25"))
+    for doc_id, text in documents.items():
+        index.add(doc_id, text)
+
+    text = TextGenerator(11)
+    for query in [text.sentence() for _ in range(5)] + ["NeRF radiance fields", "lidar BEV"]:
+        expected = reference_bm25(documents, query)
+        best = sorted(expected, key=lambda doc_id: -expected[doc_id])[:10]
+        results = index.search(query, top_k=10)
+        if common_term_min_docs == 1:
+            # Documents matching only common terms may be left out, never misranked above rare matches
+            assert {doc_id for doc_id, _ in results} <= set(expected)
+            continue
+        assert [doc_id for doc_id, _ in results] == best
+        np.testing.assert_allclose([score for _, score in results], [expected[doc_id] for doc_id in best], rtol=1e-4)
+
+
+def test_exact_terms_removal_and_persistence(tmp_path, documents):
+    path = str(tmp_path / "bm25")
+    index = BM25Index(path)
+    for doc_id, text in documents.items():
+        index.add(doc_id, text)
+    assert index.search("nerf", top_k=3)[0][0] == "nerf"
+    assert index.search("the of and", top_k=3) == []  # stop words only
+
+    index.remove("nerf")
+    index.remove("unknown")
+    index.save()
+    reopened = BM25Index(path)
+    assert len(reopened) == len(documents) - 1 and "nerf" not in reopened
+    assert reopened.search("nerf") == []
+    scores = reopened.score("lidar camera", ["bev", "d0", "missing"])
+    assert scores[0] > 0 and list(scores[1:]) == [0.0, 0.0]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["d", "b", "e"]], k=60)
+    assert [doc_id for doc_id, _ in fused][:3] == ["b", "a", "d"]
+    assert dict(fused)["b"] == pytest.approx(2 / 62)
+    assert dict(fused)["e"] == pytest.approx(1 / 63)
+    assert reciprocal_rank_fusion([]) == []
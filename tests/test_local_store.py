@@ -0,0 +1,67 @@
+import threading
+import numpy as np
+from vectordb.local_store import LocalVectorStore
+
+
+def make_store(tmp_path, rows=20, dimension=8):
+    vectors = np.random.default_rng(0).normal(size=(rows, dimension)).astype(np.float32)
+    store = LocalVectorStore(str(tmp_path / "store"), dimension=dimension)
+    store.upsert(vectors=[
+        {"id": f"v{i}", "values": vectors[i].tolist(), "metadata": {"title": f"Paper {i}"}}
+        for i in range(rows)
+    ])
+    return store, vectors
+
+
+def test_records_expose_fields_as_attributes_and_items(tmp_path):
+    store, vectors = make_store(tmp_path)
+
+    response = store.query(vector=vectors[3].tolist(), top_k=3, include_metadata=True, include_values=True)
+    match = response.matches[0]
+    assert match.id == "v3" and response["matches"][0]["id"] == "v3"
+    assert match.metadata == {"title": "Paper 3"}
+    np.testing.assert_allclose(match.values, vectors[3] / np.linalg.norm(vectors[3]), atol=1e-2)
+
+    fetched = store.fetch(ids=["v1"]).vectors["v1"]
+    assert isinstance(fetched.values, list) and len(fetched.values) == vectors.shape[1]
+    assert fetched["metadata"] == {"title": "Paper 1"}
+
+
+def test_queries_and_fetches_during_concurrent_upserts_see_a_consistent_store(tmp_path):
+    store, vectors = make_store(tmp_path, rows=200, dimension=8)
+    new_vectors = np.random.default_rng(1).normal(size=(2000, 8)).astype(np.float32)
+    errors = []
+
+    def write():
+        # Overwrites of existing ids and new ids, small batches so many snapshots get published
+        for start in range(0, len(new_vectors), 20):
+            store.upsert(vectors=[
+                {"id": f"v{(start + i) % 300}", "values": new_vectors[start + i].tolist(), "metadata": {"title": "x"}}
+                for i in range(20)
+            ])
+            store.delete(ids=[f"v{start % 300}"])
+
+    def read():
+        try:
+            while writer.is_alive():
+                matches = store.query(vector=vectors[0].tolist(), top_k=50).matches
+                ids = [match.id for match in matches]
+                assert len(ids) == len(set(ids))
+                assert all(np.isfinite(match.score) for match in matches)
+                for record in store.fetch(ids=[f"v{i}" for i in range(300)]).vectors.values():
+                    assert len(record.values) == 8
+                store.query_batch(vectors[:4], top_k=5)
+        except Exception as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=write)
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    writer.start()
+    for reader in readers:
+        reader.start()
+    writer.join()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert len(store) == len({match.id for match in store.query(vector=vectors[0].tolist(), top_k=1000).matches})
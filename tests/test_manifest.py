@@ -0,0 +1,41 @@
+import uuid
+import numpy as np
+from vectordb.local_store import LocalVectorStore
+from vectordb.manifest import IndexManifest, chunk_vector_id, has_vectors, legacy_vectors_by
+
+
+def test_legacy_vectors_by_groups_only_uuid4_ids(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "paper-contents"), dimension=8)
+    assert not has_vectors(store)
+
+    vectors = np.random.default_rng(3).normal(size=(6, 8)).tolist()
+    legacy = [str(uuid.uuid4()) for _ in range(2)]
+    current = [chunk_vector_id("2023_1", i, f"chunk {i}") for i in range(2)]
+    other = [str(uuid.uuid4()), chunk_vector_id("2023_2", 0, "chunk 0")]
+    store.upsert(vectors=[
+        {"id": vector_id, "values": vector, "metadata": {"paper_id": paper_id}}
+        for vector_id, vector, paper_id in zip(
+            legacy + current + other, vectors, ["2023_1"] * 4 + ["2023_2"] * 2
+        )
+    ])
+
+    assert has_vectors(store)
+    by_paper = legacy_vectors_by(store, "paper_id", batch_size=1)
+    assert sorted(by_paper) == ["2023_1", "2023_2"]
+    assert sorted(by_paper["2023_1"]) == sorted(legacy)
+    assert by_paper["2023_2"] == [other[0]]
+
+
+def test_switching_encoder_backend_invalidates_manifest_entries(tmp_path, monkeypatch):
+    path = str(tmp_path / "manifest.json")
+    monkeypatch.setenv("EMBEDDING_BACKEND", "torch")
+    manifest = IndexManifest(path)
+    manifest.record("2023_1", {"hash": "abc"}, ["2023_1#0"])
+    manifest.save()
+    assert IndexManifest(path).is_current("2023_1", {"hash": "abc"})
+
+    monkeypatch.setenv("EMBEDDING_BACKEND", "int8")
+    quantized = IndexManifest(path)
+    assert "int8" in quantized.model and quantized.model.startswith(manifest.model)
+    assert not quantized.is_current("2023_1", {"hash": "abc"})
+    assert quantized.ids("2023_1") == ["2023_1#0"]  # old vectors are still known, so they get replaced
@@ -0,0 +1,55 @@
+import uuid
+import numpy as np
+from benchmarks.synthetic import FakeEncoder
+from vectordb import papers2vector
+from vectordb.resources import get_index, set_resource
+
+
+def write_year(folder, abstracts):
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / "abstracts.csv").write_text(
+        "title~abstract\n" + "".join(f"{title}~{abstract}\n" for title, abstract in abstracts.items())
+    )
+    (folder / "authors.csv").write_text(
+        "title~authors\n" + "".join(f"{title}~Author {i}\n" for i, title in enumerate(abstracts))
+    )
+    (folder / "paper_info.csv").write_text(
+        "title~abstract_url~pdf_url\n" + "".join(f"{title}~https://a/{i}~https://p/{i}\n" for i, title in enumerate(abstracts))
+    )
+
+
+def index_ids():
+    return {vector_id for page in get_index(papers2vector.INDEX_NAME).list() for vector_id in page}
+
+
+def test_incremental_runs_embed_only_new_or_changed_abstracts(local_backend, tmp_path):
+    encoder = FakeEncoder()
+    set_resource("model", encoder)
+    abstracts = {f"Paper {i}": f"An abstract about topic {i} that is long enough to index." for i in range(4)}
+    write_year(tmp_path / "cvpr" / "2024", abstracts)
+
+    # A vector written by the pre-manifest version (uuid4 id, no year)
+    legacy_id = str(uuid.uuid4())
+    get_index(papers2vector.INDEX_NAME, create=True).upsert(vectors=[
+        {"id": legacy_id, "values": np.ones(384).tolist(), "metadata": {"title": "Paper 0"}}
+    ])
+
+    papers2vector.build_vector_db(str(tmp_path / "cvpr"))
+    first_ids = index_ids()
+    assert len(first_ids) == 4 and legacy_id not in first_ids
+    assert len(papers2vector.get_lexical_index()) == 4
+
+    # Unchanged rerun: nothing is embedded or rewritten
+    calls = []
+    original_encode = encoder.encode
+    encoder.encode = lambda sentences, **kwargs: calls.append(list(sentences)) or original_encode(sentences, **kwargs)
+    papers2vector.build_vector_db(str(tmp_path / "cvpr"))
+    assert calls == [] and index_ids() == first_ids
+
+    # One changed abstract replaces exactly one vector
+    abstracts["Paper 2"] = "A rewritten abstract with different content for the same paper."
+    write_year(tmp_path / "cvpr" / "2024", abstracts)
+    papers2vector.build_vector_db(str(tmp_path / "cvpr"))
+    assert calls == [[abstracts["Paper 2"]]]
+    second_ids = index_ids()
+    assert len(second_ids) == 4 and len(second_ids - first_ids) == 1
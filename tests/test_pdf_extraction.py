@@ -0,0 +1,52 @@
+from benchmarks.synthetic import TextGenerator
+from vectordb.pdf_extraction import split_text_into_chunks
+
+
+def document(paragraphs=40, seed=8):
+    text = TextGenerator(seed)
+    parts = []
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            parts.append(f"{i // 10 + 1} Section {i // 10 + 1}")
+        parts.append(text.paragraph(2))
+    return parts
+
+
+def test_chunks_respect_the_token_budget_and_keep_paragraphs_whole(tokenizer):
+    parts = document()
+    chunks = split_text_into_chunks("\n\n".join(parts), chunk_size=200, overlap_size=60)
+
+    assert len(chunks) > 1
+    for chunk, token_count in chunks:
+        assert token_count == len(tokenizer.encode(chunk)) <= 200
+    paragraphs = [paragraph for chunk, _ in chunks for paragraph in chunk.split("\n\n")]
+    assert set(paragraphs) == set(parts)  # every paragraph appears, none is cut
+
+
+def test_sections_start_new_chunks_without_overlap(tokenizer):
+    parts = document()
+    headings = {part for part in parts if part.split(" ", 1)[0].isdigit()}
+    chunks = [chunk.split("\n\n") for chunk, _ in split_text_into_chunks("\n\n".join(parts), 200, 60)]
+
+    section_starts = 0
+    for previous, current in zip(chunks, chunks[1:]):
+        shared = [paragraph for paragraph in current if paragraph in previous]
+        if current[0] in headings and current[0] not in previous:
+            section_starts += 1
+            assert shared == []  # no overlap carried into a new section
+        else:
+            # Overlap is a run of whole trailing paragraphs within the overlap budget
+            assert shared == current[:len(shared)] == previous[len(previous) - len(shared):]
+            assert not shared or len(tokenizer.encode("\n\n".join(shared))) <= 60
+    assert section_starts >= 2
+
+
+def test_long_paragraphs_are_cut_into_overlapping_windows(tokenizer):
+    paragraph = " ".join(TextGenerator(9).paragraph(2) for _ in range(20))
+    tokens = tokenizer.encode(paragraph)
+    chunks = split_text_into_chunks(paragraph, chunk_size=100, overlap_size=20)
+
+    assert all(token_count <= 100 for _, token_count in chunks)
+    assert len(chunks) == -(-(len(tokens) - 20) // 80)
+    first, second = (tokenizer.encode(chunk) for chunk, _ in chunks[:2])
+    assert first[-20:] == second[:20]
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from vectordb.local_store import LocalVectorStore, normalize_rows
+from vectordb.quantization import CompressedCodes
+
+
+def make_store(path, rows=1000, dimension=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dimension))
+    vectors = centers[rng.integers(20, size=rows)] + 0.5 * rng.normal(size=(rows, dimension))
+    store = LocalVectorStore(str(path), dimension=dimension)
+    store.upsert(vectors=[{"id": f"v{i}", "values": vector.tolist()} for i, vector in enumerate(vectors)])
+    return store, normalize_rows(vectors)
+
+
+def top_ids(response):
+    return [match.id for match in response.matches]
+
+
+@pytest.mark.parametrize("kind, min_code_overlap", [("int8", 0.9), ("pq", 0.5)])
+def test_code_scores_agree_with_the_float_path(tmp_path, kind, min_code_overlap):
+    store, vectors = make_store(tmp_path / "store")
+    codes = store.build_compressed_codes(kind, pq_subspaces=4 if kind == "pq" else None)
+    matrix = np.asarray(store.matrix, dtype=np.float32)
+
+    code_overlap = rescored_overlap = 0
+    queries = vectors[:50]
+    for query in queries:
+        exact = set(np.argsort(-(matrix @ query))[:10])
+        code_overlap += len(exact & set(np.argsort(-codes.score(query))[:10])) / 10
+        rescored = top_ids(store.query(vector=query.tolist(), top_k=10))
+        rescored_overlap += len(set(rescored) & set(top_ids(store.query(vector=query.tolist(), top_k=10, exact=True)))) / 10
+
+    assert code_overlap / len(queries) >= min_code_overlap
+    assert rescored_overlap / len(queries) >= 0.95  # the exact rescoring pass recovers the rest
+
+
+@pytest.mark.parametrize("kind", ["int8", "pq"])
+def test_codes_survive_save_and_load(tmp_path, kind):
+    store, vectors = make_store(tmp_path / "store")
+    codes = store.build_compressed_codes(kind, pq_subspaces=4 if kind == "pq" else None, rescore=2)
+
+    loaded = CompressedCodes.load(str(tmp_path / "store" / "codes.npz"))
+    assert (loaded.kind, loaded.num_rows, loaded.rescore) == (kind, codes.num_rows, 2)
+    np.testing.assert_array_equal(loaded.codes, codes.codes)
+    np.testing.assert_array_equal(loaded.score(vectors[0]), codes.score(vectors[0]))
+
+    reopened = LocalVectorStore(str(tmp_path / "store"))
+    assert reopened.codes is not None and reopened.codes.kind == kind
+    assert top_ids(reopened.query(vector=vectors[0].tolist(), top_k=10)) == top_ids(store.query(vector=vectors[0].tolist(), top_k=10))
@@ -0,0 +1,13 @@
+import vectordb.store as store
+from vectordb.resources import get_index
+
+
+def test_create_after_plain_lookup_still_creates_the_index(local_backend, monkeypatch):
+    created = []
+    monkeypatch.setattr(store, "create_index_if_missing", lambda name, backend=None: created.append(name))
+
+    handle = get_index("research-database")
+    assert created == []
+    assert get_index("research-database", create=True) is handle
+    assert get_index("research-database", create=True) is handle
+    assert created == ["research-database"]
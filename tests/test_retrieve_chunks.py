@@ -0,0 +1,74 @@
+import numpy as np
+from vectordb import retrieve_chunks
+from vectordb.chunk_cache import PaperChunkCache
+from vectordb.resources import get_index
+
+
+def index_paper(title="Paper A", paper_id="2024_0", chunks=3, dimension=384):
+    vectors = np.random.default_rng(2).normal(size=(chunks, dimension)).astype(np.float32)
+    ids = [f"{paper_id}-{i}" for i in range(chunks)]
+    get_index(retrieve_chunks.INDEX_NAME, create=True).upsert(vectors=[
+        {"id": ids[i], "values": vectors[i].tolist(), "metadata": {
+            "paper_id": paper_id, "title": title, "chunk_index": i, "token_count": 2, "content": f"Chunk {i}."
+        }}
+        for i in range(chunks)
+    ])
+    postings = retrieve_chunks.get_postings()
+    postings.add_paper(paper_id, title, ids)
+    postings.save()
+    return ids, vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_chunks_with_values_are_fetched_from_local_store(local_backend, monkeypatch):
+    monkeypatch.setattr(retrieve_chunks, "chunk_cache", PaperChunkCache())
+    ids, vectors = index_paper()
+
+    # First call fetches by id from the store, the second is served by the chunk cache
+    for _ in range(2):
+        chunks = retrieve_chunks.retrieve_related_chunks_by_titles(["Paper A"], include_values=True)
+        assert [chunk["id"] for chunk in chunks] == ids
+        np.testing.assert_allclose(np.stack([chunk["values"] for chunk in chunks]), vectors, atol=1e-2)
+
+    chunks = retrieve_chunks.retrieve_related_chunks_by_titles(["Paper A"])
+    assert [chunk["content"] for chunk in chunks] == ["Chunk 0.", "Chunk 1.", "Chunk 2."]
+    assert all("values" not in chunk for chunk in chunks)
+
+
+def test_duplicate_titles_are_returned_once(local_backend, monkeypatch):
+    monkeypatch.setattr(retrieve_chunks, "chunk_cache", PaperChunkCache())
+    ids, _ = index_paper()
+
+    chunks = retrieve_chunks.retrieve_related_chunks_by_titles(["Paper A", "Paper A"])
+    assert [chunk["id"] for chunk in chunks] == ids
+
+
+def test_partial_fetches_are_not_cached(local_backend, monkeypatch):
+    cache = PaperChunkCache()
+    monkeypatch.setattr(retrieve_chunks, "chunk_cache", cache)
+    ids, _ = index_paper()
+    get_index(retrieve_chunks.INDEX_NAME).delete(ids=[ids[1]])  # postings now list a missing chunk
+
+    chunks = retrieve_chunks.retrieve_related_chunks_by_titles(["Paper A"])
+    assert [chunk["id"] for chunk in chunks] == [ids[0], ids[2]]
+    assert cache.get("2024_0") is None
+
+
+def test_papers_without_postings_are_fetched_by_filter_and_backfilled(local_backend, monkeypatch):
+    cache = PaperChunkCache()
+    monkeypatch.setattr(retrieve_chunks, "chunk_cache", cache)
+    ids, vectors = index_paper()
+    postings = retrieve_chunks.get_postings()
+    postings.remove_paper("2024_0")  # indexed before the posting index existed
+
+    chunks = retrieve_chunks.retrieve_related_chunks_by_titles(["Paper A"], include_values=True)
+    assert [chunk["id"] for chunk in chunks] == ids
+    np.testing.assert_allclose(np.stack([chunk["values"] for chunk in chunks]), vectors, atol=1e-2)
+    assert postings.chunk_ids("2024_0") == ids
+    assert [chunk["id"] for chunk in cache.get("2024_0")] == ids
+
+    # A paper cut off at top_k is returned but neither backfilled nor cached
+    index_paper(title="Paper B", paper_id="2024_1", chunks=4)
+    postings.remove_paper("2024_1")
+    chunks = retrieve_chunks.retrieve_related_chunks_by_titles(["Paper B"], top_k=2)
+    assert len(chunks) == 2
+    assert "2024_1" not in postings and cache.get("2024_1") is None
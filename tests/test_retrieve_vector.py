@@ -0,0 +1,58 @@
+import io
+import sys
+import json
+import runpy
+import warnings
+import pytest
+from benchmarks.synthetic import FakeEncoder, TextGenerator
+from vectordb import papers2vector, retrieve_vector
+from vectordb.resources import set_resource
+from test_papers2vector import write_year
+
+QUERIES = ["neural radiance fields", "lidar camera fusion", "diffusion image synthesis", "graph networks"]
+
+
+@pytest.fixture
+def paper_index(local_backend, tmp_path):
+    set_resource("model", FakeEncoder())
+    text = TextGenerator(4)
+    for year in ("2023", "2024"):
+        abstracts = {text.title(): text.paragraph(3) for _ in range(30)}
+        abstracts[f"Neural Radiance Fields {year}"] = "NeRF renders novel views with neural radiance fields."
+        write_year(tmp_path / "papers" / "cvpr" / year, abstracts)
+    papers2vector.build_vector_db(str(tmp_path / "papers" / "cvpr"))
+
+
+@pytest.mark.parametrize("hybrid", [False, True])
+def test_batch_matches_single_query_results(paper_index, hybrid):
+    assert retrieve_vector.hybrid_search_enabled(hybrid) == hybrid
+
+    batch = retrieve_vector.retrieve_similar_papers_batch(QUERIES, top_k=3, hybrid=hybrid)
+    assert batch == [retrieve_vector.retrieve_similar_papers(query, top_k=3, hybrid=hybrid) for query in QUERIES]
+    assert all(len(papers) == 3 for papers in batch)
+
+    filtered = retrieve_vector.retrieve_similar_papers_batch(QUERIES, top_k=3, year=2024, hybrid=hybrid)
+    assert filtered == [retrieve_vector.retrieve_similar_papers(query, top_k=3, year=2024, hybrid=hybrid) for query in QUERIES]
+    assert retrieve_vector.retrieve_similar_papers_batch([], hybrid=hybrid) == []
+
+
+def test_cli_writes_one_jsonl_line_per_query(paper_index, tmp_path, monkeypatch):
+    queries_path = tmp_path / "queries.txt"
+    queries_path.write_text("\n".join(QUERIES[:2] + ["", "  "] + QUERIES[2:]) + "\n")
+    output_path = tmp_path / "results.jsonl"
+    monkeypatch.setattr(sys, "argv", ["retrieve_vector", str(queries_path), "--output", str(output_path),
+                                      "--top-k", "2", "--batch-size", "3", "--year-from", "2024"])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # the module is already imported
+        runpy.run_module("vectordb.retrieve_vector", run_name="__main__")
+
+    lines = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert [line["query"] for line in lines] == QUERIES
+    assert lines == [
+        {"query": query, "papers": papers}
+        for query, papers in zip(QUERIES, retrieve_vector.retrieve_similar_papers_batch(QUERIES, top_k=2, year_range=(2024, None)))
+    ]
+
+
+def test_iter_query_batches_skips_blank_lines():
+    assert list(retrieve_vector.iter_query_batches(io.StringIO("a\n\n b \nc\n"), 2)) == [["a", "b"], ["c"]]
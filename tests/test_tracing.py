@@ -0,0 +1,43 @@
+import contextvars
+import pytest
+from vectordb import tracing
+from vectordb.tracing import span, recent_traces
+
+
+def prefetch():
+    with span("prefetch"):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def clean_traces(monkeypatch):
+    monkeypatch.setenv("TRACING", "1")
+    tracing.reset()
+    yield
+    tracing.reset()
+
+
+def test_child_finishing_after_its_root_joins_the_finished_trace():
+    with span("request"):
+        with span("retrieve"):
+            pass
+        context = contextvars.copy_context()  # e.g. handed to a prefetch thread
+    context.run(prefetch)  # which finishes after the request
+
+    trace = recent_traces(limit=1)[0]
+    assert trace["name"] == "request"
+    assert [child["name"] for child in trace["children"]] == ["retrieve", "prefetch"]
+    assert tracing._open_traces == {}
+
+
+def test_orphaned_children_are_dropped_once_idle(monkeypatch):
+    monkeypatch.setattr(tracing, "CLOSED_TRACE_IDS", 0)  # the root is forgotten right away
+    monkeypatch.setattr(tracing, "OPEN_TRACE_IDLE_SECONDS", -1)
+    with span("request"):
+        late = contextvars.copy_context()
+    late.run(prefetch)
+    assert len(tracing._open_traces) == 1
+
+    with span("next request"):
+        pass
+    assert tracing._open_traces == {}
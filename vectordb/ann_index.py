@@ -0,0 +1,168 @@
+# vectordb/ann_index.py
+
+import time
+import argparse
+import numpy as np
+
+DEFAULT_NPROBE = 8
+TRAIN_POINTS_PER_LIST = 64  # k-means training sample size per inverted list
+ASSIGN_BLOCK_ROWS = 65536
+
+
+def _to_float32(vectors):
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def default_nlist(num_vectors):
+    """Number of inverted lists for a corpus of the given size (~4 * sqrt(n))."""
+    return max(1, min(num_vectors, int(4 * np.sqrt(num_vectors))))
+
+
+def _assign(vectors, centroids):
+    """Index of the closest centroid (by inner product) for every row."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = _to_float32(vectors[start:start + ASSIGN_BLOCK_ROWS])
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(vectors, nlist, iterations=10, seed=0):
+    """Spherical k-means on a sample of (normalised) vectors."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * TRAIN_POINTS_PER_LIST)
+    sample_rows = np.sort(rng.choice(len(vectors), size=sample_size, replace=False))
+    sample = _to_float32(vectors[sample_rows])
+
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+
+        # Re-seed empty lists with random sample points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = sums / norms
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index.
+
+    Rows are partitioned into ``nlist`` lists by a k-means coarse quantizer.
+    A query scores the centroids, then only the rows of the ``nprobe`` closest
+    lists, so query cost grows with nprobe * n / nlist instead of n. Raising
+    nprobe trades speed for recall; nprobe == nlist is exact search.
+
+    The index stores row numbers only; ``candidates`` returns the rows to
+    score, and the caller (LocalVectorStore.query) reads their vectors.
+    """
+
+    def __init__(self, centroids, offsets, rows, num_rows, nprobe=DEFAULT_NPROBE):
+        self.centroids = centroids
+        self.offsets = offsets      # list i holds rows[offsets[i]:offsets[i + 1]]
+        self.rows = rows
+        self.num_rows = num_rows    # rows covered by the index when it was built
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors, nlist=None, iterations=10, seed=0, nprobe=DEFAULT_NPROBE):
+        """Train the coarse quantizer and fill the inverted lists."""
+        nlist = nlist or default_nlist(len(vectors))
+        centroids = train_centroids(vectors, nlist, iterations=iterations, seed=seed)
+        labels = _assign(vectors, centroids)
+
+        rows = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(labels, minlength=nlist))
+        return cls(centroids, offsets, rows, len(vectors), nprobe=nprobe)
+
+    def candidates(self, query, nprobe=None):
+        """Row numbers stored in the ``nprobe`` lists closest to the query."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in probe])
+
+    # === Persistence ===
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(
+                f, centroids=self.centroids, offsets=self.offsets, rows=self.rows,
+                num_rows=np.int64(self.num_rows), nprobe=np.int64(self.nprobe)
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["centroids"], data["offsets"], data["rows"],
+                int(data["num_rows"]), nprobe=int(data["nprobe"])
+            )
+
+
+def recall_report(store, nprobe_values=(1, 2, 4, 8, 16, 32), top_k=10, num_queries=200, seed=0):
+    """
+    Measure recall@k and mean latency of the store's ANN index against exact search.
+
+    Stored vectors are sampled as queries, so the report reflects the corpus itself.
+
+    Returns:
+        list of dict: One entry per nprobe with 'nprobe', 'recall', 'latency_ms',
+        plus a final entry for exact search ('nprobe' is None).
+    """
+    rng = np.random.default_rng(seed)
+    live_rows = np.flatnonzero(store._live)
+    query_rows = rng.choice(live_rows, size=min(num_queries, len(live_rows)), replace=False)
+    queries = _to_float32(store.matrix[np.sort(query_rows)])
+
+    def run(**kwargs):
+        results, start = [], time.perf_counter()
+        for query in queries:
+            response = store.query(vector=query, top_k=top_k, **kwargs)
+            results.append({match.id for match in response.matches})
+        return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+    exact, exact_latency = run(exact=True)
+
+    report = []
+    for nprobe in nprobe_values:
+        approx, latency = run(nprobe=nprobe)
+        hits = sum(len(a & e) for a, e in zip(approx, exact))
+        total = sum(len(e) for e in exact)
+        report.append({"nprobe": nprobe, "recall": hits / max(total, 1), "latency_ms": latency})
+    report.append({"nprobe": None, "recall": 1.0, "latency_ms": exact_latency})
+    return report
+
+
+if __name__ == "__main__":
+    from vectordb.store import open_index
+
+    parser = argparse.ArgumentParser(description="Build an IVF index for a local vector store and report recall@k.")
+    parser.add_argument("index_name", nargs="?", default="paper-contents")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    store = open_index(args.index_name, backend="local")
+    ivf = store.build_ann_index(nlist=args.nlist)
+    if ivf is None:
+        raise SystemExit(f"{args.index_name} has too few vectors for an IVF index; queries use exact search.")
+    print(f"Built IVF index with {ivf.nlist} lists over {ivf.num_rows} rows.")
+
+    for entry in recall_report(store, args.nprobe, top_k=args.top_k, num_queries=args.queries):
+        label = "exact" if entry["nprobe"] is None else f"nprobe={entry['nprobe']}"
+        print(f"{label:>12}  recall@{args.top_k}={entry['recall']:.3f}  {entry['latency_ms']:.2f} ms/query")
@@ -0,0 +1,205 @@
+# vectordb/attribute_index.py
+#
+# In-memory posting lists over the metadata of a LocalVectorStore, so a
+# metadata filter resolves to its matching rows without scanning every
+# record. Filtered queries then only score those rows.
+
+import re
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+MAX_INDEXED_STRING = 256         # longer strings (author lists, chunk text) get no exact-value posting
+MAX_WORD_INDEXED_STRING = 2048   # nor, past this length (chunk text), word postings
+WORD_PATTERN = re.compile(r"\w+")
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class AttributeIndex:
+    """
+    Posting lists of row numbers for every short scalar metadata value
+    (value -> rows), plus a word index of string values (lower-cased word ->
+    rows) that answers case-insensitive substring filters (``$contains``).
+
+    ``rows`` resolves a Pinecone-style filter ($eq, $ne, $in, $nin, $gt,
+    $gte, $lt, $lte, $and, $or, plus $contains) to a sorted array of row
+    numbers, dead rows included; the store masks those out.
+    """
+
+    def __init__(self):
+        self._values = {}        # field -> {value: [rows]}
+        self._words = {}         # field -> {word: [rows]}
+        self._numeric_keys = {}  # field -> sorted numeric values, rebuilt lazily
+        self._arrays = {}        # (kind, field, key) -> np.ndarray, rebuilt lazily
+        self._unindexed = {}     # field -> rows whose value is not in the word index (too long or not scalar)
+        self.num_rows = 0
+
+    def add(self, row, metadata):
+        """Index the metadata of one (newly appended) row."""
+        for field, value in metadata.items():
+            if value is None:
+                continue
+            if isinstance(value, str):
+                if len(value) > MAX_WORD_INDEXED_STRING:
+                    self._add_unindexed(field, row)
+                    continue
+                for word in set(WORD_PATTERN.findall(value.lower())):
+                    self._words.setdefault(field, {}).setdefault(word, []).append(row)
+                    self._arrays.pop(("word", field, word), None)
+                if len(value) > MAX_INDEXED_STRING:
+                    continue  # $eq on a long string scans, see _hashable
+            elif not isinstance(value, (int, float, bool)):
+                self._add_unindexed(field, row)
+                continue
+
+            postings = self._values.setdefault(field, {})
+            if value not in postings:
+                postings[value] = []
+                self._numeric_keys.pop(field, None)
+            postings[value].append(row)
+            self._arrays.pop(("value", field, value), None)
+        self.num_rows = max(self.num_rows, row + 1)
+
+    def _add_unindexed(self, field, row):
+        self._unindexed.setdefault(field, []).append(row)
+        self._arrays.pop(("unindexed", field, None), None)
+
+    def _postings(self, kind, field, key):
+        cache_key = (kind, field, key)
+        array = self._arrays.get(cache_key)
+        if array is None:
+            if kind == "unindexed":
+                rows = self._unindexed.get(field)
+            else:
+                rows = (self._values if kind == "value" else self._words).get(field, {}).get(key)
+            array = np.asarray(rows, dtype=np.int64) if rows else _EMPTY
+            self._arrays[cache_key] = array
+        return array
+
+    def _union(self, arrays):
+        arrays = [array for array in arrays if len(array)]
+        if not arrays:
+            return _EMPTY
+        return arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
+
+    def _complement(self, rows):
+        mask = np.ones(self.num_rows, dtype=bool)
+        mask[rows] = False
+        return np.flatnonzero(mask)
+
+    def _range(self, field, op, operand):
+        if not _is_number(operand):
+            return None  # string ranges are left to the linear scan
+        keys = self._numeric_keys.get(field)
+        if keys is None:
+            keys = sorted(key for key in self._values.get(field, {}) if _is_number(key))
+            self._numeric_keys[field] = keys
+        if op == "$gt":
+            selected = keys[bisect_right(keys, operand):]
+        elif op == "$gte":
+            selected = keys[bisect_left(keys, operand):]
+        elif op == "$lt":
+            selected = keys[:bisect_left(keys, operand)]
+        else:
+            selected = keys[:bisect_right(keys, operand)]
+        return self._union([self._postings("value", field, key) for key in selected])
+
+    def _contains(self, field, substring, metadata_of):
+        """
+        Rows whose ``field`` contains ``substring`` (case-insensitive). Only
+        the rows whose value is not in the word index are scanned.
+        """
+        substring = str(substring).lower()
+        words = WORD_PATTERN.findall(substring)
+        vocabulary = self._words.get(field, {})
+        if not words:
+            return None
+
+        def confirm(rows):
+            return np.asarray(
+                [row for row in rows if substring in str(metadata_of(row).get(field, "")).lower()],
+                dtype=np.int64
+            )
+
+        # Every word of the substring is contained in some word of the value;
+        # intersect those candidates, then confirm the exact substring.
+        candidates = None
+        for word in words:
+            rows = self._union([self._postings("word", field, key) for key in vocabulary if word in key])
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+            if not len(candidates):
+                break
+        if len(candidates) and words != [substring]:
+            candidates = confirm(candidates)  # a single word inside a value word needs no confirmation
+
+        unindexed = self._postings("unindexed", field, None)
+        if len(unindexed):
+            candidates = self._union([candidates, confirm(unindexed)])
+        return candidates
+
+    def _condition_rows(self, field, condition, metadata_of):
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        result = None
+        for op, operand in condition.items():
+            if op == "$eq":
+                rows = self._postings("value", field, operand) if self._hashable(operand) else None
+            elif op == "$in":
+                rows = self._union([self._postings("value", field, value) for value in operand]) \
+                    if all(self._hashable(value) for value in operand) else None
+            elif op == "$ne":
+                rows = self._condition_rows(field, {"$eq": operand}, metadata_of)
+                rows = None if rows is None else self._complement(rows)
+            elif op == "$nin":
+                rows = self._condition_rows(field, {"$in": operand}, metadata_of)
+                rows = None if rows is None else self._complement(rows)
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                rows = self._range(field, op, operand)
+            elif op == "$contains":
+                rows = self._contains(field, operand, metadata_of)
+            else:
+                rows = None
+            if rows is None:
+                return None
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return _EMPTY if result is None else result
+
+    @staticmethod
+    def _hashable(value):
+        return isinstance(value, (str, int, float, bool)) and not (isinstance(value, str) and len(value) > MAX_INDEXED_STRING)
+
+    def rows(self, query_filter, metadata_of):
+        """
+        Sorted rows matching ``query_filter``, or None when part of the filter
+        cannot be answered from the index (the caller then scans).
+
+        Args:
+            query_filter (dict): Pinecone-style metadata filter.
+            metadata_of (callable): row -> metadata dict, used to confirm
+                substring matches.
+        """
+        result = None
+        for key, condition in query_filter.items():
+            if key == "$and":
+                parts = [self.rows(sub, metadata_of) for sub in condition]
+                if any(part is None for part in parts):
+                    return None
+                rows = parts[0] if parts else np.arange(self.num_rows)
+                for part in parts[1:]:
+                    rows = np.intersect1d(rows, part, assume_unique=True)
+            elif key == "$or":
+                parts = [self.rows(sub, metadata_of) for sub in condition]
+                if any(part is None for part in parts):
+                    return None
+                rows = self._union(parts)
+            else:
+                rows = self._condition_rows(key, condition, metadata_of)
+                if rows is None:
+                    return None
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return np.arange(self.num_rows) if result is None else result
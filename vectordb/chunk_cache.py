@@ -0,0 +1,74 @@
+# vectordb/chunk_cache.py
+
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def _chunk_size(chunk):
+    """Approximate memory footprint of a cached chunk in bytes."""
+    size = 200 + len(chunk.get("content", "")) + len(chunk.get("title", ""))
+    values = chunk.get("values")
+    if isinstance(values, np.ndarray):
+        size += values.nbytes
+    return size
+
+
+class PaperChunkCache:
+    """
+    Process-wide cache of every chunk of a paper, keyed by paper_id and shared
+    by all sessions. Total size is bounded by ``max_bytes``: inserting past the
+    bound evicts the least recently used papers.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._papers = OrderedDict()  # paper_id -> (chunks, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._papers)
+
+    def get(self, paper_id):
+        """Chunks of a paper in document order, or None if not cached."""
+        with self._lock:
+            entry = self._papers.get(paper_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._papers.move_to_end(paper_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, paper_id, chunks):
+        size = sum(_chunk_size(chunk) for chunk in chunks)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._papers.pop(paper_id, None)
+            if previous is not None:
+                self.size_bytes -= previous[1]
+
+            self._papers[paper_id] = (chunks, size)
+            self.size_bytes += size
+
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._papers.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "papers": len(self._papers),
+            "size_mb": self.size_bytes / (1024 * 1024),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,58 @@
+# vectordb/chunk_postings.py
+
+import os
+import json
+
+
+class ChunkPostings:
+    """
+    Posting index from paper to the ids of its chunks, in document order.
+
+    Maintained by the full-text ingestion pipeline so readers can fetch every
+    chunk of a paper by id instead of issuing filtered similarity queries.
+
+    File format:
+        {"papers": {"2023_001": {"title": "...", "chunk_ids": ["...", ...]}}}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.papers = {}
+        self._title_to_paper = {}
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.papers = json.load(f).get("papers", {})
+        for paper_id, entry in self.papers.items():
+            self._title_to_paper[entry["title"]] = paper_id
+
+    def __contains__(self, paper_id):
+        return paper_id in self.papers
+
+    def add_paper(self, paper_id, title, chunk_ids):
+        """Register (or replace) the ordered chunk ids of a paper."""
+        self.remove_paper(paper_id)
+        self.papers[paper_id] = {"title": title, "chunk_ids": list(chunk_ids)}
+        self._title_to_paper[title] = paper_id
+
+    def remove_paper(self, paper_id):
+        """Forget a paper and return its chunk ids (empty if unknown)."""
+        entry = self.papers.pop(paper_id, None)
+        if entry is None:
+            return []
+        if self._title_to_paper.get(entry["title"]) == paper_id:
+            del self._title_to_paper[entry["title"]]
+        return entry["chunk_ids"]
+
+    def paper_id_for_title(self, title):
+        return self._title_to_paper.get(title)
+
+    def chunk_ids(self, paper_id):
+        entry = self.papers.get(paper_id)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"papers": self.papers}, f)
+        os.replace(tmp_path, self.path)
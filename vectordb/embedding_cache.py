@@ -0,0 +1,188 @@
+# vectordb/embedding_cache.py
+
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not coordinated across processes
+    fcntl = None
+from vectordb.store import sidecar_path
+from vectordb.manifest import MODEL_DIR, encoder_fingerprint
+
+DEFAULT_DIMENSION = 384
+QUERY_LRU_SIZE = 4096  # embeddings kept in memory in front of the disk cache
+
+
+def normalize_text(text):
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_key(text):
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of embeddings for one model, with an in-memory LRU in front.
+
+    Layout of ``path`` (one directory per model fingerprint):
+        vectors.bin   row-major float32 matrix, memory-mapped for reads
+        keys.txt      sha1 of the normalised text of each row, one per line
+
+        lock          flock()ed by writers while they append
+
+    Rows are only ever appended. Writers in several processes (e.g. the
+    abstract and full-text ingestion jobs) take an exclusive lock on the
+    directory and first pick up the rows the others appended; the app reads
+    the disk cache and keeps new query embeddings in memory only.
+    """
+
+    def __init__(self, path, dimension=DEFAULT_DIMENSION, memory_size=QUERY_LRU_SIZE):
+        self.path = path
+        self.dimension = dimension
+        self.memory_size = memory_size
+        os.makedirs(path, exist_ok=True)
+
+        self._vectors_path = os.path.join(path, "vectors.bin")
+        self._keys_path = os.path.join(path, "keys.txt")
+        self._lock_path = os.path.join(path, "lock")
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._matrix = None
+        self.hits = 0
+        self.misses = 0
+
+        self._key_to_row = {}
+        self._rows = 0
+        self._keys_offset = 0  # bytes of keys.txt already read
+        self._reload()
+
+    def _reload(self):
+        """Pick up the rows appended to the files since they were last read."""
+        if not os.path.exists(self._keys_path):
+            return
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        data = data[:data.rfind(b"\n") + 1]  # a line still being written is read next time
+        self._keys_offset += len(data)
+        keys = data.decode("utf-8").splitlines()
+
+        # Ignore keys whose vectors were never fully written
+        rows_on_disk = os.path.getsize(self._vectors_path) // (4 * self.dimension) if os.path.exists(self._vectors_path) else 0
+        rows = min(self._rows + len(keys), rows_on_disk)
+        for offset, key in enumerate(keys[:max(0, rows - self._rows)]):
+            self._key_to_row.setdefault(key, self._rows + offset)
+        if rows != self._rows:
+            self._rows = rows
+            self._matrix = None
+
+    def __len__(self):
+        return len(self._key_to_row)
+
+    def _disk_matrix(self):
+        if self._matrix is None and self._rows:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                     shape=(self._rows, self.dimension))
+        return self._matrix
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, text):
+        """Cached embedding of ``text`` or None."""
+        key = text_key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                return vector
+
+            row = self._key_to_row.get(key)
+            if row is None:
+                return None
+            vector = np.array(self._disk_matrix()[row], dtype=np.float32)
+            self._remember(key, vector)
+            return vector
+
+    def put_many(self, texts, vectors, persist=True):
+        """Store embeddings; ``persist=False`` keeps them in the memory LRU only."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dimension)
+        with self._lock:
+            keys = [text_key(text) for text in texts]
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+            if not persist or all(key in self._key_to_row for key in keys):
+                return
+
+            with open(self._lock_path, "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                # Another process may have appended rows since they were read
+                self._reload()
+                new_keys, new_rows = [], []
+                for key, vector in zip(keys, vectors):
+                    if key not in self._key_to_row and key not in new_keys:
+                        new_keys.append(key)
+                        new_rows.append(vector)
+                if not new_keys:
+                    return
+
+                # Vectors first, then keys: a crash in between leaves ignorable rows
+                with open(self._vectors_path, "ab") as f:
+                    f.truncate(self._rows * 4 * self.dimension)
+                    f.write(np.stack(new_rows).tobytes())
+                with open(self._keys_path, "a", encoding="utf-8") as f:
+                    f.write("".join(key + "\n" for key in new_keys))
+                self._reload()
+
+    def encode(self, model, texts, persist=True, **encode_kwargs):
+        """
+        Embed ``texts`` with ``model``, running the model only on texts that
+        are not cached. Returns a float32 array of shape (len(texts), dimension).
+        """
+        texts = list(texts)
+        result = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        missing = {}
+        for i, text in enumerate(texts):
+            vector = self.get(text)
+            if vector is None:
+                missing.setdefault(normalize_text(text), []).append(i)
+            else:
+                result[i] = vector
+
+        self.hits += len(texts) - sum(len(rows) for rows in missing.values())
+        self.misses += len(missing)
+
+        if missing:
+            miss_texts = [texts[rows[0]] for rows in missing.values()]
+            encoded = np.asarray(model.encode(miss_texts, convert_to_numpy=True, **encode_kwargs), dtype=np.float32)
+            self.put_many(miss_texts, encoded, persist=persist)
+            for rows, vector in zip(missing.values(), encoded):
+                result[rows] = vector
+
+        return result
+
+    def encode_query(self, model, text):
+        """Embed a single query; new query embeddings stay in memory only."""
+        return self.encode(model, [text], persist=False)[0]
+
+
+def open_embedding_cache(model_dir=None, backend="torch"):
+    """
+    Embedding cache for the local MiniLM model (keyed by its config fingerprint).
+    Optimised encoder backends (see vectordb/fast_encoder.py) get their own
+    directory, so their vectors are never mixed with the reference model's.
+    """
+    fingerprint = encoder_fingerprint(model_dir or MODEL_DIR, backend)
+    return EmbeddingCache(sidecar_path("embedding-cache", fingerprint))
@@ -0,0 +1,176 @@
+# vectordb/fast_encoder.py
+#
+# CPU-optimised variants of the local MiniLM encoder. Each backend returns an
+# object with the SentenceTransformer ``encode`` API, so it can be used
+# anywhere the reference model is:
+#
+#     torch  full-precision PyTorch model (reference)
+#     int8   PyTorch dynamic int8 quantization of every Linear layer
+#     onnx   ONNX Runtime graph (needs `pip install optimum[onnxruntime]`)
+#
+# The backend and thread count are read from EMBEDDING_BACKEND and
+# EMBEDDING_THREADS by vectordb.resources.get_model. Check that a backend agrees
+# with the reference before switching an index over:
+#
+#     python -m vectordb.fast_encoder --backend int8 --threads 4 --verify
+
+import os
+import time
+import argparse
+import numpy as np
+from vectordb.manifest import MODEL_DIR
+
+BACKENDS = ("torch", "int8", "onnx")
+DEFAULT_BACKEND = "torch"
+INT8_QUANTIZATION = "qint8-dynamic-linear"  # what load_encoder applies for the int8 backend
+
+# Minimum mean cosine similarity with the reference model for --verify to pass
+AGREEMENT_THRESHOLD = 0.99
+
+SAMPLE_SENTENCES = [
+    "LiDAR and camera fusion for 3D object detection",
+    "Self-supervised pre-training of vision transformers",
+    "Efficient attention mechanisms for long documents",
+    "Diffusion models for high-resolution image synthesis",
+    "Graph neural networks for molecular property prediction",
+    "Robust reinforcement learning under distribution shift",
+    "Neural radiance fields from sparse input views",
+    "Contrastive learning of sentence embeddings",
+    "Monocular depth estimation in autonomous driving",
+    "Federated learning with differential privacy guarantees",
+    "Open-vocabulary semantic segmentation with vision-language models",
+    "Parameter-efficient fine-tuning of large language models",
+]
+
+
+def backend_from_env():
+    backend = os.getenv("EMBEDDING_BACKEND", DEFAULT_BACKEND).lower()
+    if backend not in BACKENDS:
+        print(f"⚠️ Warning: unknown EMBEDDING_BACKEND {backend!r}, using {DEFAULT_BACKEND}.")
+        return DEFAULT_BACKEND
+    return backend
+
+
+def backend_tag(backend):
+    """
+    Fingerprint suffix of an encoder backend: its name plus its quantization
+    settings ('' for the reference torch model).
+    """
+    if backend == DEFAULT_BACKEND:
+        return ""
+    if backend == "int8":
+        return f"int8-{INT8_QUANTIZATION}"
+    return backend
+
+
+def threads_from_env():
+    threads = os.getenv("EMBEDDING_THREADS")
+    return int(threads) if threads else None
+
+
+def load_encoder(backend=DEFAULT_BACKEND, threads=None, model_dir=MODEL_DIR):
+    """
+    Load the MiniLM encoder with the given CPU backend.
+
+    Args:
+        backend (str): One of BACKENDS.
+        threads (int): Intra-op threads for PyTorch / ONNX Runtime; None keeps
+            the library default (all cores).
+        model_dir (str): Local sentence-transformers model directory.
+
+    Returns:
+        SentenceTransformer: A model with the usual ``encode`` API.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        torch.set_num_threads(threads)
+
+    if backend == "torch":
+        return SentenceTransformer(model_dir, device="cpu")
+
+    if backend == "int8":
+        model = SentenceTransformer(model_dir, device="cpu")
+        model.eval()
+        # Weights of every Linear layer are stored as int8 and activations are
+        # quantized on the fly; embeddings and layer norms stay in float32.
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if backend == "onnx":
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if threads:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = threads
+            model_kwargs["session_options"] = session_options
+        # The graph is exported from the PyTorch weights on first load when the
+        # model directory has no onnx/model.onnx yet.
+        return SentenceTransformer(model_dir, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+    raise ValueError(f"Unknown encoder backend {backend!r}, expected one of {BACKENDS}")
+
+
+def _timed_encode(model, sentences, batch_size, repeats):
+    model.encode(sentences[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        embeddings = model.encode(sentences, batch_size=batch_size, convert_to_numpy=True)
+    seconds = (time.perf_counter() - start) / repeats
+    return np.asarray(embeddings, dtype=np.float32), seconds
+
+
+def verify_encoder(reference, candidate, sentences=SAMPLE_SENTENCES, batch_size=64, repeats=3):
+    """
+    Compare a candidate encoder with the reference model on ``sentences``.
+
+    Returns:
+        dict: mean/min cosine similarity between the two embeddings of each
+        sentence, and the throughput (sentences/s) of both encoders.
+    """
+    reference_vectors, reference_seconds = _timed_encode(reference, sentences, batch_size, repeats)
+    candidate_vectors, candidate_seconds = _timed_encode(candidate, sentences, batch_size, repeats)
+
+    reference_vectors /= np.linalg.norm(reference_vectors, axis=1, keepdims=True)
+    candidate_vectors /= np.linalg.norm(candidate_vectors, axis=1, keepdims=True)
+    cosine = np.sum(reference_vectors * candidate_vectors, axis=1)
+
+    return {
+        "sentences": len(sentences),
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+        "reference_per_second": len(sentences) / reference_seconds,
+        "candidate_per_second": len(sentences) / candidate_seconds,
+        "speedup": reference_seconds / candidate_seconds,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load an optimised MiniLM encoder and check it against the reference model.")
+    parser.add_argument("--backend", choices=BACKENDS, default=backend_from_env())
+    parser.add_argument("--threads", type=int, default=threads_from_env())
+    parser.add_argument("--verify", action="store_true", help="Report cosine agreement and speed against the torch model.")
+    parser.add_argument("--sample-file", help="Text file with one sample sentence per line.")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    candidate = load_encoder(args.backend, args.threads)
+    print(f"Loaded {args.backend} encoder in {time.perf_counter() - start:.2f}s")
+
+    if args.verify:
+        sentences = SAMPLE_SENTENCES
+        if args.sample_file:
+            with open(args.sample_file, encoding="utf-8") as f:
+                sentences = [line.strip() for line in f if line.strip()]
+
+        report = verify_encoder(load_encoder("torch", args.threads), candidate, sentences, args.batch_size)
+        print(f"Sentences:        {report['sentences']}")
+        print(f"Mean cosine:      {report['mean_cosine']:.5f}")
+        print(f"Min cosine:       {report['min_cosine']:.5f}")
+        print(f"Reference:        {report['reference_per_second']:.1f} sentences/s")
+        print(f"{args.backend:<17} {report['candidate_per_second']:.1f} sentences/s ({report['speedup']:.2f}x)")
+        if report["mean_cosine"] >= AGREEMENT_THRESHOLD:
+            print("✅ Encoder agrees with the reference model.")
+        else:
+            print(f"⚠️ Warning: mean cosine below {AGREEMENT_THRESHOLD}; do not mix its vectors with the existing index.")
@@ -1,56 +1,39 @@
 import os
-import uuid
+import argparse
 import pandas as pd
 from tqdm import tqdm
-import fitz  # PyMuPDF
-from sentence_transformers import SentenceTransformer
-import pinecone
-from pinecone import Pinecone, ServerlessSpec
+from vectordb.store import sidecar_path
+from vectordb.resources import get_index, get_model, get_embedding_cache, lazy_resource
+from vectordb.chunk_postings import ChunkPostings
+from vectordb.tracing import span, traced, increment
+from vectordb.manifest import IndexManifest, chunk_vector_id, delete_in_batches, has_vectors, legacy_vectors_by
+from vectordb.lexical_index import BM25Index
+from vectordb.pdf_extraction import (
+    split_text_into_chunks, extract_text_from_pdf, iter_extracted_papers, CHUNKER_VERSION
+)
 
 # === Load environment variables ===
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_ENV = os.getenv("PINECONE_ENV")
 INDEX_NAME = "paper-contents"
+ENCODE_BATCH_SIZE = 64   # chunks per model.encode call
+UPSERT_BATCH_SIZE = 50   # vectors per upsert request; adjust depending on vector size
+FETCH_BATCH_SIZE = 200   # ids per fetch request when reading chunk text back from the index
 
-# === Initialize Pinecone Client ===
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-if INDEX_NAME not in pc.list_indexes().names():
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=384,
-        metric='cosine',
-        spec=ServerlessSpec(cloud="aws", region=PINECONE_ENV)
-    )
-
-index = pc.Index(INDEX_NAME)
-
-# === Load embedding model ===
-model = SentenceTransformer("my_minilm_model")
-
-# === Load the paper data and split it into chunks ===
-def split_text_into_chunks(text, chunk_size=1000, overlap_size=200):
-    """Split text into overlapping chunks based on the token count."""
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), chunk_size - overlap_size):
-        chunk = " ".join(words[i:i + chunk_size])
-        chunks.append(chunk)
-    return chunks
-
-def extract_text_from_pdf(filepath):
-    doc = fitz.open(filepath)
-    full_text = ""
-    for page in doc:
-        full_text += page.get_text("text") 
-    doc.close()
-    return full_text
-
-# === Main processing function to upsert into Pinecone ===
-def build_vector_db(base_paper_dir):
-    years = ["2022", "2023", "2024"]
-    papers_for_review = []
+# === Lazily-created ingestion state (nothing is loaded at import time) ===
+# Paper -> chunk-id posting index, read by retrieve_chunks.py
+get_postings = lazy_resource("ingest_postings", lambda: ChunkPostings(sidecar_path(INDEX_NAME, "postings.json")))
+# Record of indexed PDFs (signatures + vector ids) for incremental runs
+get_manifest = lazy_resource("ingest_manifest", lambda: IndexManifest(sidecar_path(INDEX_NAME, "manifest.json")))
+# BM25 index over chunk text, read by the follow-up chunk ranking for hybrid scoring
+get_lexical_index = lazy_resource("ingest_chunks_bm25", lambda: BM25Index(sidecar_path(INDEX_NAME, "bm25")))
 
+# === Streaming ingestion pipeline: papers -> chunks -> embeddings -> upserts ===
+def list_years(base_paper_dir):
+    """Conference years available on disk, e.g. ['2022', '2023', '2024']."""
+    cvpr_dir = os.path.join(base_paper_dir, "cvpr")
+    return sorted(year for year in os.listdir(cvpr_dir) if os.path.isdir(os.path.join(cvpr_dir, year, "papers")))
+
+def iter_papers(base_paper_dir, years):
+    """Yield (year, paper_id, title, file_path) for every PDF with a known title."""
     for year in years:
         print(f"📚 Processing year {year}...")
         year_paper_dir = os.path.join(base_paper_dir, "cvpr", year, "papers")
@@ -65,7 +48,6 @@ def build_vector_db(base_paper_dir):
         pdf_files = sorted([f for f in os.listdir(year_paper_dir) if f.endswith(".pdf")], key=lambda x: int(os.path.splitext(x)[0]))
 
         for pdf_file in tqdm(pdf_files, desc=f"Year {year}"):
-            file_path = os.path.join(year_paper_dir, pdf_file)
             paper_id = os.path.splitext(pdf_file)[0]
             paper_index = int(paper_id)
 
@@ -73,37 +55,209 @@ def build_vector_db(base_paper_dir):
                 print(f"⚠️ Warning: No title for paper {pdf_file}. Skipping.")
                 continue
 
-            paper_title = titles[paper_index]
-            full_text = extract_text_from_pdf(file_path)
-            chunks = split_text_into_chunks(full_text)
-
-            for chunk in chunks:
-                chunk = chunk.strip()
-                if len(chunk) < 100:
-                    continue
-
-                embedding = model.encode(chunk).tolist()
-                uid = str(uuid.uuid4())
-
-                papers_for_review.append({
-                    "id": uid,
-                    "values": embedding,
-                    "metadata": {
-                        "paper_id": f"{year}_{paper_id}",
-                        "title": paper_title,
-                        "year": year,
-                        "content": chunk
-                    }
-                })
-
-    # === Upsert papers in small batches ===
-    batch_size = 50  # Adjust depending on vector size
-    for i in range(0, len(papers_for_review), batch_size):
-        batch = papers_for_review[i:i+batch_size]
-        index.upsert(vectors=batch)
-
-    print(f"✅ All papers processed and upserted to Pinecone.")
+            yield year, paper_id, titles[paper_index], os.path.join(year_paper_dir, pdf_file)
+
+def iter_changed_papers(papers, seen_titles):
+    """
+    Drop papers whose PDF and title are unchanged since the last run (per the
+    manifest), yielding (year, paper_id, title, signature, file_path) for the rest.
+    Every paper found on disk is added to ``seen_titles`` (key -> title).
+    """
+    manifest = get_manifest()
+    for year, paper_id, paper_title, file_path in papers:
+        key = f"{year}_{paper_id}"
+        seen_titles[key] = paper_title
+        # The chunker version is part of the signature, so a new chunker re-chunks every PDF
+        extra = f"{paper_title}|{CHUNKER_VERSION}"
+        if manifest.is_file_current(key, file_path, extra=extra):
+            continue
+        yield year, paper_id, paper_title, manifest.file_signature(file_path, extra=extra), file_path
+
+def find_legacy_chunks():
+    """
+    Paper key -> ids of the chunks an older version wrote with uuid4 ids, from
+    one listing pass over the index (empty for a new index).
+    """
+    index = get_index(INDEX_NAME, create=True)
+    if not has_vectors(index):
+        return {}
+    with span("ingest.legacy_lookup"):
+        return legacy_vectors_by(index, "paper_id")
+
+def iter_chunk_records(extracted_papers, stale_ids, legacy_by_paper=None):
+    """
+    Turn (paper, chunks) pairs from the extraction stage into un-embedded chunk
+    records. Each chunk's text goes into the BM25 index; once a paper is done
+    its chunk ids are registered in the posting index and the manifest, and
+    ids it no longer produces go to ``stale_ids``.
+
+    For papers missing from the manifest, their chunks from before incremental
+    indexing (uuid4 ids, listed in ``legacy_by_paper``) go to ``stale_ids`` too.
+    """
+    manifest, postings, lexical = get_manifest(), get_postings(), get_lexical_index()
+    legacy_by_paper = legacy_by_paper or {}
+    for (year, paper_id, paper_title, signature, file_path), chunks in extracted_papers:
+        key = f"{year}_{paper_id}"
+        chunk_ids = []
+        if key not in manifest:
+            stale_ids.extend(legacy_by_paper.get(key, []))
+
+        for chunk, token_count in chunks:
+            uid = chunk_vector_id(key, len(chunk_ids), chunk)
+            chunk_ids.append(uid)
+            lexical.add(uid, chunk)
+
+            yield {
+                "id": uid,
+                "metadata": {
+                    "paper_id": f"{year}_{paper_id}",
+                    "title": paper_title,
+                    "year": year,
+                    "chunk_index": len(chunk_ids) - 1,
+                    "token_count": token_count,
+                    "content": chunk
+                }
+            }
+
+        stale_ids.extend(set(manifest.ids(key)) - set(chunk_ids))
+        manifest.record(key, signature, chunk_ids)
+        postings.add_paper(key, paper_title, chunk_ids)
+
+def iter_embedded_records(records, batch_size=ENCODE_BATCH_SIZE):
+    """
+    Embed records in batches of ``batch_size`` chunks with a single encode call
+    each; chunks already in the embedding cache skip the model.
+    """
+    model, embedding_cache = get_model(), get_embedding_cache()
+
+    def encode(batch):
+        texts = [record["metadata"]["content"] for record in batch]
+        with span("ingest.encode_batch", chunks=len(batch)):
+            embeddings = embedding_cache.encode(model, texts, batch_size=batch_size)
+        for record, embedding in zip(batch, embeddings):
+            record["values"] = embedding.tolist()
+        return batch
+
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield from encode(batch)
+            batch = []
+    if batch:
+        yield from encode(batch)
+
+def upsert_in_batches(records, batch_size=UPSERT_BATCH_SIZE):
+    """Write records to the index in bounded batches as they arrive; return the count."""
+    index = get_index(INDEX_NAME, create=True)
+    batch, upserted = [], 0
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            with span("ingest.upsert_batch", vectors=len(batch)):
+                index.upsert(vectors=batch)
+            upserted += len(batch)
+            batch = []
+    if batch:
+        with span("ingest.upsert_batch", vectors=len(batch)):
+            index.upsert(vectors=batch)
+        upserted += len(batch)
+    return upserted
+
+def backfill_lexical_index(keys, batch_size=FETCH_BATCH_SIZE):
+    """
+    Add the chunks of already indexed papers that are missing from the BM25
+    index (indexed before it existed, or by a run that did not save it),
+    reading their text back from the vector metadata. Returns the number of
+    chunks added.
+    """
+    manifest, lexical = get_manifest(), get_lexical_index()
+    missing = [vector_id for key in keys for vector_id in manifest.ids(key) if vector_id not in lexical]
+    if not missing:
+        return 0
+
+    index, added = get_index(INDEX_NAME, create=True), 0
+    for i in range(0, len(missing), batch_size):
+        with span("ingest.lexical_backfill", chunks=len(missing[i:i + batch_size])):
+            response = index.fetch(ids=missing[i:i + batch_size])
+        for vector_id, vector in response.vectors.items():
+            content = (vector.metadata or {}).get("content")
+            if content:
+                lexical.add(vector_id, content)
+                added += 1
+    return added
+
+# === Main processing function to upsert into the vector index ===
+@traced("ingest.full_text")
+def build_vector_db(base_paper_dir, years=None, encode_batch_size=ENCODE_BATCH_SIZE,
+                    upsert_batch_size=UPSERT_BATCH_SIZE, workers=None):
+    """
+    Incrementally index the full text of every paper under ``base_paper_dir``.
+
+    Papers stream through extract -> chunk -> batched encode -> batched upsert.
+    PDFs are parsed and chunked by ``workers`` processes (default: CPU count)
+    while the main process embeds and upserts, and memory stays flat regardless
+    of corpus size.
+
+    Chunk ids are deterministic (paper, position, content hash), and only PDFs
+    that are new or changed since the last run (or all of them, if the embedding
+    model changed) are processed. Vectors of changed chunks and of papers no
+    longer on disk are deleted, as are the uuid4-id chunks an older version
+    wrote for a paper when it is first indexed with the manifest. Unchanged
+    papers missing from the BM25 index or the posting index are added to them.
+    """
+    years = years or list_years(base_paper_dir)
+    manifest, postings = get_manifest(), get_postings()
+    seen_titles, stale_ids = {}, []
+    # Chunks indexed before the manifest existed, found before the pipeline starts
+    legacy_by_paper = find_legacy_chunks()
+
+    papers = iter_changed_papers(iter_papers(base_paper_dir, years), seen_titles)
+    papers = iter_extracted_papers(papers, workers=workers)
+    records = iter_chunk_records(papers, stale_ids, legacy_by_paper=legacy_by_paper)
+    records = iter_embedded_records(records, batch_size=encode_batch_size)
+    upserted = upsert_in_batches(records, batch_size=upsert_batch_size)
+
+    # Papers of the processed years that disappeared from disk
+    removed_keys = [
+        key for key in manifest.keys()
+        if key.split("_", 1)[0] in years and key not in seen_titles
+    ]
+    for key in removed_keys:
+        stale_ids.extend(manifest.remove(key))
+        postings.remove_paper(key)
+
+    deleted = delete_in_batches(get_index(INDEX_NAME, create=True), stale_ids)
+    increment("ingest.full_text.chunks_upserted", upserted)
+    increment("ingest.full_text.chunks_deleted", deleted)
+
+    lexical = get_lexical_index()
+    for vector_id in stale_ids:
+        lexical.remove(vector_id)
+    # Unchanged papers skip extraction, so their chunks are added from the index
+    backfilled = backfill_lexical_index(sorted(seen_titles))
+    # ... and papers indexed before the posting index existed get their entry from the manifest
+    for key, title in seen_titles.items():
+        if key not in postings and manifest.ids(key):
+            postings.add_paper(key, title, manifest.ids(key))
+
+    # Only publish the postings, BM25 index and manifest once their chunks are in the index
+    postings.save()
+    lexical.save()
+    manifest.save()
+
+    print(f"✅ {upserted} chunks upserted and {deleted} stale chunks deleted "
+          f"({len(removed_keys)} papers removed) in {INDEX_NAME}; "
+          f"{backfilled} chunks added to the BM25 index.")
 
 if __name__ == "__main__":
-    paper_dir = "/home/averyg99/RagResearch/papers"
-    build_vector_db(paper_dir)
+    parser = argparse.ArgumentParser(description="Chunk, embed and index the full text of CVPR papers.")
+    parser.add_argument("paper_dir", nargs="?", default="/home/averyg99/RagResearch/papers")
+    parser.add_argument("--years", nargs="+", default=None, help="Years to index (default: all on disk)")
+    parser.add_argument("--encode-batch-size", type=int, default=ENCODE_BATCH_SIZE)
+    parser.add_argument("--upsert-batch-size", type=int, default=UPSERT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="PDF parsing processes (default: CPU count)")
+    args = parser.parse_args()
+
+    build_vector_db(args.paper_dir, years=args.years, encode_batch_size=args.encode_batch_size,
+                    upsert_batch_size=args.upsert_batch_size, workers=args.workers)
@@ -0,0 +1,321 @@
+# vectordb/lexical_index.py
+#
+# Compact on-disk BM25 inverted index over paper text (titles + abstracts, or
+# chunk content), keyed by vector id, so exact terms such as method names,
+# datasets and acronyms ("NeRF", "BEV") can be scored alongside dense search
+# and the two rankings fused with reciprocal rank fusion.
+#
+#     python -m vectordb.lexical_index paper-contents --fields content
+
+import os
+import re
+import json
+import argparse
+import threading
+from collections import Counter
+import numpy as np
+
+K1 = 1.2
+B = 0.75
+RRF_K = 60  # reciprocal rank fusion constant
+COMMON_TERM_FRACTION = 0.05  # terms in more documents only rescore the candidates of rarer terms
+COMMON_TERM_MIN_DOCS = 10000  # ... on indexes of at least this many documents
+DENSE_ACCUMULATOR_RATIO = 8  # score into a per-document array once postings exceed 1/8 of the documents
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were we with".split()
+)
+
+_EMPTY_ROWS = np.zeros(0, dtype=np.int64)
+_EMPTY_SCORES = np.zeros(0, dtype=np.float32)
+
+
+def tokenize(text):
+    """Lower-cased alphanumeric terms without stop words; no stemming, so names match exactly."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists
+    it appears in (rank starting at 1).
+
+    Returns:
+        list of (id, score), best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda entry: -entry[1])
+
+
+class BM25Index:
+    """
+    BM25 inverted index stored as CSR posting lists under ``path``:
+
+        index.json       vocabulary, document ids and BM25 parameters
+        offsets.npy      start of each term's postings (int64, terms + 1)
+        docs.npy         document rows of all postings, sorted per term (int32)
+        tfs.npy          term frequencies of all postings (uint16)
+        lengths.npy      document lengths in terms (int32)
+
+    The posting arrays are memory-mapped. Documents added or removed since
+    the last save are merged into new arrays (dropping removed documents) on
+    the next search or save, so ingestion can update the index incrementally.
+    """
+
+    def __init__(self, path, k1=K1, b=B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._terms = {}       # term -> term number
+        self._doc_ids = []     # row -> document id
+        self._row_of = {}      # document id -> row (live documents only)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._docs = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.uint16)
+        self._lengths = np.zeros(0, dtype=np.int32)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._pending = []     # (row, Counter) of documents added since the last merge
+        self._dirty = False
+
+        index_path = os.path.join(path, "index.json")
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.k1, self.b = meta["k1"], meta["b"]
+            self._terms = {term: i for i, term in enumerate(meta["terms"])}
+            self._doc_ids = meta["doc_ids"]
+            self._row_of = {doc_id: row for row, doc_id in enumerate(self._doc_ids)}
+            self._offsets = np.load(os.path.join(path, "offsets.npy"))
+            self._docs = np.load(os.path.join(path, "docs.npy"), mmap_mode="r")
+            self._tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+            self._lengths = np.load(os.path.join(path, "lengths.npy"))
+            self._norms = self._length_norms(self._lengths)
+
+    def __len__(self):
+        return len(self._row_of)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._row_of
+
+    # === Writing ===
+    def add(self, doc_id, text):
+        """Index (or re-index) the text of a document."""
+        with self._lock:
+            self.remove(doc_id)
+            counts = Counter(tokenize(text))
+            row = len(self._doc_ids)
+            self._doc_ids.append(doc_id)
+            self._row_of[doc_id] = row
+            self._pending.append((row, counts))
+            self._dirty = True
+
+    def remove(self, doc_id):
+        """Drop a document; unknown ids are ignored."""
+        with self._lock:
+            if self._row_of.pop(doc_id, None) is not None:
+                self._dirty = True
+
+    def clear(self):
+        """Drop every document."""
+        with self._lock:
+            self._row_of.clear()
+            self._dirty = True
+
+    def _length_norms(self, lengths):
+        """The per-document term k1 * (1 - b + b * length / average length) of the BM25 denominator."""
+        average_length = max(float(lengths.mean()), 1.0) if len(lengths) else 1.0
+        return (self.k1 * (1 - self.b + self.b * lengths / average_length)).astype(np.float32)
+
+    def _merge(self):
+        """Rebuild the posting arrays from the current ones plus pending documents, without removed ones."""
+        num_terms = len(self._offsets) - 1
+        terms = [np.repeat(np.arange(num_terms, dtype=np.int64), np.diff(self._offsets))]
+        docs = [np.asarray(self._docs, dtype=np.int64)]
+        tfs = [np.asarray(self._tfs, dtype=np.int64)]
+        lengths = np.zeros(len(self._doc_ids), dtype=np.int64)
+        lengths[:len(self._lengths)] = self._lengths
+
+        # A new vocabulary dict, so concurrent readers keep a consistent one
+        vocabulary = dict(self._terms)
+        for row, counts in self._pending:
+            term_numbers = [vocabulary.setdefault(term, len(vocabulary)) for term in counts]
+            terms.append(np.asarray(term_numbers, dtype=np.int64))
+            docs.append(np.full(len(counts), row, dtype=np.int64))
+            tfs.append(np.fromiter(counts.values(), dtype=np.int64, count=len(counts)))
+            lengths[row] = sum(counts.values())
+        terms, docs, tfs = np.concatenate(terms), np.concatenate(docs), np.concatenate(tfs)
+
+        # Renumber live documents and drop the postings of removed ones
+        live = np.zeros(len(self._doc_ids), dtype=bool)
+        live[list(self._row_of.values())] = True
+        new_row = np.cumsum(live) - 1
+        keep = live[docs]
+        terms, docs, tfs = terms[keep], new_row[docs[keep]], tfs[keep]
+
+        # Drop terms left without postings
+        term_counts = np.bincount(terms, minlength=len(vocabulary))
+        used = term_counts > 0
+        new_term = np.cumsum(used) - 1
+        terms = new_term[terms]
+
+        order = np.lexsort((docs, terms))
+        self._terms = {term: int(new_term[number]) for term, number in vocabulary.items() if used[number]}
+        self._offsets = np.concatenate([[0], np.cumsum(term_counts[used])]).astype(np.int64)
+        self._docs = docs[order].astype(np.int32)
+        self._tfs = np.minimum(tfs[order], np.iinfo(np.uint16).max).astype(np.uint16)
+        self._lengths = lengths[live].astype(np.int32)
+        self._norms = self._length_norms(self._lengths)
+        self._doc_ids = [doc_id for doc_id, alive in zip(self._doc_ids, live) if alive]
+        self._row_of = {doc_id: row for row, doc_id in enumerate(self._doc_ids)}
+        self._pending = []
+        self._dirty = False
+
+    def save(self):
+        with self._lock:
+            if self._dirty:
+                self._merge()
+            os.makedirs(self.path, exist_ok=True)
+            arrays = {"offsets": self._offsets, "docs": self._docs, "tfs": self._tfs, "lengths": self._lengths}
+            for name, array in arrays.items():
+                np.save(os.path.join(self.path, f"{name}.tmp.npy"), np.asarray(array))
+            with open(os.path.join(self.path, "index.json.tmp"), "w", encoding="utf-8") as f:
+                json.dump({"k1": self.k1, "b": self.b, "terms": sorted(self._terms, key=self._terms.get), "doc_ids": self._doc_ids}, f)
+            # The arrays of this instance may be memory-mapped from the files being replaced
+            self._docs, self._tfs = np.asarray(self._docs).copy(), np.asarray(self._tfs).copy()
+            for name in arrays:
+                os.replace(os.path.join(self.path, f"{name}.tmp.npy"), os.path.join(self.path, f"{name}.npy"))
+            os.replace(os.path.join(self.path, "index.json.tmp"), os.path.join(self.path, "index.json"))
+
+    # === Reading ===
+    def _score_rows(self, query_text):
+        """
+        BM25 scores of every document matching a query term.
+
+        Returns:
+            (sorted rows, scores, row -> doc id list, doc id -> row dict)
+            from one consistent version of the index.
+        """
+        with self._lock:
+            if self._dirty:
+                self._merge()
+            terms, offsets, docs, tfs, norms = self._terms, self._offsets, self._docs, self._tfs, self._norms
+            doc_ids, row_of = self._doc_ids, self._row_of
+
+        num_docs = len(norms)
+
+        def contributions(number, candidates=None):
+            start, end = offsets[number], offsets[number + 1]
+            term_docs = np.asarray(docs[start:end])
+            term_tfs = np.asarray(tfs[start:end], dtype=np.float32)
+            idf = np.float32(np.log1p((num_docs - len(term_docs) + 0.5) / (len(term_docs) + 0.5)))
+            if candidates is not None:
+                # Intersect the (sorted) posting list with the candidate rows
+                positions = np.minimum(np.searchsorted(term_docs, candidates), len(term_docs) - 1)
+                found = term_docs[positions] == candidates
+                term_docs, term_tfs = candidates[found], term_tfs[positions[found]]
+            return term_docs, idf * (self.k1 + 1) * term_tfs / (term_tfs + norms[term_docs])
+
+        query_terms = [(int(offsets[number + 1] - offsets[number]), number)
+                       for number in (terms.get(term) for term in set(tokenize(query_text))) if number is not None]
+        if not query_terms:
+            return _EMPTY_ROWS, _EMPTY_SCORES, doc_ids, row_of
+
+        # Terms in more than COMMON_TERM_FRACTION of the documents carry little
+        # weight: on large indexes, when the query also has rarer terms, those
+        # select the candidates and common terms only add to their scores
+        cutoff = COMMON_TERM_FRACTION * num_docs if num_docs >= COMMON_TERM_MIN_DOCS else num_docs
+        rare = [number for df, number in query_terms if df <= cutoff]
+        common = [number for df, number in query_terms if df > cutoff] if rare else []
+        scored = [contributions(number) for number in (rare or [number for _, number in query_terms])]
+
+        if len(scored) == 1:
+            rows, scores = scored[0][0].astype(np.int64), scored[0][1]
+        else:
+            # Sum the contributions of each document across the posting lists:
+            # sort-based for short lists, a dense accumulator for long ones
+            all_rows = np.concatenate([term_docs for term_docs, _ in scored])
+            all_contributions = np.concatenate([values for _, values in scored])
+            if len(all_rows) * DENSE_ACCUMULATOR_RATIO < num_docs:
+                rows, inverse = np.unique(all_rows, return_inverse=True)
+                rows, scores = rows.astype(np.int64), np.bincount(inverse, weights=all_contributions).astype(np.float32)
+            else:
+                scores = np.bincount(all_rows, weights=all_contributions, minlength=num_docs).astype(np.float32)
+                rows = np.flatnonzero(scores)
+                scores = scores[rows]
+
+        if common and len(rows) * DENSE_ACCUMULATOR_RATIO >= num_docs:
+            # Many candidates: add whole posting lists to a per-document array
+            accumulator = np.zeros(num_docs, dtype=np.float32)
+            for number in common:
+                term_docs, values = contributions(number)
+                accumulator[term_docs] += values
+            scores = scores + accumulator[rows]
+        else:
+            for number in common:
+                term_docs, values = contributions(number, rows)
+                scores[np.searchsorted(rows, term_docs)] += values
+        return rows, scores, doc_ids, row_of
+
+    def search(self, query_text, top_k=10):
+        """
+        Top-k documents by BM25 score.
+
+        Returns:
+            list of (doc_id, score), best first.
+        """
+        rows, scores, doc_ids, _ = self._score_rows(query_text)
+        k = min(top_k, len(rows))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(doc_ids[rows[i]], float(scores[i])) for i in top]
+
+    def score(self, query_text, doc_ids):
+        """BM25 score of each of ``doc_ids`` (0 for unknown or non-matching documents)."""
+        rows, scores, _, row_of = self._score_rows(query_text)
+        result = np.zeros(len(doc_ids), dtype=np.float32)
+        if not len(rows):
+            return result
+        targets = np.asarray([row_of.get(doc_id, -1) for doc_id in doc_ids], dtype=np.int64)
+        positions = np.minimum(np.searchsorted(rows, targets), len(rows) - 1)
+        found = (targets >= 0) & (rows[positions] == targets)
+        result[found] = scores[positions[found]]
+        return result
+
+
+def iter_index_records(index, batch_size=1000):
+    """Yield (vector id, metadata) of every vector in a local or Pinecone index."""
+    for id_batch in index.list():
+        for i in range(0, len(id_batch), batch_size):
+            for vector_id, vector in index.fetch(ids=id_batch[i:i + batch_size]).vectors.items():
+                yield vector_id, dict(vector.metadata or {})
+
+
+def build_from_index(index_name, fields):
+    """Rebuild the BM25 index of ``index_name`` from the text stored in its metadata ``fields``."""
+    from vectordb.store import sidecar_path
+    from vectordb.resources import get_index
+
+    lexical = BM25Index(sidecar_path(index_name, "bm25"))
+    lexical.clear()
+    for vector_id, metadata in iter_index_records(get_index(index_name)):
+        lexical.add(vector_id, "\n".join(str(metadata.get(field, "")) for field in fields))
+    lexical.save()
+    return lexical
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the BM25 index of a vector index from its metadata.")
+    parser.add_argument("index_name", choices=["research-database", "paper-contents"])
+    parser.add_argument("--fields", nargs="+", default=["content"],
+                        help="metadata fields holding the text (abstracts are not stored; "
+                             "re-run papers2vector to index them)")
+    args = parser.parse_args()
+
+    lexical = build_from_index(args.index_name, args.fields)
+    print(f"✅ Indexed {len(lexical)} documents in {lexical.path}")
@@ -0,0 +1,591 @@
+# vectordb/local_store.py
+
+import os
+import json
+import threading
+import numpy as np
+from vectordb.ann_index import IVFIndex, default_nlist
+from vectordb.quantization import CompressedCodes
+from vectordb.attribute_index import AttributeIndex
+
+DEFAULT_DIMENSION = 384
+SCORE_BLOCK_ROWS = 65536  # rows converted to float32 at a time while scoring
+
+
+class Record:
+    """
+    Response object read the same way as Pinecone responses
+    (``response.matches`` or ``response['matches']``). Fields are plain
+    attributes, so ``record.values`` is the vector and ``record.metadata``
+    the metadata, never a method of the container.
+    """
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __getitem__(self, name):
+        return self.__dict__[name]
+
+    def __setitem__(self, name, value):
+        self.__dict__[name] = value
+
+    def __contains__(self, name):
+        return name in self.__dict__
+
+    def __eq__(self, other):
+        return isinstance(other, Record) and self.__dict__ == other.__dict__
+
+    def __repr__(self):
+        return f"Record({self.__dict__!r})"
+
+    def to_dict(self):
+        """Plain dict of the fields (nested records included), like Pinecone's to_dict()."""
+        def convert(value):
+            if isinstance(value, Record):
+                return value.to_dict()
+            if isinstance(value, list):
+                return [convert(item) for item in value]
+            if isinstance(value, dict):
+                return {key: convert(item) for key, item in value.items()}
+            return value
+        return {name: convert(value) for name, value in self.__dict__.items()}
+
+
+def normalize_rows(vectors):
+    """L2-normalise a 1-D or 2-D array so a dot product equals cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def matches_filter(metadata, query_filter):
+    """
+    Evaluate a Pinecone-style metadata filter against one metadata dict.
+
+    Supports $eq, $ne, $in, $nin, $gt, $gte, $lt, $lte, $and and $or, plus
+    $contains (case-insensitive substring, not supported by Pinecone).
+    """
+    if not query_filter:
+        return True
+
+    for key, condition in query_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        for op, operand in condition.items():
+            if op == "$eq" and value != operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$nin" and value in operand:
+                return False
+            if op == "$contains" and (value is None or str(operand).lower() not in str(value).lower()):
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > operand:
+                    return False
+                if op == "$gte" and not value >= operand:
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$lte" and not value <= operand:
+                    return False
+    return True
+
+
+class LocalVectorStore:
+    """
+    In-process vector index backed by a memory-mapped matrix on local disk.
+
+    It answers the subset of the Pinecone ``Index`` API used by this project
+    (upsert, query, fetch, fetch_by_metadata, list, delete,
+    describe_index_stats), so it can be swapped in for a remote index without
+    touching the retrieval code.
+
+    Layout of ``path``:
+        meta.json      dimension and storage dtype
+        vectors.bin    row-major matrix of L2-normalised embeddings
+        records.jsonl  append-only log of upserts and deletes (id, row, metadata)
+        ivf.npz        optional approximate index (see build_ann_index)
+        codes.npz      optional int8 / PQ codes searched in RAM before an exact
+                       rescoring pass (see build_compressed_codes)
+    """
+
+    def __init__(self, path, dimension=DEFAULT_DIMENSION, dtype="float16"):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        self._meta_path = os.path.join(path, "meta.json")
+        self._vectors_path = os.path.join(path, "vectors.bin")
+        self._records_path = os.path.join(path, "records.jsonl")
+        self._ann_path = os.path.join(path, "ivf.npz")
+        self._codes_path = os.path.join(path, "codes.npz")
+
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            dimension, dtype = meta["dimension"], meta["dtype"]
+        else:
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"dimension": dimension, "dtype": dtype}, f)
+
+        if dtype not in ("float16", "float32"):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self._write_lock = threading.RLock()
+        self._load_records()
+        self.ann_index = IVFIndex.load(self._ann_path) if os.path.exists(self._ann_path) else None
+        self.codes = CompressedCodes.load(self._codes_path) if os.path.exists(self._codes_path) else None
+
+    # === Loading ===
+    def _load_records(self):
+        self._row_ids = []
+        self._row_metadata = []
+        self._id_to_row = {}
+        self.attributes = AttributeIndex()
+
+        if os.path.exists(self._records_path):
+            with open(self._records_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if entry["op"] == "upsert":
+                        self.attributes.add(len(self._row_ids), entry.get("metadata") or {})
+                        self._row_ids.append(entry["id"])
+                        self._row_metadata.append(entry.get("metadata") or {})
+                        self._id_to_row[entry["id"]] = entry["row"]
+                    elif entry["op"] == "delete":
+                        self._id_to_row.pop(entry["id"], None)
+
+        # Rows whose vectors were written but whose log entry was not (e.g. an
+        # interrupted upsert) are simply ignored.
+        self._rows = len(self._row_ids)
+        self._live = np.zeros(self._rows, dtype=bool)
+        self._live[list(self._id_to_row.values())] = True
+        self._publish()
+
+    def _publish(self):
+        """
+        Swap in the (matrix, rows, live) snapshot that readers score against.
+        Writers build a new ``live`` array instead of changing the published
+        one, so a query running during an upsert or delete sees either the
+        state before or after it, never a mix.
+        """
+        matrix = None
+        if self._rows:
+            matrix = np.memmap(
+                self._vectors_path, dtype=self.dtype, mode="r",
+                shape=(self._rows, self.dimension)
+            )
+        self._snapshot = (matrix, self._rows, self._live)
+
+    @property
+    def matrix(self):
+        """Memory-mapped view of all stored rows (live and dead)."""
+        return self._snapshot[0]
+
+    def __len__(self):
+        return len(self._id_to_row)
+
+    # === Writing ===
+    def upsert(self, vectors, **kwargs):
+        """
+        Insert or overwrite vectors. Safe to call from several threads.
+
+        Args:
+            vectors (list): Dicts with 'id', 'values' and optional 'metadata',
+                or (id, values[, metadata]) tuples, as accepted by Pinecone.
+
+        Returns:
+            Record: {'upserted_count': n}
+        """
+        with self._write_lock:
+            return self._upsert(vectors)
+
+    def _upsert(self, vectors):
+        if not vectors:
+            return Record(upserted_count=0)
+
+        ids, values, metadata = [], [], []
+        for item in vectors:
+            if isinstance(item, dict):
+                ids.append(str(item["id"]))
+                values.append(item["values"])
+                metadata.append(item.get("metadata") or {})
+            else:
+                ids.append(str(item[0]))
+                values.append(item[1])
+                metadata.append(item[2] if len(item) > 2 else {})
+
+        matrix = normalize_rows(values)
+        if matrix.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-dim vectors, got {matrix.shape[1]}")
+
+        # Make sure the vector file matches the log before appending to it.
+        expected_bytes = self._rows * self.dimension * self.dtype.itemsize
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() != expected_bytes:
+                f.truncate(expected_bytes)
+                f.seek(expected_bytes)
+            f.write(matrix.astype(self.dtype).tobytes())
+
+        first_row = self._rows
+        with open(self._records_path, "a", encoding="utf-8") as f:
+            for offset, (vector_id, meta) in enumerate(zip(ids, metadata)):
+                f.write(json.dumps({"op": "upsert", "id": vector_id, "row": first_row + offset, "metadata": meta}) + "\n")
+
+        live = np.concatenate([self._live, np.ones(len(ids), dtype=bool)])
+        for offset, vector_id in enumerate(ids):
+            previous = self._id_to_row.get(vector_id)
+            if previous is not None:
+                live[previous] = False
+            self._id_to_row[vector_id] = first_row + offset
+
+        for offset, meta in enumerate(metadata):
+            self.attributes.add(first_row + offset, meta)
+        self._row_ids.extend(ids)
+        self._row_metadata.extend(metadata)
+        self._live = live
+        self._rows += len(ids)
+        self._publish()
+
+        return Record(upserted_count=len(ids))
+
+    def delete(self, ids=None, delete_all=False, filter=None, **kwargs):
+        """Delete vectors by id, by metadata filter, or all of them."""
+        with self._write_lock:
+            return self._delete(ids, delete_all, filter)
+
+    def _delete(self, ids, delete_all, filter):
+        if delete_all:
+            self.ann_index = None
+            self.codes = None
+            for path in (self._vectors_path, self._records_path, self._ann_path, self._codes_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._load_records()
+            return Record()
+
+        targets = set(ids or [])
+        if filter:
+            targets.update(
+                self._row_ids[row] for row in self._filter_rows(filter, self._live)
+            )
+
+        live = self._live.copy()
+        with open(self._records_path, "a", encoding="utf-8") as f:
+            for vector_id in targets:
+                row = self._id_to_row.pop(vector_id, None)
+                if row is None:
+                    continue
+                live[row] = False
+                f.write(json.dumps({"op": "delete", "id": vector_id}) + "\n")
+        self._live = live
+        self._publish()
+        return Record()
+
+    def compact(self):
+        """Rewrite the store with only live rows, dropping overwritten and deleted vectors."""
+        with self._write_lock:
+            self._compact()
+
+    def _compact(self):
+        rows = np.flatnonzero(self._live)
+        matrix = np.asarray(self.matrix[rows]) if len(rows) else np.zeros((0, self.dimension), self.dtype)
+
+        tmp_vectors = self._vectors_path + ".tmp"
+        tmp_records = self._records_path + ".tmp"
+        matrix.astype(self.dtype).tofile(tmp_vectors)
+        with open(tmp_records, "w", encoding="utf-8") as f:
+            for new_row, row in enumerate(rows):
+                f.write(json.dumps({"op": "upsert", "id": self._row_ids[row], "row": new_row,
+                                    "metadata": self._row_metadata[row]}) + "\n")
+
+        os.replace(tmp_vectors, self._vectors_path)
+        os.replace(tmp_records, self._records_path)
+        self._load_records()
+
+        # Row numbers changed, so the approximate index and codes have to be rebuilt.
+        if self.ann_index is not None:
+            self.build_ann_index(nlist=self.ann_index.nlist, nprobe=self.ann_index.nprobe)
+        if self.codes is not None:
+            subspaces = self.codes.codebooks.shape[0] if self.codes.kind == "pq" else None
+            self.build_compressed_codes(self.codes.kind, pq_subspaces=subspaces, rescore=self.codes.rescore)
+
+    def build_ann_index(self, nlist=None, nprobe=None, iterations=10):
+        """
+        Build (or rebuild) the IVF approximate index over all stored rows and
+        save it next to the vectors. Rows upserted afterwards are still found:
+        they are scored exhaustively until the next rebuild.
+
+        A store with fewer live rows than lists (or none) gets no index, and
+        queries keep using exact search; returns None in that case.
+        """
+        live_rows = int(np.count_nonzero(self._live))
+        nlist = nlist or default_nlist(live_rows)
+        if self.matrix is None or live_rows < nlist:
+            print(f"⚠️ Warning: {live_rows} live vectors are too few for {nlist} IVF lists; using exact search.")
+            self.ann_index = None
+            if os.path.exists(self._ann_path):
+                os.remove(self._ann_path)
+            return None
+
+        kwargs = {"nprobe": nprobe} if nprobe else {}
+        self.ann_index = IVFIndex.build(self.matrix, nlist=nlist, iterations=iterations, **kwargs)
+        self.ann_index.save(self._ann_path)
+        return self.ann_index
+
+    def build_compressed_codes(self, kind="int8", pq_subspaces=None, rescore=None):
+        """
+        Build (or rebuild) compressed codes of all stored rows and save them
+        next to the vectors. Non-exact queries then score the codes and only
+        read the ``rescore * top_k`` best rows from vectors.bin for exact
+        rescoring; rows upserted afterwards are scored exactly until the next
+        rebuild.
+        """
+        kwargs = {}
+        if pq_subspaces:
+            kwargs["pq_subspaces"] = pq_subspaces
+        if rescore:
+            kwargs["rescore"] = rescore
+        self.codes = CompressedCodes.build(self.matrix, kind=kind, **kwargs)
+        self.codes.save(self._codes_path)
+        return self.codes
+
+    # === Reading ===
+    def _filter_rows(self, query_filter, live):
+        """
+        Rows matching a metadata filter that are live in ``live``, looked up
+        in the attribute posting lists; filters they cannot answer fall back
+        to a linear scan. Rows appended after ``live`` was taken are left out.
+        """
+        rows = self.attributes.rows(query_filter, self._row_metadata.__getitem__)
+        if rows is None:
+            return np.asarray([
+                row for row in np.flatnonzero(live)
+                if matches_filter(self._row_metadata[row], query_filter)
+            ], dtype=np.int64)
+        rows = rows[rows < len(live)]
+        return rows[live[rows]]
+
+    def _score(self, query, matrix, rows=None):
+        """Cosine similarity of a normalised query against all rows of ``matrix``, or the given rows."""
+        if rows is not None:
+            scores = np.empty(len(rows), dtype=np.float32)
+            for start in range(0, len(rows), SCORE_BLOCK_ROWS):
+                block_rows = rows[start:start + SCORE_BLOCK_ROWS]
+                scores[start:start + len(block_rows)] = np.asarray(matrix[block_rows], dtype=np.float32) @ query
+            return scores
+
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        return scores
+
+    def _score_codes(self, query, matrix, rows):
+        """Approximate scores from the compressed codes; uncoded (newer) rows are scored exactly."""
+        scores = np.empty(len(rows), dtype=np.float32)
+        coded = rows < self.codes.num_rows
+        scores[coded] = self.codes.score(query, rows[coded])
+        if not coded.all():
+            scores[~coded] = self._score(query, matrix, rows[~coded])
+        return scores
+
+    def _probed_rows(self, query, nprobe, live):
+        """Live rows of the probed IVF lists plus rows added since the IVF build."""
+        rows = self.ann_index.candidates(query, nprobe)
+        rows = rows[rows < len(live)]
+        if self.ann_index.num_rows < len(live):
+            rows = np.concatenate([rows, np.arange(self.ann_index.num_rows, len(live))])
+        rows = np.sort(rows)
+        return rows[live[rows]]
+
+    def _candidate_rows(self, query, query_filter, exact, nprobe, top_k, live):
+        """
+        Rows worth scoring for a query: the rows matching a filter, the probed
+        IVF lists plus rows added since the IVF build, or None for all rows.
+
+        A selective filter is answered exactly from its posting lists; a broad
+        one is intersected with the probed IVF lists, unless that leaves fewer
+        than ``top_k`` rows.
+        """
+        if query_filter:
+            rows = self._filter_rows(query_filter, live)
+            if self.ann_index is None or exact:
+                return rows
+            probed = self._probed_rows(query, nprobe, live)
+            if len(rows) <= len(probed):
+                return rows
+            narrowed = np.intersect1d(rows, probed, assume_unique=True)
+            return narrowed if len(narrowed) >= top_k else rows
+        if self.ann_index is None or exact:
+            return None
+        return self._probed_rows(query, nprobe, live)
+
+    def _record(self, row, matrix, score=None, include_metadata=True, include_values=False):
+        record = Record(id=self._row_ids[row])
+        if score is not None:
+            record["score"] = float(score)
+        if include_metadata:
+            record["metadata"] = self._row_metadata[row]
+        if include_values:
+            record["values"] = np.asarray(matrix[row], dtype=np.float32).tolist()
+        return record
+
+    def query(self, vector=None, top_k=10, filter=None, include_metadata=False,
+              include_values=False, id=None, exact=False, nprobe=None, rescore=None, **kwargs):
+        """
+        Return the top-k rows by cosine similarity to ``vector`` (or to the
+        stored vector with the given ``id``), optionally restricted by a
+        metadata filter.
+
+        When an IVF index has been built, unfiltered queries only score the
+        ``nprobe`` closest lists; pass ``exact=True`` to score every row.
+        When compressed codes have been built, candidates are scored on the
+        codes and the best ``rescore * top_k`` are rescored exactly.
+        """
+        matrix, num_rows, live = self._snapshot
+        if vector is None and id is not None:
+            (matrix, num_rows, live), rows = self._snapshot_rows([id])
+            vector = matrix[rows[id]]
+        query = normalize_rows(vector).reshape(-1)
+
+        if not num_rows or top_k <= 0:
+            return Record(matches=[], namespace="")
+
+        rows = self._candidate_rows(query, filter, exact, nprobe, top_k, live)
+        if self.codes is not None and not exact:
+            if rows is None:
+                rows = np.flatnonzero(live)
+            shortlist_size = min(len(rows), top_k * (rescore or self.codes.rescore))
+            if shortlist_size < len(rows):
+                approx = self._score_codes(query, matrix, rows)
+                rows = np.sort(rows[np.argpartition(-approx, shortlist_size - 1)[:shortlist_size]])
+            scores = self._score(query, matrix, rows)
+        elif rows is None:
+            scores = self._score(query, matrix)
+            scores[~live] = -np.inf
+            rows = np.arange(num_rows)
+        else:
+            scores = self._score(query, matrix, rows)
+
+        k = min(top_k, int(np.count_nonzero(np.isfinite(scores))))
+        if k == 0:
+            return Record(matches=[], namespace="")
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        matches = [self._record(rows[i], matrix, scores[i], include_metadata, include_values) for i in top]
+        return Record(matches=matches, namespace="")
+
+    def query_batch(self, vectors, top_k=10, filter=None, include_metadata=False,
+                    include_values=False, exact=False, nprobe=None, rescore=None, **kwargs):
+        """
+        Answer several queries at once; returns one ``query`` result per vector.
+
+        With exact search (no IVF index or codes, or ``exact=True``) the
+        queries share one pass over the matrix: each block of rows is scored
+        against all queries in a single matrix-matrix product and a running
+        top-k is kept per query. Otherwise every query probes its own IVF
+        lists or codes shortlist, so they are answered one by one.
+        """
+        queries = normalize_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        if (self.ann_index is not None or self.codes is not None) and not exact:
+            return [
+                self.query(vector=query, top_k=top_k, filter=filter, include_metadata=include_metadata,
+                           include_values=include_values, nprobe=nprobe, rescore=rescore)
+                for query in queries
+            ]
+
+        matrix, _, live = self._snapshot
+        rows = self._filter_rows(filter, live) if filter else np.flatnonzero(live)
+        if not len(rows) or top_k <= 0:
+            return [Record(matches=[], namespace="") for _ in queries]
+
+        # Running top-k (scores, rows) per query, merged with each block's top-k
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(rows), SCORE_BLOCK_ROWS):
+            block_rows = rows[start:start + SCORE_BLOCK_ROWS]
+            if block_rows[-1] - block_rows[0] + 1 == len(block_rows):
+                block = np.asarray(matrix[block_rows[0]:block_rows[-1] + 1], dtype=np.float32)
+            else:
+                block = np.asarray(matrix[block_rows], dtype=np.float32)
+            scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+            candidates = np.concatenate([best_rows, np.broadcast_to(block_rows, (len(queries), len(block_rows)))], axis=1)
+            k = min(top_k, scores.shape[1])
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(candidates, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [
+            Record(matches=[
+                self._record(row, matrix, score, include_metadata, include_values)
+                for row, score in zip(query_rows, query_scores)
+            ], namespace="")
+            for query_rows, query_scores in zip(best_rows, best_scores)
+        ]
+
+    def _snapshot_rows(self, ids):
+        """
+        The published snapshot and the rows of ``ids`` in it (missing ids are
+        left out). An id whose upsert is not published yet is resolved again
+        under the write lock, once the upsert has finished.
+        """
+        snapshot = self._snapshot
+        rows = {vector_id: self._id_to_row.get(vector_id) for vector_id in ids}
+        if any(row is not None and row >= snapshot[1] for row in rows.values()):
+            with self._write_lock:
+                snapshot = self._snapshot
+                rows = {vector_id: self._id_to_row.get(vector_id) for vector_id in ids}
+        return snapshot, {vector_id: row for vector_id, row in rows.items() if row is not None}
+
+    def fetch(self, ids, **kwargs):
+        """Return stored vectors and metadata for the given ids."""
+        (matrix, _, _), rows = self._snapshot_rows(ids)
+        vectors = {vector_id: self._record(row, matrix, include_values=True) for vector_id, row in rows.items()}
+        return Record(vectors=vectors, namespace="")
+
+    def fetch_by_metadata(self, filter, limit=100, pagination_token=None, **kwargs):
+        """
+        Return up to ``limit`` stored vectors matching a metadata filter, like
+        Pinecone's fetch_by_metadata(); ``pagination.next`` continues the listing.
+        """
+        matrix, _, live = self._snapshot
+        rows = self._filter_rows(filter, live)
+        start = int(pagination_token or 0)
+        page = rows[start:start + limit]
+        vectors = {self._row_ids[row]: self._record(row, matrix, include_values=True) for row in page}
+        pagination = Record(next=str(start + limit)) if start + limit < len(rows) else None
+        return Record(vectors=vectors, namespace="", pagination=pagination)
+
+    def list(self, prefix=None, limit=100, **kwargs):
+        """Yield batches of up to ``limit`` live ids, optionally starting with ``prefix``, like Pinecone's list()."""
+        ids = [vector_id for vector_id in list(self._id_to_row) if prefix is None or vector_id.startswith(prefix)]
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def describe_index_stats(self, **kwargs):
+        return Record(dimension=self.dimension, total_vector_count=len(self))
@@ -0,0 +1,192 @@
+# vectordb/manifest.py
+
+import os
+import re
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(BASE_DIR, "my_minilm_model")
+SMALL_FILE_BYTES = 1 << 20  # files below this size are hashed by content
+# Vectors written before the manifest existed have random uuid4 ids
+LEGACY_ID_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$")
+LEGACY_FETCH_BATCH_SIZE = 1000  # Pinecone's limit on ids per fetch request
+
+
+def content_hash(text):
+    """Stable hex digest of a piece of text."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def model_fingerprint(model_dir=MODEL_DIR):
+    """
+    Fingerprint of a local SentenceTransformer directory: content hash of its
+    config/tokenizer files plus name and size of large weight files.
+    """
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(model_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith((".py", ".pyc", ".md")):
+                continue
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, model_dir).encode("utf-8"))
+            size = os.path.getsize(path)
+            if size < SMALL_FILE_BYTES:
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+            else:
+                digest.update(str(size).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def encoder_fingerprint(model_dir=MODEL_DIR, backend=None):
+    """
+    model_fingerprint plus the encoder backend (EMBEDDING_BACKEND by default)
+    and its quantization settings, so switching backends re-embeds instead
+    of mixing vectors of different encoders in one index.
+    """
+    from vectordb.fast_encoder import backend_from_env, backend_tag
+    tag = backend_tag(backend or backend_from_env())
+    fingerprint = model_fingerprint(model_dir)
+    return f"{fingerprint}-{tag}" if tag else fingerprint
+
+
+def chunk_vector_id(paper_id, chunk_index, text):
+    """Deterministic id of a full-text chunk: paper, position and content."""
+    return f"{paper_id}#{chunk_index}-{content_hash(text)[:12]}"
+
+
+def abstract_vector_id(year, title, text):
+    """Deterministic id of an abstract vector: year, title and content."""
+    return f"{year}_{content_hash(title)[:12]}-{content_hash(text)[:12]}"
+
+
+class IndexManifest:
+    """
+    Local record of what has been written to a vector index.
+
+    For every item (a paper PDF or an abstract row) it keeps a signature of the
+    source (file size/mtime/sha256, or a content hash), the fingerprint of the
+    embedding model and encoder backend and the vector ids written for it. An item is re-indexed
+    only when its source or the model changed, and the stored ids tell which
+    vectors to delete when an item changes or disappears.
+
+    File format:
+        {"items": {key: {"signature": {...}, "model": "<fingerprint>", "ids": [...]}}}
+    """
+
+    def __init__(self, path, model=None):
+        self.path = path
+        self.model = model or encoder_fingerprint()
+        self.items = {}
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.items = json.load(f).get("items", {})
+
+    def _entry(self, key):
+        """Manifest entry for ``key`` if it was embedded with the current model."""
+        entry = self.items.get(key)
+        if entry is None or entry.get("model") != self.model:
+            return None
+        return entry
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def keys(self):
+        return list(self.items)
+
+    def ids(self, key):
+        entry = self.items.get(key)
+        return list(entry["ids"]) if entry else []
+
+    def is_current(self, key, signature):
+        """True if ``key`` was indexed from an identical source with the current model."""
+        entry = self._entry(key)
+        return entry is not None and entry["signature"] == signature
+
+    def is_file_current(self, key, path, extra=None):
+        """
+        Like is_current for a file. The cheap size/mtime check is tried first; if
+        it fails the file is hashed, so a touched but unchanged file is not re-indexed.
+        """
+        entry = self._entry(key)
+        if entry is None:
+            return False
+
+        stat = os.stat(path)
+        stored = entry["signature"]
+        if stored.get("extra") != extra:
+            return False
+        if stored.get("size") == stat.st_size and stored.get("mtime") == stat.st_mtime:
+            return True
+        if stored.get("sha256") == file_hash(path):
+            stored.update(size=stat.st_size, mtime=stat.st_mtime)
+            return True
+        return False
+
+    def file_signature(self, path, extra=None):
+        stat = os.stat(path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": file_hash(path), "extra": extra}
+
+    def record(self, key, signature, ids):
+        self.items[key] = {"signature": signature, "model": self.model, "ids": list(ids)}
+
+    def remove(self, key):
+        """Forget an item and return the vector ids that were written for it."""
+        entry = self.items.pop(key, None)
+        return entry["ids"] if entry else []
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"items": self.items}, f)
+        os.replace(tmp_path, self.path)
+
+
+def has_vectors(index):
+    """True if the index holds any vector (so legacy vectors may need cleaning up)."""
+    return index.describe_index_stats().total_vector_count > 0
+
+
+def legacy_vectors_by(index, field, batch_size=LEGACY_FETCH_BATCH_SIZE, max_in_flight=4):
+    """
+    Vectors written before incremental indexing (random uuid4 ids), grouped
+    by a metadata field, in one pass: every id of the index is listed once
+    and the uuid4 ones are fetched in batches, ``max_in_flight`` at a time.
+
+    Returns:
+        dict: metadata[field] -> list of legacy vector ids.
+    """
+    legacy = [vector_id for page in index.list() for vector_id in page if LEGACY_ID_PATTERN.match(vector_id)]
+    batches = [legacy[i:i + batch_size] for i in range(0, len(legacy), batch_size)]
+
+    by_value = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(len(batches), max_in_flight))) as executor:
+        for response in executor.map(lambda batch: index.fetch(ids=batch), batches):
+            for vector_id, vector in response.vectors.items():
+                value = (vector.metadata or {}).get(field)
+                if value is not None:
+                    by_value.setdefault(value, []).append(vector_id)
+    return by_value
+
+
+def delete_in_batches(index, ids, batch_size=1000):
+    """Delete vector ids from an index in bounded requests."""
+    ids = list(ids)
+    for i in range(0, len(ids), batch_size):
+        index.delete(ids=ids[i:i + batch_size])
+    return len(ids)
@@ -1,41 +1,91 @@
 import os
-import uuid
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from tqdm import tqdm
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
+from vectordb.store import sidecar_path
+from vectordb.resources import get_index, get_model, get_embedding_cache, lazy_resource
+from vectordb.tracing import span, traced, increment, record_error
+from vectordb.manifest import (
+    IndexManifest, abstract_vector_id, content_hash, delete_in_batches, has_vectors, legacy_vectors_by
+)
+from vectordb.lexical_index import BM25Index
 
 # === Load .env and keys ===
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv(os.path.join(BASE_DIR, ".env"))
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_ENV = os.getenv("PINECONE_ENV")
 INDEX_NAME = "research-database"
-
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-if INDEX_NAME not in pc.list_indexes().names():
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=384,
-        metric='cosine',
-        spec=ServerlessSpec(cloud="aws", region=PINECONE_ENV)
-    )
-
-index = pc.Index(INDEX_NAME)
-
-model = SentenceTransformer("my_minilm_model")
-
-def process_conference_year(folder_path, year):
+ENCODE_BATCH_SIZE = 128  # abstracts per forward pass inside model.encode
+UPSERT_BATCH_SIZE = 100  # vectors per upsert request
+MAX_IN_FLIGHT = 4        # concurrent upsert requests
+# Bump when the metadata written per abstract changes, so existing vectors are rewritten
+METADATA_VERSION = 2     # 2: filterable "year" (int) and "conference"
+
+# Record of indexed abstracts (content hashes + vector ids) for incremental runs,
+# loaded on first use like the index and model (see vectordb/resources.py)
+get_manifest = lazy_resource("abstracts_manifest", lambda: IndexManifest(sidecar_path(INDEX_NAME, "manifest.json")))
+# BM25 index over titles and abstracts, read by retrieve_vector.py for hybrid search
+get_lexical_index = lazy_resource("ingest_papers_bm25", lambda: BM25Index(sidecar_path(INDEX_NAME, "bm25")))
+
+def upsert_in_batches(vectors, batch_size=UPSERT_BATCH_SIZE, max_in_flight=MAX_IN_FLIGHT):
+    """
+    Upsert vectors in batches, with up to ``max_in_flight`` requests running
+    concurrently. Returns the set of vector ids that were written.
+    """
+    batches = [vectors[i:i + batch_size] for i in range(0, len(vectors), batch_size)]
+    index = get_index(INDEX_NAME, create=True)
+
+    def upsert(batch):
+        try:
+            with span("ingest.upsert_batch", vectors=len(batch)):
+                index.upsert(vectors=batch)
+            return [vector["id"] for vector in batch]
+        except Exception as e:
+            record_error("ingest.abstracts", f"Error upserting batch starting at '{batch[0]['metadata']['title']}': {e}")
+            return []
+
+    written = set()
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+        for ids in executor.map(upsert, batches):
+            written.update(ids)
+    return written
+
+def find_legacy_vectors(max_in_flight=MAX_IN_FLIGHT):
+    """
+    Title -> ids of the abstracts an older version wrote with uuid4 ids, from
+    one listing pass over the index (empty for a new index).
+    """
+    index = get_index(INDEX_NAME, create=True)
+    if not has_vectors(index):
+        return {}
+    with span("ingest.legacy_lookup"):
+        return legacy_vectors_by(index, "title", max_in_flight=max_in_flight)
+
+@traced("ingest.abstracts_year")
+def process_conference_year(folder_path, year, conference="cvpr", encode_batch_size=ENCODE_BATCH_SIZE,
+                            upsert_batch_size=UPSERT_BATCH_SIZE, max_in_flight=MAX_IN_FLIGHT,
+                            legacy_by_title=None):
+    """
+    Embed the new or changed abstracts of one conference year in a single
+    batched encode call and write them in large, concurrent upsert batches.
+    Vectors of changed or removed abstracts are deleted, and so are the
+    uuid4-id vectors earlier versions wrote for a title that is indexed with
+    the manifest for the first time (``legacy_by_title``, from
+    find_legacy_vectors; looked up here when not given). Titles and abstracts
+    missing from the BM25 index (new, changed, or indexed before it existed)
+    are added to it.
+
+    Returns:
+        set of str: Manifest keys of the year's valid abstracts, or None if the
+        year could not be read.
+    """
     abstracts_path = os.path.join(folder_path, "abstracts.csv")
     authors_path = os.path.join(folder_path, "authors.csv")
     paper_info_path = os.path.join(folder_path, "paper_info.csv")
 
     if not (os.path.exists(abstracts_path) and os.path.exists(paper_info_path)):
         print(f"Missing CSVs in {folder_path}")
-        return
+        return None
 
     abstracts_df = pd.read_csv(abstracts_path, delimiter="~")
     authors_df = pd.read_csv(authors_path, delimiter="~")
@@ -53,47 +103,127 @@ def process_conference_year(folder_path, year):
     
     print(merged_df)
 
-    for _, row in merged_df.iterrows():
-        title = str(row.get("title", "")).strip()
-        abstract = str(row.get("abstract", "")).strip()
-
-        if not title or len(abstract) < 30:
-            continue
+    merged_df["title"] = merged_df["title"].fillna("").astype(str).str.strip()
+    merged_df["abstract"] = merged_df["abstract"].fillna("").astype(str).str.strip()
+    valid_df = merged_df[(merged_df["title"] != "") & (merged_df["abstract"].str.len() >= 30)]
+    valid_df = valid_df.drop_duplicates(subset="title")
 
-        embedding = model.encode(abstract).tolist()
-        vector_id = str(uuid.uuid4())
+    def column(name):
+        if name not in valid_df:
+            return [""] * len(valid_df)
+        return valid_df[name].astype(str).tolist()
 
+    rows = []
+    for title, abstract, authors, abstract_url, pdf_url in zip(
+        column("title"), column("abstract"), column("authors"), column("abstract_url"), column("pdf_url")
+    ):
         metadata = {
             "title": title,
-            "authors": str(row.get("authors", "")),
-            "abstract_url": str(row.get("abstract_url", "")),
-            "pdf_url": str(row.get("pdf_url", ""))
+            "authors": authors,
+            "abstract_url": abstract_url,
+            "pdf_url": pdf_url,
+            "year": int(year) if str(year).isdigit() else year,
+            "conference": conference
         }
-
-        try:
-            upsert_response = index.upsert([{
-                "id": vector_id,
-                "values": embedding,
-                "metadata": metadata
-            }])
-            print(f"Upsert response: {upsert_response}")
-        except Exception as e:
-            print(f"Error upserting vector for {title}: {e}")
+        rows.append({
+            "key": f"{year}:{title}",
+            "signature": {
+                "hash": content_hash("\n".join([abstract, authors, abstract_url, pdf_url, conference])),
+                "metadata_version": METADATA_VERSION
+            },
+            "id": abstract_vector_id(year, title, abstract),
+            "abstract": abstract,
+            "metadata": metadata
+        })
+
+    manifest = get_manifest()
+    seen_keys = {row["key"] for row in rows}
+    changed = [row for row in rows if not manifest.is_current(row["key"], row["signature"])]
+    print(f"{len(changed)} of {len(rows)} abstracts for {year} are new or changed.")
+
+    # Abstracts first indexed with the manifest replace the uuid4-id vectors
+    # an older version wrote for the same title
+    legacy_ids = {}
+    new_rows = [row for row in changed if row["key"] not in manifest]
+    if new_rows:
+        if legacy_by_title is None:
+            legacy_by_title = find_legacy_vectors()
+        legacy_ids = {row["key"]: legacy_by_title.get(row["metadata"]["title"], []) for row in new_rows}
+
+    written = set()
+    if changed:
+        # One batched forward pass over every new or changed abstract of the
+        # year that is not already in the embedding cache
+        with span("ingest.encode_batch", abstracts=len(changed)):
+            embeddings = get_embedding_cache().encode(
+                get_model(),
+                [row["abstract"] for row in changed],
+                batch_size=encode_batch_size,
+                show_progress_bar=True
+            )
+        vectors = [
+            {"id": row["id"], "values": embedding.tolist(), "metadata": row["metadata"]}
+            for row, embedding in zip(changed, embeddings)
+        ]
+        written = upsert_in_batches(vectors, batch_size=upsert_batch_size, max_in_flight=max_in_flight)
+        increment("ingest.abstracts.vectors_upserted", len(written))
+        print(f"Upserted {len(written)}/{len(vectors)} vectors for {year}.")
+
+    stale_ids = []
+    for row in changed:
+        if row["id"] in written:
+            stale_ids.extend(set(manifest.ids(row["key"])) - {row["id"]})
+            stale_ids.extend(legacy_ids.get(row["key"], []))
+            manifest.record(row["key"], row["signature"], [row["id"]])
+
+    # Abstracts of this year that are no longer in the CSVs
+    for key in manifest.keys():
+        if key.startswith(f"{year}:") and key not in seen_keys:
+            stale_ids.extend(manifest.remove(key))
+
+    delete_in_batches(get_index(INDEX_NAME, create=True), stale_ids)
+    manifest.save()
+
+    lexical = get_lexical_index()
+    for vector_id in stale_ids:
+        lexical.remove(vector_id)
+    for row in rows:
+        if row["id"] not in lexical and manifest.is_current(row["key"], row["signature"]):
+            lexical.add(row["id"], f"{row['metadata']['title']}\n{row['abstract']}")
+    lexical.save()
 
     print(f"{year} papers indexed.")
+    return seen_keys
 
-def build_vector_db(base_conference_path):
+def build_vector_db(base_conference_path, conference="cvpr"):
+    years = []
+    # One listing pass for the whole run; every year looks its titles up in it
+    legacy_by_title = find_legacy_vectors()
     for year in sorted(os.listdir(base_conference_path)):
         year_path = os.path.join(base_conference_path, year)
         if os.path.isdir(year_path):
-            print(f"Processing CVPR {year}")
-            process_conference_year(year_path, year)
+            print(f"Processing {conference.upper()} {year}")
+            process_conference_year(year_path, year, conference=conference, legacy_by_title=legacy_by_title)
+            years.append(year)
+
+    # Drop abstracts of years that are no longer on disk
+    manifest = get_manifest()
+    removed_keys = [key for key in manifest.keys() if key.split(":", 1)[0] not in years]
+    if removed_keys:
+        removed_ids = [vector_id for key in removed_keys for vector_id in manifest.remove(key)]
+        delete_in_batches(get_index(INDEX_NAME, create=True), removed_ids)
+        manifest.save()
+        lexical = get_lexical_index()
+        for vector_id in removed_ids:
+            lexical.remove(vector_id)
+        lexical.save()
+        print(f"Removed {len(removed_keys)} abstracts of years no longer on disk.")
 
     print("All papers indexed successfully.")
 
 if __name__ == "__main__":
     paper_dir = os.path.join(BASE_DIR, "papers", "cvpr")
-    build_vector_db(paper_dir)
+    build_vector_db(paper_dir, conference="cvpr")
 
 
 
@@ -0,0 +1,143 @@
+# vectordb/pdf_extraction.py
+#
+# PDF parsing and chunking, kept free of model/index state so it can run in
+# worker processes without loading the embedding model or opening an index.
+
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from tiktoken import get_encoding
+
+MIN_CHUNK_CHARS = 100
+PREFETCH_PER_WORKER = 2  # PDFs queued ahead per worker
+
+TOKENIZER = "cl100k_base"   # the GPT-4o prompt tokenizer, so stored counts match prompt cost
+CHUNK_TOKENS = 800
+OVERLAP_TOKENS = 150
+# Bump when chunk boundaries change, so full2vector.py re-chunks every PDF
+CHUNKER_VERSION = "tokens-v1"
+
+# Section headings such as "3 Method", "4.2. Results", "ABSTRACT" or "References"
+HEADING_PATTERN = re.compile(
+    r"^(\d+(\.\d+)*\.?\s+[A-Z][^.]{0,80}|[A-Z][A-Z \-]{3,60}|Abstract|Introduction|Conclusions?|References|Acknowledge?ments?)$"
+)
+
+@lru_cache(maxsize=None)
+def get_tokenizer(name=TOKENIZER):
+    """tiktoken encoder, loaded once per process."""
+    return get_encoding(name)
+
+def is_heading(paragraph):
+    return len(paragraph) <= 80 and HEADING_PATTERN.match(paragraph) is not None
+
+def split_text_into_chunks(text, chunk_size=CHUNK_TOKENS, overlap_size=OVERLAP_TOKENS):
+    """
+    Split text into chunks of at most ``chunk_size`` cl100k tokens.
+
+    Paragraphs (separated by blank lines) are packed whole; a section heading
+    starts a new chunk once the current one is a quarter full, and only
+    paragraphs longer than a chunk are cut, on token boundaries. Consecutive
+    chunks share up to ``overlap_size`` tokens of whole trailing paragraphs.
+
+    Returns:
+        list of (str, int): Chunk text and its token count.
+    """
+    encoder = get_tokenizer()
+    paragraphs = []  # (text, token count)
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        tokens = encoder.encode(paragraph)
+        if len(tokens) <= chunk_size:
+            paragraphs.append((paragraph, len(tokens)))
+            continue
+        for start in range(0, len(tokens), chunk_size - overlap_size):
+            window = tokens[start:start + chunk_size]
+            paragraphs.append((encoder.decode(window), len(window)))
+            if start + chunk_size >= len(tokens):
+                break
+
+    def size(parts):
+        # "\n\n" between paragraphs is one token
+        return sum(tokens for _, tokens in parts) + len(parts) - 1
+
+    chunks, current = [], []
+    for paragraph in paragraphs:
+        starts_section = is_heading(paragraph[0]) and size(current) >= chunk_size // 4
+        if current and (starts_section or size(current + [paragraph]) > chunk_size):
+            chunks.append("\n\n".join(text for text, _ in current))
+            # Carry whole trailing paragraphs over as overlap, but not into a new section
+            overlap = []
+            for previous in reversed(current if not starts_section else []):
+                if size([previous] + overlap) > overlap_size or size([previous] + overlap + [paragraph]) > chunk_size:
+                    break
+                overlap.insert(0, previous)
+            current = overlap
+        current.append(paragraph)
+    if current:
+        chunks.append("\n\n".join(text for text, _ in current))
+
+    return [(chunk, len(encoder.encode(chunk))) for chunk in chunks]
+
+def extract_text_from_pdf(filepath):
+    """Text of a PDF with one paragraph (PyMuPDF text block) per blank-line-separated block."""
+    import fitz  # PyMuPDF, imported here so the app can use the tokenizer without it
+    doc = fitz.open(filepath)
+    try:
+        return "\n\n".join(
+            block[4] for page in doc for block in page.get_text("blocks") if block[6] == 0
+        )
+    finally:
+        doc.close()
+
+def extract_and_chunk(filepath):
+    """
+    Parse one PDF and return its non-trivial chunks as (text, token_count)
+    pairs (runs in a worker process).
+    """
+    chunks = split_text_into_chunks(extract_text_from_pdf(filepath))
+    return [(chunk, tokens) for chunk, tokens in chunks if len(chunk) >= MIN_CHUNK_CHARS]
+
+def iter_extracted_papers(papers, workers=None):
+    """
+    Parse and chunk PDFs on a process pool, yielding (paper, chunks) in input order.
+
+    Args:
+        papers (iterable of tuple): Paper tuples whose last element is the PDF path.
+        workers (int): Number of worker processes (default: CPU count; 1 = in-process).
+
+    At most ``workers * PREFETCH_PER_WORKER`` PDFs are in flight, so a slow
+    consumer (the embedding stage) bounds how far parsing runs ahead.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    def result(paper, future):
+        try:
+            return paper, future.result()
+        except Exception as e:
+            print(f"⚠️ Warning: Failed to parse {paper[-1]}: {e}. Skipping.")
+            return None
+
+    if workers == 1:
+        for paper in papers:
+            try:
+                yield paper, extract_and_chunk(paper[-1])
+            except Exception as e:
+                print(f"⚠️ Warning: Failed to parse {paper[-1]}: {e}. Skipping.")
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for paper in papers:
+            pending.append((paper, executor.submit(extract_and_chunk, paper[-1])))
+            if len(pending) >= workers * PREFETCH_PER_WORKER:
+                done = result(*pending.popleft())
+                if done:
+                    yield done
+        while pending:
+            done = result(*pending.popleft())
+            if done:
+                yield done
@@ -0,0 +1,198 @@
+# vectordb/quantization.py
+#
+# Compressed in-memory codes for a LocalVectorStore. Queries score the codes
+# first and then rescore a shortlist exactly against the float vectors on disk,
+# so only the codes have to stay in RAM:
+#
+#     int8  scalar quantization with one float32 scale per vector (d + 4 bytes)
+#     pq    product quantization, one byte per sub-vector (e.g. 48 bytes for 384-d)
+#
+#     python -m vectordb.quantization paper-contents --kind int8 --rescore 1 2 4 10
+
+import time
+import argparse
+import numpy as np
+
+KINDS = ("int8", "pq")
+DEFAULT_RESCORE = 4        # shortlist size = rescore * top_k
+DEFAULT_PQ_SUBSPACES = 48  # 384-d vectors -> 8-d sub-vectors
+PQ_CENTROIDS = 256         # codes fit in one byte
+PQ_TRAIN_SAMPLE = 65536
+SCORE_BLOCK_ROWS = 65536
+
+
+def quantize_int8(vectors):
+    """Per-vector symmetric int8 quantization: vectors ~= codes * scales[:, None]."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _kmeans(vectors, k, iterations, rng):
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=len(vectors) < k)].copy()
+    for _ in range(iterations):
+        distances = (vectors ** 2).sum(1)[:, None] - 2 * vectors @ centroids.T + (centroids ** 2).sum(1)[None, :]
+        assignment = distances.argmin(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=k)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+    return centroids
+
+
+class CompressedCodes:
+    """
+    Compressed copy of the first ``num_rows`` rows of a store.
+
+    Rows added after the codes were built are scored exactly by the store
+    until the codes are rebuilt (see LocalVectorStore.build_compressed_codes).
+    """
+
+    def __init__(self, kind, codes, num_rows, scales=None, codebooks=None, rescore=DEFAULT_RESCORE):
+        self.kind = kind
+        self.codes = codes
+        self.num_rows = num_rows
+        self.scales = scales
+        self.codebooks = codebooks  # (subspaces, PQ_CENTROIDS, sub_dimension) for pq
+        self.rescore = rescore
+
+    @property
+    def nbytes(self):
+        extra = self.scales.nbytes if self.scales is not None else self.codebooks.nbytes
+        return self.codes.nbytes + extra
+
+    @classmethod
+    def build(cls, matrix, kind="int8", pq_subspaces=DEFAULT_PQ_SUBSPACES, iterations=15,
+              seed=0, rescore=DEFAULT_RESCORE):
+        """Encode a (memory-mapped) float matrix block by block."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown code kind {kind!r}, expected one of {KINDS}")
+        num_rows, dimension = matrix.shape
+
+        if kind == "int8":
+            codes = np.empty((num_rows, dimension), dtype=np.int8)
+            scales = np.empty(num_rows, dtype=np.float32)
+            for start in range(0, num_rows, SCORE_BLOCK_ROWS):
+                block_codes, block_scales = quantize_int8(matrix[start:start + SCORE_BLOCK_ROWS])
+                codes[start:start + len(block_codes)] = block_codes
+                scales[start:start + len(block_codes)] = block_scales
+            return cls(kind, codes, num_rows, scales=scales, rescore=rescore)
+
+        if dimension % pq_subspaces:
+            raise ValueError(f"Dimension {dimension} is not divisible into {pq_subspaces} subspaces")
+        sub_dimension = dimension // pq_subspaces
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(num_rows, size=min(PQ_TRAIN_SAMPLE, num_rows), replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32).reshape(len(sample_rows), pq_subspaces, sub_dimension)
+        codebooks = np.stack([
+            _kmeans(sample[:, j], PQ_CENTROIDS, iterations, rng) for j in range(pq_subspaces)
+        ]).astype(np.float32)
+
+        codes = np.empty((num_rows, pq_subspaces), dtype=np.uint8)
+        for start in range(0, num_rows, SCORE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            block = block.reshape(len(block), pq_subspaces, sub_dimension)
+            for j in range(pq_subspaces):
+                distances = -2 * block[:, j] @ codebooks[j].T + (codebooks[j] ** 2).sum(1)[None, :]
+                codes[start:start + len(block), j] = distances.argmin(axis=1)
+        return cls(kind, codes, num_rows, codebooks=codebooks, rescore=rescore)
+
+    def score(self, query, rows=None):
+        """Approximate dot products of a float32 query with all coded rows, or the given ones."""
+        if self.kind == "pq":
+            subspaces, _, sub_dimension = self.codebooks.shape
+            # One lookup table per subspace: dot product of the query slice with every centroid
+            tables = np.einsum("jcd,jd->jc", self.codebooks, query.reshape(subspaces, sub_dimension))
+            columns = np.arange(subspaces)
+
+        total = self.num_rows if rows is None else len(rows)
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, SCORE_BLOCK_ROWS):
+            block_rows = slice(start, start + SCORE_BLOCK_ROWS) if rows is None else rows[start:start + SCORE_BLOCK_ROWS]
+            codes = self.codes[block_rows]
+            if self.kind == "int8":
+                block_scores = (codes.astype(np.float32) @ query) * self.scales[block_rows]
+            else:
+                block_scores = tables[columns, codes].sum(axis=1)
+            scores[start:start + len(codes)] = block_scores
+        return scores
+
+    def save(self, path):
+        arrays = {"kind": np.array(self.kind), "codes": self.codes,
+                  "num_rows": np.array(self.num_rows), "rescore": np.array(self.rescore)}
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        if self.codebooks is not None:
+            arrays["codebooks"] = self.codebooks
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                str(data["kind"]), data["codes"], int(data["num_rows"]),
+                scales=data["scales"] if "scales" in data else None,
+                codebooks=data["codebooks"] if "codebooks" in data else None,
+                rescore=int(data["rescore"])
+            )
+
+
+def rescore_report(store, rescore_values=(1, 2, 4, 10), top_k=10, num_queries=200, seed=0):
+    """
+    Measure recall@k and mean latency of search on the store's compressed codes,
+    for several shortlist sizes, against exact float search.
+
+    Returns:
+        list of dict: One entry per rescore factor with 'rescore', 'recall',
+        'latency_ms', plus a final entry for exact search ('rescore' is None).
+    """
+    rng = np.random.default_rng(seed)
+    live_rows = np.flatnonzero(store._live)
+    query_rows = rng.choice(live_rows, size=min(num_queries, len(live_rows)), replace=False)
+    queries = np.asarray(store.matrix[np.sort(query_rows)], dtype=np.float32)
+
+    def run(**kwargs):
+        results, start = [], time.perf_counter()
+        for query in queries:
+            response = store.query(vector=query, top_k=top_k, **kwargs)
+            results.append({match.id for match in response.matches})
+        return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+    exact, exact_latency = run(exact=True)
+
+    report = []
+    for rescore in rescore_values:
+        approx, latency = run(rescore=rescore)
+        hits = sum(len(a & e) for a, e in zip(approx, exact))
+        total = sum(len(e) for e in exact)
+        report.append({"rescore": rescore, "recall": hits / max(total, 1), "latency_ms": latency})
+    report.append({"rescore": None, "recall": 1.0, "latency_ms": exact_latency})
+    return report
+
+
+if __name__ == "__main__":
+    from vectordb.store import open_index
+
+    parser = argparse.ArgumentParser(description="Build compressed codes for a local vector store and report recall@k.")
+    parser.add_argument("index_name", nargs="?", default="paper-contents")
+    parser.add_argument("--kind", choices=KINDS, default="int8")
+    parser.add_argument("--subspaces", type=int, default=DEFAULT_PQ_SUBSPACES, help="PQ sub-vectors per vector.")
+    parser.add_argument("--rescore", type=int, nargs="+", default=[1, 2, 4, 10])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    store = open_index(args.index_name, backend="local")
+    codes = store.build_compressed_codes(kind=args.kind, pq_subspaces=args.subspaces)
+    float_mb = store.matrix.nbytes / 1024 ** 2
+    print(f"Built {codes.kind} codes for {codes.num_rows} rows: "
+          f"{codes.nbytes / 1024 ** 2:.1f} MB in RAM vs {float_mb:.1f} MB of {store.dtype} vectors.")
+
+    for entry in rescore_report(store, args.rescore, top_k=args.top_k, num_queries=args.queries):
+        label = "exact" if entry["rescore"] is None else f"rescore={entry['rescore']}x"
+        print(f"{label:>12}  recall@{args.top_k}={entry['recall']:.3f}  {entry['latency_ms']:.2f} ms/query")
@@ -0,0 +1,143 @@
+# vectordb/resources.py
+#
+# Lazily-initialised, process-wide shared resources (embedding model, vector
+# indexes, caches, API clients). Nothing is loaded or connected at import
+# time; each resource is built on first use, once, and its start-up cost is
+# recorded so import time and first-query time can be measured separately.
+
+import sys
+import time
+import threading
+from vectordb.manifest import MODEL_DIR
+
+_lock = threading.RLock()
+_resources = {}
+_timings = {}
+
+
+def record_timing(name, seconds):
+    """Record a start-up cost (e.g. an import or a first query) for the report."""
+    _timings.setdefault(name, seconds)
+
+
+def lazy_resource(name, factory):
+    """
+    Return a getter that builds ``factory()`` on first call and then returns
+    the same object from every thread. The construction time is recorded.
+    """
+    def get():
+        resource = _resources.get(name)
+        if resource is None:
+            with _lock:
+                resource = _resources.get(name)
+                if resource is None:
+                    start = time.perf_counter()
+                    resource = factory()
+                    record_timing(f"init:{name}", time.perf_counter() - start)
+                    _resources[name] = resource
+        return resource
+
+    get.__name__ = f"get_{name}"
+    get.__doc__ = f"Shared {name}, created on first use."
+    return get
+
+
+def set_resource(name, resource):
+    """Install ``resource`` under ``name`` instead of building it (e.g. a stand-in encoder)."""
+    with _lock:
+        _resources[name] = resource
+
+
+def _load_model():
+    # EMBEDDING_BACKEND=int8|onnx selects an optimised CPU encoder, see vectordb/fast_encoder.py
+    from vectordb.fast_encoder import load_encoder, backend_from_env, threads_from_env
+    return load_encoder(backend_from_env(), threads_from_env(), MODEL_DIR)
+
+
+def _load_embedding_cache():
+    from vectordb.embedding_cache import open_embedding_cache
+    from vectordb.fast_encoder import backend_from_env
+    from vectordb.tracing import register_collector, hit_rate_stats
+    cache = open_embedding_cache(backend=backend_from_env())
+    register_collector("embedding_cache", lambda: hit_rate_stats(cache))
+    return cache
+
+
+get_model = lazy_resource("model", _load_model)
+get_embedding_cache = lazy_resource("embedding_cache", _load_embedding_cache)
+
+_index_getters = {}
+_created_indexes = set()  # names already passed through create_index_if_missing
+
+
+def get_index(index_name, create=False):
+    """
+    Shared handle to a vector index (see vectordb.store.open_index). With
+    ``create``, the index is created first if it does not exist, even when a
+    handle was already opened by an earlier lookup without it.
+    """
+    with _lock:
+        if create and index_name not in _created_indexes:
+            from vectordb.store import create_index_if_missing
+            create_index_if_missing(index_name)
+            _created_indexes.add(index_name)
+        getter = _index_getters.get(index_name)
+        if getter is None:
+            from vectordb.store import open_index
+            getter = lazy_resource(f"index:{index_name}", lambda: open_index(index_name))
+            _index_getters[index_name] = getter
+    return getter()
+
+
+def warm_up(index_names=("research-database", "paper-contents"), background=True):
+    """
+    Load the model, caches and indexes and run one throwaway encode, so the
+    first user query does not pay for them. Runs on a daemon thread by default.
+    """
+    def run():
+        try:
+            start = time.perf_counter()
+            for index_name in index_names:
+                get_index(index_name)
+            get_embedding_cache()
+            get_model().encode(["warm up"])
+            record_timing("warm_up", time.perf_counter() - start)
+        except Exception as e:
+            print(f"Warm-up failed: {e}")
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="resource-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def startup_report():
+    """Recorded start-up costs in milliseconds, e.g. {'init:model': 812.4, ...}."""
+    return {name: seconds * 1000 for name, seconds in _timings.items()}
+
+
+if __name__ == "__main__":
+    # Measure cold import and first-query cost of the retrieval path separately.
+    start = time.perf_counter()
+    import vectordb.retrieve_vector as retrieve_vector
+    import vectordb.retrieve_chunks as retrieve_chunks
+    record_timing("import:retrieval_modules", time.perf_counter() - start)
+
+    query = sys.argv[1] if len(sys.argv) > 1 else "LiDAR and camera fusion for 3D object detection"
+
+    start = time.perf_counter()
+    papers = retrieve_vector.retrieve_similar_papers(query, top_k=5)
+    record_timing("first_query:retrieve_similar_papers", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    retrieve_vector.retrieve_similar_papers(query + " ", top_k=5)
+    record_timing("second_query:retrieve_similar_papers", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    retrieve_chunks.retrieve_related_chunks_by_titles([paper["title"] for paper in papers])
+    record_timing("first_query:retrieve_related_chunks_by_titles", time.perf_counter() - start)
+
+    for name, ms in startup_report().items():
+        print(f"{name:<48} {ms:10.1f} ms")
@@ -1,53 +1,176 @@
 # vectordb/retrieve_chunks.py
 
 import os
-from pinecone import Pinecone
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from vectordb.store import sidecar_path
+from vectordb.chunk_postings import ChunkPostings
+from vectordb.chunk_cache import PaperChunkCache
+from vectordb.lexical_index import BM25Index
+from vectordb.resources import get_index, lazy_resource
+from vectordb.tracing import span, traced, record_error, register_collector
 
-# Load environment variables
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_ENV = os.getenv("PINECONE_ENV")
 INDEX_NAME = "paper-contents"
+FETCH_BATCH_SIZE = 1000  # Pinecone's limit on ids per fetch request
+MAX_PARALLEL_REQUESTS = 8  # concurrent fetch/query requests per call
 
-# Initialize Pinecone client
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+# Paper -> chunk-id posting index written by full2vector.py, loaded on first use
+get_postings = lazy_resource("chunk_postings", lambda: ChunkPostings(sidecar_path(INDEX_NAME, "postings.json")))
+# BM25 index over chunk text written by full2vector.py, loaded on first use
+get_lexical_index = lazy_resource("chunks_bm25", lambda: BM25Index(sidecar_path(INDEX_NAME, "bm25")))
 
-def retrieve_related_chunks_by_titles(titles, top_k=100):
+# Chunks of recently requested papers, shared by every session of the process
+chunk_cache = PaperChunkCache(max_bytes=int(os.getenv("CHUNK_CACHE_MB", "256")) * 1024 * 1024)
+register_collector("chunk_cache", chunk_cache.stats)
+
+def _record_field(record, name):
+    """A field of a fetched/matched record: a key of plain dict records, an attribute of Pinecone's."""
+    if isinstance(record, Mapping):
+        return record.get(name)
+    return getattr(record, name, None)
+
+def _chunk_from_record(record, include_values=False):
+    metadata = _record_field(record, "metadata") or {}
+    chunk = {
+        "id": _record_field(record, "id"),
+        "content": metadata.get("content", ""),
+        "title": metadata.get("title", ""),
+        "paper_id": metadata.get("paper_id", "")
+    }
+    if "token_count" in metadata:
+        # cl100k token count of the content, stored at ingestion time
+        chunk["token_count"] = int(metadata["token_count"])
+    if include_values:
+        chunk["values"] = np.asarray(_record_field(record, "values"), dtype=np.float32)
+    return chunk
+
+def fetch_chunks_by_ids(chunk_ids, include_values=False):
     """
-    Retrieve related chunks from Pinecone based on matching 'title' metadata.
+    Fetch chunks by id and return them in the order of ``chunk_ids``.
 
     Args:
-        titles (list of str): List of paper titles to match.
-        top_k (int): Maximum number of matches to retrieve.
+        chunk_ids (list of str): Chunk vector ids.
+        include_values (bool): Also return each chunk's stored embedding as a
+            float32 array under 'values'.
 
     Returns:
-        list of dict: Each dict contains 'content' and 'title'.
+        list of dict: Each dict contains 'id', 'content', 'title' and 'paper_id'.
     """
-    all_chunks = []
+    batches = [chunk_ids[i:i + FETCH_BATCH_SIZE] for i in range(0, len(chunk_ids), FETCH_BATCH_SIZE)]
+
+    fetched = {}
+    if len(batches) == 1:
+        fetched.update(get_index(INDEX_NAME).fetch(ids=batches[0]).vectors)
+    elif batches:
+        with ThreadPoolExecutor(max_workers=min(len(batches), MAX_PARALLEL_REQUESTS)) as executor:
+            for response in executor.map(lambda batch: get_index(INDEX_NAME).fetch(ids=batch), batches):
+                fetched.update(response.vectors)
+
+    return [
+        _chunk_from_record(fetched[chunk_id], include_values)
+        for chunk_id in chunk_ids if chunk_id in fetched
+    ]
+
+def _fetch_chunks_by_title(title, top_k):
+    """
+    Fallback for papers missing from the posting index (indexed before it
+    existed): filter-only fetch of the title's chunks (no query vector),
+    sorted into document order.
+
+    Returns:
+        (list of dict, bool): The chunks, with 'values', and whether they are
+        all of the paper's chunks (the fetch was not cut off at ``top_k``).
+    """
+    response = get_index(INDEX_NAME).fetch_by_metadata(filter={"title": {"$eq": title}}, limit=top_k)
+    records = sorted(response.vectors.values(), key=lambda record: (_record_field(record, "metadata") or {}).get("chunk_index", 0))
+    complete = not _record_field(_record_field(response, "pagination") or {}, "next")
+    return [_chunk_from_record(record, include_values=True) for record in records], complete
+
+@traced("retrieve_related_chunks_by_titles")
+def retrieve_related_chunks_by_titles(titles, top_k=100, include_values=False):
+    """
+    Retrieve every chunk of the given papers, in document order.
+
+    Papers in the shared chunk cache are served from memory. For the rest,
+    chunk ids are looked up in the posting index and fetched in a single
+    batched request; titles without postings fall back to filter-only
+    fetches, which run in parallel and add the papers they fetch in full to
+    the in-memory postings. Only papers whose chunks all came back are cached.
+
+    Args:
+        titles (list of str): List of paper titles to match (duplicates are
+            returned once).
+        top_k (int): Maximum number of chunks per title for the fallback fetch.
+        include_values (bool): Also return each chunk's stored embedding as a
+            float32 array under 'values'.
+
+    Returns:
+        list of dict: Each dict contains 'id', 'content', 'title' and 'paper_id'.
+    """
+    titles = list(dict.fromkeys(titles))
+    postings = get_postings()
+    chunk_ids = []
+    expected_ids = {}  # paper_id -> chunk ids requested by id
+    chunks_by_title = {}
+    unindexed_titles = []
 
     for title in titles:
-        # Pinecone filter syntax (metadata must match exactly)
-        query_filter = {
-            "title": {"$eq": title}
-        }
+        paper_id = postings.paper_id_for_title(title)
+        if paper_id is None:
+            unindexed_titles.append(title)
+            continue
 
-        try:
-            response = index.query(
-                vector=[0.0] * 384,
-                filter=query_filter,
-                top_k=top_k,
-                include_metadata=True
-            )
-
-            for match in response.matches:
-                metadata = match.metadata
-                chunk_data = {
-                    "content": metadata.get("content", ""),
-                    "title": metadata.get("title", "")
-                }
-                all_chunks.append(chunk_data)
+        cached = chunk_cache.get(paper_id)
+        if cached is not None:
+            chunks_by_title[title] = cached
+        else:
+            expected_ids[paper_id] = postings.chunk_ids(paper_id)
+            chunk_ids.extend(expected_ids[paper_id])
 
+    def fetch_title(title):
+        try:
+            return title, _fetch_chunks_by_title(title, top_k)
         except Exception as e:
-            print(f"Error retrieving chunks for title '{title}': {e}")
+            record_error("retrieve_related_chunks_by_titles", f"Error retrieving chunks for title '{title}': {e}")
+            return title, ([], False)
+
+    if unindexed_titles:
+        with span("fetch_chunks_by_title", titles=len(unindexed_titles)), \
+                ThreadPoolExecutor(max_workers=min(len(unindexed_titles), MAX_PARALLEL_REQUESTS)) as executor:
+            for title, (chunks, complete) in executor.map(fetch_title, unindexed_titles):
+                chunks_by_title[title] = chunks
+                paper_id = chunks[0]["paper_id"] if chunks else None
+                if complete and paper_id:
+                    # Later requests for this paper take the by-id path and the chunk cache
+                    postings.add_paper(paper_id, title, [chunk["id"] for chunk in chunks])
+                    chunk_cache.put(paper_id, chunks)
+
+    try:
+        # Always fetch vectors so cached papers can serve include_values requests
+        with span("fetch_chunks_by_ids", chunks=len(chunk_ids)):
+            fetched = fetch_chunks_by_ids(chunk_ids, include_values=True)
+    except Exception as e:
+        record_error("retrieve_related_chunks_by_titles", f"Error fetching chunks by id: {e}")
+        fetched = []
 
+    fetched_by_paper = {}
+    for chunk in fetched:
+        fetched_by_paper.setdefault(chunk["paper_id"], []).append(chunk)
+        chunks_by_title.setdefault(chunk["title"], []).append(chunk)
+    for paper_id, paper_chunks in fetched_by_paper.items():
+        # A partial result (failed batch, ids deleted since the postings were
+        # written) is returned but not cached, so the next request retries
+        if len(paper_chunks) == len(expected_ids.get(paper_id, ())):
+            chunk_cache.put(paper_id, paper_chunks)
+
+    # Keep the order of the requested titles; hand out copies so callers
+    # cannot modify the shared cache
+    all_chunks = []
+    for title in titles:
+        for chunk in chunks_by_title.pop(title, []):
+            chunk = dict(chunk)
+            if not include_values:
+                chunk.pop("values", None)
+            all_chunks.append(chunk)
     return all_chunks
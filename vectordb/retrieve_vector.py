@@ -1,57 +1,293 @@
 # vectordb/retrieve_vector.py
 import os
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone
-import streamlit as st
+import sys
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from vectordb.store import sidecar_path
+from vectordb.resources import get_index, get_model, get_embedding_cache, lazy_resource
+from vectordb.local_store import LocalVectorStore, matches_filter
+from vectordb.lexical_index import BM25Index, reciprocal_rank_fusion
+from vectordb.tracing import span, traced, record_error
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_ENV = os.getenv("PINECONE_ENV")
 INDEX_NAME = "research-database"
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+# Pinecone has no substring operator, so author filters there are applied to
+# this many times top_k results
+AUTHOR_OVERFETCH = 10
 
-@st.cache_resource
-def load_minilm_model():
+MAX_PARALLEL_REQUESTS = 8  # concurrent queries of a batch against a remote index
+
+# Hybrid search fuses this many times top_k dense and BM25 candidates
+HYBRID_CANDIDATES = 4
+
+# BM25 index over titles and abstracts written by papers2vector.py, loaded on first use
+get_lexical_index = lazy_resource("papers_bm25", lambda: BM25Index(sidecar_path(INDEX_NAME, "bm25")))
+
+# The index, model and embedding cache are created on first use (see
+# vectordb/resources.py), so importing this module is cheap.
+
+def build_paper_filter(year=None, year_range=None, venue=None, author=None):
     """
-    Load and cache the MiniLM model.
+    Build a metadata filter for retrieve_similar_papers.
+
+    Args:
+        year (int): Publication year.
+        year_range (tuple): (first, last) years, inclusive; either may be None.
+        venue (str): Conference, e.g. "cvpr" (case-insensitive).
+        author (str): Case-insensitive substring of the author list.
+
+    Returns:
+        dict or None: Pinecone-style filter ($contains is handled locally).
     """
-    return SentenceTransformer("my_minilm_model")
+    clauses = []
+    if year is not None:
+        clauses.append({"year": {"$eq": int(year)}})
+    if year_range is not None:
+        first, last = year_range
+        bounds = {}
+        if first is not None:
+            bounds["$gte"] = int(first)
+        if last is not None:
+            bounds["$lte"] = int(last)
+        if bounds:
+            clauses.append({"year": bounds})
+    if venue:
+        clauses.append({"conference": {"$eq": venue.strip().lower()}})
+    if author and author.strip():
+        clauses.append({"authors": {"$contains": author.strip()}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def _uses_contains(clause):
+    if isinstance(clause, dict):
+        return any(key == "$contains" or _uses_contains(value) for key, value in clause.items())
+    if isinstance(clause, list):
+        return any(_uses_contains(item) for item in clause)
+    return False
 
-model = load_minilm_model()
+def _split_substring_clauses(query_filter):
+    """Split a filter into the part Pinecone understands and the $contains clauses."""
+    clauses = query_filter.get("$and", [query_filter]) if query_filter else []
+    server = [clause for clause in clauses if not _uses_contains(clause)]
+    local = [clause for clause in clauses if _uses_contains(clause)]
+    server_filter = None if not server else server[0] if len(server) == 1 else {"$and": server}
+    return server_filter, local
 
-def retrieve_similar_papers(query_text, top_k=5):
+def hybrid_search_enabled(hybrid=None):
+    """Whether to fuse BM25 results in: on unless HYBRID_SEARCH=0, and only once the BM25 index exists."""
+    if hybrid is None:
+        hybrid = os.getenv("HYBRID_SEARCH", "1") != "0"
+    return bool(hybrid) and len(get_lexical_index()) > 0
+
+def _fuse_lexical_results(index, query_text, dense_ids, metadata_by_id, query_filter, candidates):
     """
-    Retrieve top-k most similar papers from Pinecone based on the query.
+    Fuse the dense ranking with the BM25 ranking by reciprocal rank fusion.
+    Metadata of papers found only by BM25 is fetched into ``metadata_by_id``
+    and the filter is applied to them.
     """
-    query_vector = model.encode(query_text).tolist()
+    overfetch = AUTHOR_OVERFETCH if query_filter else 1
+    with span("lexical_search", candidates=candidates * overfetch):
+        lexical_ids = [doc_id for doc_id, _ in get_lexical_index().search(query_text, candidates * overfetch)]
+
+    missing = [doc_id for doc_id in lexical_ids if doc_id not in metadata_by_id]
+    if missing:
+        with span("fetch_lexical_metadata", papers=len(missing)):
+            for vector_id, vector in index.fetch(ids=missing).vectors.items():
+                metadata_by_id[vector_id] = dict(vector.metadata or {})
+    lexical_ids = [
+        doc_id for doc_id in lexical_ids
+        if doc_id in metadata_by_id and matches_filter(metadata_by_id[doc_id], query_filter)
+    ][:candidates]
 
+    return [doc_id for doc_id, _ in reciprocal_rank_fusion([dense_ids, lexical_ids])]
+
+def _query_params(index, query_filter, candidates):
+    """
+    Query parameters (without the vector) and the $contains clauses that
+    have to be applied to the results, for the index's backend.
+    """
     query_params = {
-        "top_k": top_k,
-        "vector": query_vector,
+        "top_k": candidates,
         "include_metadata": True
     }
+    local_clauses = []
+    if query_filter and isinstance(index, LocalVectorStore):
+        query_params["filter"] = query_filter
+    elif query_filter:
+        server_filter, local_clauses = _split_substring_clauses(query_filter)
+        if server_filter:
+            query_params["filter"] = server_filter
+        if local_clauses:
+            query_params["top_k"] = candidates * AUTHOR_OVERFETCH
+    return query_params, local_clauses
+
+def _papers_from_results(index, query_text, results, local_clauses, query_filter, top_k, candidates, use_lexical):
+    """Turn a query result into the top-k paper dicts, fusing in BM25 results when ``use_lexical``."""
+    matches = [
+        match for match in results['matches']
+        if all(matches_filter(match['metadata'], clause) for clause in local_clauses)
+    ][:candidates]
+
+    metadata_by_id = {match['id']: match['metadata'] for match in matches}
+    ranked_ids = [match['id'] for match in matches]
+    if use_lexical:
+        ranked_ids = _fuse_lexical_results(index, query_text, ranked_ids, metadata_by_id, query_filter, candidates)
+
+    papers = []
+    for paper_id in ranked_ids[:top_k]:
+        metadata = metadata_by_id[paper_id]
+        paper = {
+            "id": paper_id,
+            "title": metadata['title'],
+            "authors": metadata['authors'],
+            "pdf_url": metadata['pdf_url'],
+            "abstract_url": metadata['abstract_url']
+        }
+        papers.append(paper)
+    return papers
+
+@traced("retrieve_similar_papers")
+def retrieve_similar_papers(query_text, top_k=5, year=None, year_range=None, venue=None, author=None, hybrid=None):
+    """
+    Retrieve top-k most similar papers from the vector index based on the query,
+    optionally restricted by year, year range, venue and author substring.
+
+    On the local index the filter is resolved from its attribute posting lists
+    and only matching papers are scored. On Pinecone the year and venue
+    clauses are sent with the query and the author substring is applied to an
+    over-fetched result list.
+
+    With hybrid search (see hybrid_search_enabled), ``HYBRID_CANDIDATES * top_k``
+    dense and BM25 candidates are fused with reciprocal rank fusion, so exact
+    terms such as method names and acronyms are not missed.
+    """
+    with span("encode_query"):
+        query_vector = get_embedding_cache().encode_query(get_model(), query_text).tolist()
+    query_filter = build_paper_filter(year, year_range, venue, author)
 
     try:
-        results = index.query(**query_params)
-        
-        papers = []
-        for match in results['matches']:
-            paper = {
-                "id": match['id'],
-                "title": match['metadata']['title'],
-                "authors": match['metadata']['authors'],
-                "pdf_url": match['metadata']['pdf_url'],
-                "abstract_url": match['metadata']['abstract_url']
-            }
-            papers.append(paper)
-
-        return papers
+        index = get_index(INDEX_NAME)
+        use_lexical = hybrid_search_enabled(hybrid)
+        candidates = top_k * HYBRID_CANDIDATES if use_lexical else top_k
+        query_params, local_clauses = _query_params(index, query_filter, candidates)
+
+        with span("vector_query", index=INDEX_NAME, top_k=query_params["top_k"], filtered="filter" in query_params):
+            results = index.query(vector=query_vector, **query_params)
+        return _papers_from_results(index, query_text, results, local_clauses, query_filter, top_k, candidates, use_lexical)
 
     except Exception as e:
-        print(f"Error querying Pinecone: {e}")
+        record_error("retrieve_similar_papers", f"Error querying vector index: {e}")
+        return []
+
+@traced("retrieve_similar_papers_batch")
+def retrieve_similar_papers_batch(query_texts, top_k=5, year=None, year_range=None, venue=None, author=None,
+                                  hybrid=None, max_parallel_requests=MAX_PARALLEL_REQUESTS):
+    """
+    Retrieve the top-k papers for each of several queries, with the same
+    filters and hybrid search as retrieve_similar_papers.
+
+    All queries are embedded in one batched forward pass. The local index
+    scores them together (see LocalVectorStore.query_batch); remote indexes
+    get up to ``max_parallel_requests`` concurrent queries.
+
+    Returns:
+        list of list of dict: Papers per query, in the order of ``query_texts``
+        (an empty list for a query that failed).
+    """
+    query_texts = list(query_texts)
+    if not query_texts:
         return []
 
+    with span("encode_queries", queries=len(query_texts)):
+        query_vectors = get_embedding_cache().encode(get_model(), query_texts, persist=False)
+    query_filter = build_paper_filter(year, year_range, venue, author)
+
+    try:
+        index = get_index(INDEX_NAME)
+        use_lexical = hybrid_search_enabled(hybrid)
+    except Exception as e:
+        record_error("retrieve_similar_papers", f"Error opening vector index: {e}")
+        return [[] for _ in query_texts]
+    candidates = top_k * HYBRID_CANDIDATES if use_lexical else top_k
+    query_params, local_clauses = _query_params(index, query_filter, candidates)
+
+    def papers_for(query_text, results):
+        try:
+            return _papers_from_results(index, query_text, results, local_clauses, query_filter, top_k, candidates, use_lexical)
+        except Exception as e:
+            record_error("retrieve_similar_papers", f"Error retrieving papers for '{query_text}': {e}")
+            return []
+
+    if isinstance(index, LocalVectorStore):
+        try:
+            with span("vector_query_batch", index=INDEX_NAME, queries=len(query_texts), top_k=query_params["top_k"]):
+                all_results = index.query_batch(query_vectors, **query_params)
+        except Exception as e:
+            record_error("retrieve_similar_papers", f"Error querying vector index: {e}")
+            return [[] for _ in query_texts]
+        return [papers_for(query_text, results) for query_text, results in zip(query_texts, all_results)]
+
+    def retrieve(item):
+        query_text, query_vector = item
+        try:
+            results = index.query(vector=query_vector.tolist(), **query_params)
+        except Exception as e:
+            record_error("retrieve_similar_papers", f"Error querying vector index for '{query_text}': {e}")
+            return []
+        return papers_for(query_text, results)
+
+    with span("vector_query_batch", index=INDEX_NAME, queries=len(query_texts), top_k=query_params["top_k"]), \
+            ThreadPoolExecutor(max_workers=max(1, min(len(query_texts), max_parallel_requests))) as executor:
+        return list(executor.map(retrieve, zip(query_texts, query_vectors)))
+
+def iter_query_batches(lines, batch_size):
+    """Group non-empty, stripped lines into lists of at most ``batch_size`` queries."""
+    batch = []
+    for line in lines:
+        query = line.strip()
+        if not query:
+            continue
+        batch.append(query)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 def test():
-    return 1
\ No newline at end of file
+    return 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieve similar papers for every query in a file (one per line) as JSONL.")
+    parser.add_argument("queries", help="file with one query per line, or - for stdin")
+    parser.add_argument("--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64, help="queries encoded and searched together")
+    parser.add_argument("--year-from", type=int, default=None)
+    parser.add_argument("--year-to", type=int, default=None)
+    parser.add_argument("--venue", default=None)
+    parser.add_argument("--author", default=None)
+    parser.add_argument("--no-hybrid", action="store_true", help="dense search only")
+    args = parser.parse_args()
+
+    year_range = (args.year_from, args.year_to) if args.year_from or args.year_to else None
+    source = sys.stdin if args.queries == "-" else open(args.queries, "r", encoding="utf-8")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for batch in iter_query_batches(source, args.batch_size):
+            results = retrieve_similar_papers_batch(
+                batch, top_k=args.top_k, year_range=year_range, venue=args.venue, author=args.author,
+                hybrid=False if args.no_hybrid else None
+            )
+            for query, papers in zip(batch, results):
+                output.write(json.dumps({"query": query, "papers": papers}) + "\n")
+            output.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
@@ -0,0 +1,105 @@
+# vectordb/store.py
+
+import os
+from vectordb.local_store import LocalVectorStore, DEFAULT_DIMENSION
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_LOCAL_STORE_DIR = os.path.join(BASE_DIR, "vector_store")
+
+
+def sidecar_path(index_name, suffix):
+    """
+    Path of a local file kept alongside an index (whatever its backend),
+    e.g. sidecar_path('paper-contents', 'postings.json').
+    """
+    store_dir = os.getenv("LOCAL_STORE_DIR", DEFAULT_LOCAL_STORE_DIR)
+    os.makedirs(store_dir, exist_ok=True)
+    return os.path.join(store_dir, f"{index_name}.{suffix}")
+
+
+def open_index(index_name, create=False, backend=None):
+    """
+    Open a vector index by name on the configured backend.
+
+    Args:
+        index_name (str): Index name, e.g. 'research-database' or 'paper-contents'.
+        create (bool): Create the Pinecone index if it does not exist yet.
+        backend (str): 'pinecone' or 'local'; defaults to the VECTOR_BACKEND
+            environment variable, falling back to 'pinecone'.
+
+    Environment:
+        LOCAL_STORE_DIR: root directory of local indexes (default: ./vector_store)
+        LOCAL_STORE_DTYPE: 'float16' (default) or 'float32' for new local indexes
+
+    Returns:
+        An object exposing the Pinecone Index API (upsert/query/fetch/delete).
+    """
+    backend = (backend or os.getenv("VECTOR_BACKEND", "pinecone")).lower()
+
+    if backend == "local":
+        store_dir = os.getenv("LOCAL_STORE_DIR", DEFAULT_LOCAL_STORE_DIR)
+        return LocalVectorStore(
+            os.path.join(store_dir, index_name),
+            dimension=DEFAULT_DIMENSION,
+            dtype=os.getenv("LOCAL_STORE_DTYPE", "float16")
+        )
+
+    if backend != "pinecone":
+        raise ValueError(f"Unknown vector backend: {backend}")
+
+    if create:
+        create_index_if_missing(index_name, backend)
+
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    return pc.Index(index_name)
+
+
+def create_index_if_missing(index_name, backend=None):
+    """
+    Create the Pinecone index if it does not exist yet. Local indexes need
+    no creation step: their files are written on the first upsert.
+    """
+    backend = (backend or os.getenv("VECTOR_BACKEND", "pinecone")).lower()
+    if backend != "pinecone":
+        return
+
+    from pinecone import Pinecone, ServerlessSpec
+
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    if index_name not in pc.list_indexes().names():
+        pc.create_index(
+            name=index_name,
+            dimension=DEFAULT_DIMENSION,
+            metric='cosine',
+            spec=ServerlessSpec(cloud="aws", region=os.getenv("PINECONE_ENV"))
+        )
+
+
+def mirror_pinecone_index(index_name, batch_size=100):
+    """
+    Copy every vector of a Pinecone index into the local store of the same name,
+    so retrieval can run in-process without re-embedding the corpus.
+    """
+    source = open_index(index_name, backend="pinecone")
+    target = open_index(index_name, backend="local")
+
+    copied = 0
+    for id_batch in source.list():
+        for i in range(0, len(id_batch), batch_size):
+            response = source.fetch(ids=id_batch[i:i + batch_size])
+            target.upsert(vectors=[
+                {"id": vector_id, "values": vector.values, "metadata": dict(vector.metadata or {})}
+                for vector_id, vector in response.vectors.items()
+            ])
+            copied += len(response.vectors)
+
+    print(f"✅ Copied {copied} vectors from Pinecone '{index_name}' to {target.path}")
+    return copied
+
+
+if __name__ == "__main__":
+    for name in ("research-database", "paper-contents"):
+        mirror_pinecone_index(name)
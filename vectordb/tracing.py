@@ -0,0 +1,373 @@
+# vectordb/tracing.py
+#
+# Lightweight, process-wide instrumentation for the request and ingestion
+# paths: timing spans (nested into traces per thread), counters for tokens,
+# errors and the like, and cache statistics collected on demand. Finished
+# spans go to pluggable sinks; aggregates are read with snapshot() or
+# prometheus_text(). Sinks are configured with TRACE_SINKS, e.g.
+#
+#     TRACE_SINKS=log,jsonl:traces.jsonl streamlit run streamlit_app.py
+#
+# and TRACING=0 turns span recording off.
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+from collections import deque, defaultdict, OrderedDict
+
+logger = logging.getLogger("ragresearch.tracing")
+
+RECENT_DURATIONS = 1024  # durations kept per span name for percentiles
+RECENT_TRACES = 20       # finished root spans kept (with their children) for the debug panel
+MAX_TRACE_CHILDREN = 200 # child spans kept per trace (long ingestion runs are only aggregated)
+CLOSED_TRACE_IDS = 1024  # finished traces remembered, so children that end after their root still join it
+OPEN_TRACE_IDLE_SECONDS = 600  # open traces without a new child for this long are dropped
+
+_lock = threading.Lock()
+_durations = defaultdict(lambda: deque(maxlen=RECENT_DURATIONS))
+_span_counts = defaultdict(int)
+_span_errors = defaultdict(int)
+_counters = defaultdict(float)
+_collectors = {}
+_sinks = []
+_traces = deque(maxlen=RECENT_TRACES)
+_open_traces = {}  # trace_id -> [time of the last child, finished child spans] of a root span still running
+_closed_traces = OrderedDict()  # trace_id -> finished trace (as kept in _traces)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def enabled():
+    return os.getenv("TRACING", "1") != "0"
+
+
+# === Sinks ===
+class LogSink:
+    """Logs one line per finished span."""
+
+    def __init__(self, level=logging.INFO):
+        self.level = level
+
+    def emit(self, record):
+        attributes = " ".join(f"{key}={value}" for key, value in record["attributes"].items())
+        logger.log(self.level, "%s %.1f ms %s%s", record["name"], record["duration_ms"],
+                   "ERROR " if record["error"] else "", attributes)
+
+
+class JsonLinesSink:
+    """Appends every finished span as a JSON line to ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class PrometheusFileSink:
+    """
+    Rewrites ``path`` with the Prometheus text exposition of the aggregates
+    at most every ``interval`` seconds (e.g. for node_exporter's textfile collector).
+    """
+
+    def __init__(self, path, interval=10.0):
+        self.path = path
+        self.interval = interval
+        self._last_write = 0.0
+
+    def emit(self, record):
+        now = time.monotonic()
+        if now - self._last_write < self.interval:
+            return
+        self._last_write = now
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, self.path)
+
+
+def add_sink(sink):
+    """Send every finished span to ``sink.emit(record)``."""
+    with _lock:
+        _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    with _lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def sinks_from_env(spec=None):
+    """
+    Build sinks from a comma-separated spec: "log", "jsonl:<path>" or
+    "prometheus:<path>" (defaults to the TRACE_SINKS variable).
+    """
+    spec = os.getenv("TRACE_SINKS", "") if spec is None else spec
+    sinks = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, path = item.partition(":")
+        if kind == "log":
+            sinks.append(LogSink())
+        elif kind == "jsonl" and path:
+            sinks.append(JsonLinesSink(path))
+        elif kind == "prometheus" and path:
+            sinks.append(PrometheusFileSink(path))
+        else:
+            raise ValueError(f"Unknown trace sink '{item}' (expected log, jsonl:<path> or prometheus:<path>)")
+    return sinks
+
+
+# === Recording ===
+def _emit(record):
+    with _lock:
+        name = record["name"]
+        _durations[name].append(record["duration_ms"])
+        _span_counts[name] += 1
+        if record["error"]:
+            _span_errors[name] += 1
+
+        now = time.monotonic()
+        if record["parent_id"] is None:
+            entry = _open_traces.pop(record["trace_id"], None)
+            trace = dict(record, children=entry[1] if entry else [])
+            _traces.append(trace)
+            _closed_traces[record["trace_id"]] = trace
+            while len(_closed_traces) > CLOSED_TRACE_IDS:
+                _closed_traces.popitem(last=False)
+            _expire_open_traces(now)
+        else:
+            # A child can finish after its root (e.g. a prefetch still running
+            # when the request returns); it then joins the finished trace
+            trace = _closed_traces.get(record["trace_id"])
+            if trace is not None:
+                children = trace["children"]
+            else:
+                entry = _open_traces.setdefault(record["trace_id"], [now, []])
+                entry[0] = now
+                children = entry[1]
+            if len(children) < MAX_TRACE_CHILDREN:
+                children.append(record)
+        sinks = list(_sinks)
+
+    for sink in sinks:
+        try:
+            sink.emit(record)
+        except Exception as e:
+            logger.warning("Trace sink %s failed: %s", type(sink).__name__, e)
+
+
+def _expire_open_traces(now):
+    """Drop open traces whose root will not finish here (e.g. a late child of a forgotten trace)."""
+    for trace_id in [trace_id for trace_id, (last_child, _) in _open_traces.items()
+                     if now - last_child > OPEN_TRACE_IDLE_SECONDS]:
+        del _open_traces[trace_id]
+
+
+def record_span(name, duration_seconds, error=None, **attributes):
+    """
+    Record a span that was timed by the caller (e.g. across the yields of a
+    generator), as a child of the current span if there is one.
+    """
+    if not enabled():
+        return
+    parent = _current_span.get()
+    _emit({
+        "name": name,
+        "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex[:16],
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent["span_id"] if parent else None,
+        "start": time.time() - duration_seconds,
+        "duration_ms": duration_seconds * 1000,
+        "error": None if error is None else str(error),
+        "attributes": attributes,
+    })
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time the enclosed block as a span named ``name``. Spans opened inside it
+    on the same thread become its children. Yields the span's attribute dict,
+    so the block can add attributes such as result counts. Exceptions are
+    recorded on the span and re-raised.
+    """
+    if not enabled():
+        yield attributes
+        return
+
+    parent = _current_span.get()
+    current = {
+        "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex[:16],
+        "span_id": uuid.uuid4().hex[:16],
+    }
+    token = _current_span.set(current)
+    wall_start, start = time.time(), time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        _emit({
+            "name": name,
+            "trace_id": current["trace_id"],
+            "span_id": current["span_id"],
+            "parent_id": parent["span_id"] if parent else None,
+            "start": wall_start,
+            "duration_ms": (time.perf_counter() - start) * 1000,
+            "error": None if error is None else f"{type(error).__name__}: {error}",
+            "attributes": attributes,
+        })
+
+
+def traced(name=None):
+    """Decorator form of span(); the span name defaults to the function name."""
+    def decorate(function):
+        span_name = name or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def increment(name, value=1):
+    """Add ``value`` to the counter ``name`` (e.g. 'llm.prompt_tokens')."""
+    with _lock:
+        _counters[name] += value
+
+
+def record_error(stage, message):
+    """
+    Count an error that was handled with a fallback (and not raised), and
+    log its message.
+    """
+    increment(f"errors.{stage}")
+    logger.error(message)
+
+
+def record_usage(stage, usage):
+    """Add the prompt/completion token counts of an OpenAI ``usage`` object."""
+    if usage is None:
+        return
+    increment(f"tokens.{stage}.prompt", getattr(usage, "prompt_tokens", 0) or 0)
+    increment(f"tokens.{stage}.completion", getattr(usage, "completion_tokens", 0) or 0)
+
+
+def register_collector(name, collect):
+    """
+    Register ``collect()``, returning a dict of numbers (e.g. cache hits,
+    misses and hit rate), to be read whenever metrics are exported.
+    """
+    with _lock:
+        _collectors[name] = collect
+
+
+def hit_rate_stats(cache):
+    """Collector output for any cache with ``hits`` and ``misses`` counters."""
+    lookups = cache.hits + cache.misses
+    return {"hits": cache.hits, "misses": cache.misses, "hit_rate": cache.hits / lookups if lookups else 0.0}
+
+
+# === Export ===
+def _collect():
+    with _lock:
+        collectors = dict(_collectors)
+    collected = {}
+    for name, collect in collectors.items():
+        try:
+            collected[name] = collect()
+        except Exception as e:
+            collected[name] = {"error": str(e)}
+    return collected
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an ascending list."""
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def snapshot():
+    """
+    Aggregates since start-up: per-span count, errors and latency
+    percentiles (over the last RECENT_DURATIONS spans), counters and
+    collected statistics.
+    """
+    with _lock:
+        spans = {}
+        for name, durations in _durations.items():
+            ms = sorted(durations)
+            spans[name] = {
+                "count": _span_counts[name],
+                "errors": _span_errors[name],
+                "p50_ms": _percentile(ms, 50),
+                "p95_ms": _percentile(ms, 95),
+                "max_ms": ms[-1],
+            }
+        counters = dict(_counters)
+    return {"spans": spans, "counters": counters, "collectors": _collect()}
+
+
+def recent_traces(limit=RECENT_TRACES):
+    """The most recent finished root spans, newest first, each with its 'children'."""
+    with _lock:
+        return list(_traces)[::-1][:limit]
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name).strip("_").lower()
+
+
+def prometheus_text(prefix="ragresearch"):
+    """Render snapshot() in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = [
+        f"# TYPE {prefix}_span_duration_ms summary",
+    ]
+    for name, stats in sorted(data["spans"].items()):
+        for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+            lines.append(f'{prefix}_span_duration_ms{{span="{name}",quantile="{quantile}"}} {stats[key]:.3f}')
+        lines.append(f'{prefix}_span_duration_ms_count{{span="{name}"}} {stats["count"]}')
+    lines.append(f"# TYPE {prefix}_span_errors_total counter")
+    for name, stats in sorted(data["spans"].items()):
+        lines.append(f'{prefix}_span_errors_total{{span="{name}"}} {stats["errors"]}')
+    for name, value in sorted(data["counters"].items()):
+        metric = f"{prefix}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value:g}")
+    for collector, values in sorted(data["collectors"].items()):
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)):
+                lines.append(f"{prefix}_{_metric_name(collector)}_{_metric_name(key)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Forget every recorded span and counter (collectors and sinks are kept)."""
+    with _lock:
+        _durations.clear()
+        _span_counts.clear()
+        _span_errors.clear()
+        _counters.clear()
+        _traces.clear()
+        _open_traces.clear()
+        _closed_traces.clear()
+
+
+for _sink in sinks_from_env():
+    add_sink(_sink)